@@ -0,0 +1,182 @@
+"""图像处理流水线微基准测试
+
+用法:
+    python -m benchmarks.bench_pipeline --corpus bench_corpus --out bench_results.json
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --save-baseline benchmarks/baseline.json
+
+分别测量扫描、解码、预处理、匹配、批处理、日志写入和完整 process_task 的耗时，
+结果写成 JSON，可与保存的基线对比，超过容差的阶段视为性能回退。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+import numpy as np
+import cv2
+from benchmarks.corpus import generate_corpus
+from src.models.task import Task
+from src.models.execution_log import ExecutionLog, LogManager
+from src.services.image_processor import ImageProcessor
+from src.services.template_matcher import TemplateEntry, TemplateSet
+from src.services.template_cache import PreparedTemplate
+from src.services.preprocessing import resolve_variant
+
+def measure(func, repeat, items):
+    """预热一次后重复执行 func，返回耗时统计"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    return {
+        "runs": repeat,
+        "items": items,
+        "min_s": min(timings),
+        "median_s": median,
+        "mean_s": statistics.mean(timings),
+        "items_per_s": items / median if median > 0 else None
+    }
+
+def bench_settings(thread_count, batch_size, preprocess):
+    # ImageProcessor 只通过 get() 读取设置，基准测试直接使用字典，避免读写 settings.json
+    return {
+        "thread_count": thread_count,
+        "batch_size": batch_size,
+        "preprocess_image": preprocess,
+        "image_algorithm": "模板匹配"
+    }
+
+def make_task(corpus_dir, manifest, threshold=0.8):
+    """构造在整个语料目录中查找植入模板的任务，动作为空，不会执行任何系统命令"""
+    return Task(
+        name="benchmark",
+        image_path=os.path.join(corpus_dir, manifest["images_dir"]),
+        threshold=threshold,
+        recursive=True,
+        templates=[{"path": os.path.join(corpus_dir, manifest["template"]), "threshold": None}]
+    )
+
+def run_benchmarks(corpus_dir, manifest, repeat, thread_count, batch_size, preprocess):
+    processor = ImageProcessor(bench_settings(thread_count, batch_size, preprocess))
+    images_root = os.path.join(corpus_dir, manifest["images_dir"])
+    paths = [os.path.join(corpus_dir, image["path"]) for image in manifest["images"]]
+
+    variant = resolve_variant(None, processor.settings)
+    template = processor._preprocess_image(
+        cv2.imread(os.path.join(corpus_dir, manifest["template"]), cv2.IMREAD_GRAYSCALE), variant)
+    decoded = [cv2.imread(path) for path in paths]
+    grays = [cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) for image in decoded]
+    preprocessed = [processor._preprocess_image(gray, variant) for gray in grays]
+
+    stages = {}
+    stages["scan"] = measure(lambda: processor._get_image_paths(images_root, True), repeat, len(paths))
+    stages["decode"] = measure(lambda: [cv2.imread(path) for path in paths], repeat, len(paths))
+    stages["preprocess"] = measure(lambda: [processor._preprocess_image(gray, variant) for gray in grays],
+                                   repeat, len(paths))
+    stages["match"] = measure(
+        lambda: [cv2.minMaxLoc(cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)) for gray in preprocessed],
+        repeat, len(paths))
+    prepared = PreparedTemplate(manifest["template"], template, variant)
+    template_set = TemplateSet([TemplateEntry(prepared, 0.8)], variant)
+    stages["image_batch"] = measure(lambda: processor._process_image_batch(paths, template_set),
+                                    repeat, len(paths))
+
+    log_dir = tempfile.mkdtemp(prefix="bench_logs_")
+    try:
+        log_manager = LogManager(log_dir)
+        log_count = 200
+        logs = [ExecutionLog(task_id=f"task-{i}", task_name=f"任务{i}", status="成功",
+                             message="匹配成功", matched=True, match_score=0.9)
+                for i in range(log_count)]
+        stages["log_write"] = measure(lambda: [log_manager.save_log(log) for log in logs], repeat, log_count)
+
+        task = make_task(corpus_dir, manifest)
+        stages["process_task"] = measure(lambda: processor.process_task(task, log_manager), repeat, len(paths))
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+    return stages
+
+def compare(results, baseline, tolerance):
+    """与基线对比中位数耗时，返回回退的阶段列表"""
+    regressions = []
+    print(f"{'阶段':<14}{'基线(ms)':>12}{'当前(ms)':>12}{'变化':>10}")
+    for name, stage in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            print(f"{name:<14}{'-':>12}{stage['median_s'] * 1000:>12.2f}{'新增':>10}")
+            continue
+
+        ratio = stage["median_s"] / base["median_s"] if base["median_s"] > 0 else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = " 回退"
+        print(f"{name:<14}{base['median_s'] * 1000:>12.2f}{stage['median_s'] * 1000:>12.2f}"
+              f"{(ratio - 1) * 100:>+9.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="图像处理流水线微基准测试")
+    parser.add_argument("--corpus", default="bench_corpus", help="语料目录（不存在时自动生成）")
+    parser.add_argument("--count", type=int, default=200, help="语料图片数量")
+    parser.add_argument("--seed", type=int, default=42, help="语料随机种子")
+    parser.add_argument("--repeat", type=int, default=5, help="每个阶段的重复次数")
+    parser.add_argument("--threads", type=int, default=4, help="处理线程数")
+    parser.add_argument("--batch-size", type=int, default=10, help="批量处理大小")
+    parser.add_argument("--no-preprocess", action="store_true", help="关闭图像预处理")
+    parser.add_argument("--out", default="bench_results.json", help="结果输出文件")
+    parser.add_argument("--baseline", help="用于对比的基线结果文件")
+    parser.add_argument("--save-baseline", help="将本次结果另存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许的回退比例")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.corpus, count=args.count, seed=args.seed)
+    stages = run_benchmarks(args.corpus, manifest, args.repeat, args.threads,
+                            args.batch_size, not args.no_preprocess)
+
+    results = {
+        "meta": {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "corpus": manifest["params"],
+            "threads": args.threads,
+            "batch_size": args.batch_size,
+            "preprocess": not args.no_preprocess
+        },
+        "stages": stages
+    }
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"结果已写入 {args.out}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"基线已保存到 {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"性能回退: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
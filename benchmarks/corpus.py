@@ -0,0 +1,123 @@
+"""确定性的合成图片语料生成器
+
+用法:
+    python -m benchmarks.corpus --out bench_corpus --count 200 --seed 42
+
+同样的参数总是生成完全相同的语料：不同尺寸、格式和目录深度的背景图，
+其中一部分在已知位置植入了模板，位置信息写入 manifest.json。
+"""
+import os
+import json
+import argparse
+import numpy as np
+import cv2
+
+DEFAULT_SIZES = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+DEFAULT_FORMATS = [".png", ".jpg", ".bmp"]
+MANIFEST_NAME = "manifest.json"
+TEMPLATE_NAME = "template.png"
+
+def make_template(rng, size=48):
+    """生成带有明显结构的模板（避免纯噪声导致匹配得分不稳定）"""
+    template = rng.integers(0, 256, (size // 8, size // 8), dtype=np.uint8)
+    template = cv2.resize(template, (size, size), interpolation=cv2.INTER_NEAREST)
+    cv2.rectangle(template, (2, 2), (size - 3, size - 3), 255, 2)
+    cv2.line(template, (0, 0), (size - 1, size - 1), 0, 2)
+    return cv2.cvtColor(template, cv2.COLOR_GRAY2BGR)
+
+def make_background(rng, width, height):
+    """生成平滑噪声背景，近似真实截图的低频内容"""
+    small = rng.integers(0, 256, (max(height // 16, 2), max(width // 16, 2), 3), dtype=np.uint8)
+    background = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    noise = rng.integers(-12, 13, background.shape, dtype=np.int16)
+    return np.clip(background.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def corpus_params(count, seed, max_depth, plant_ratio, sizes, formats, template_size):
+    return {
+        "count": count,
+        "seed": seed,
+        "max_depth": max_depth,
+        "plant_ratio": plant_ratio,
+        "sizes": [list(size) for size in sizes],
+        "formats": list(formats),
+        "template_size": template_size
+    }
+
+def generate_corpus(out_dir, count=200, seed=42, max_depth=3, plant_ratio=0.25,
+                    sizes=None, formats=None, template_size=48):
+    """生成语料并返回 manifest；参数相同且语料已存在时直接复用"""
+    sizes = sizes or DEFAULT_SIZES
+    formats = formats or DEFAULT_FORMATS
+    params = corpus_params(count, seed, max_depth, plant_ratio, sizes, formats, template_size)
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            return manifest
+
+    rng = np.random.default_rng(seed)
+    images_dir = os.path.join(out_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    template = make_template(rng, template_size)
+    template_path = os.path.join(out_dir, TEMPLATE_NAME)
+    cv2.imwrite(template_path, template)
+
+    images = []
+    for index in range(count):
+        width, height = sizes[index % len(sizes)]
+        ext = formats[(index // len(sizes)) % len(formats)]
+        depth = int(rng.integers(0, max_depth + 1))
+
+        # 目录深度 0..max_depth，每层按编号分散到几个子目录
+        parts = [f"d{level}_{int(rng.integers(0, 3))}" for level in range(depth)]
+        image_dir = os.path.join(images_dir, *parts)
+        os.makedirs(image_dir, exist_ok=True)
+
+        image = make_background(rng, width, height)
+        planted = bool(rng.random() < plant_ratio)
+        position = None
+        if planted:
+            x = int(rng.integers(0, width - template_size))
+            y = int(rng.integers(0, height - template_size))
+            image[y:y + template_size, x:x + template_size] = template
+            position = [x, y]
+
+        image_path = os.path.join(image_dir, f"img_{index:05d}{ext}")
+        cv2.imwrite(image_path, image)
+        images.append({
+            "path": os.path.relpath(image_path, out_dir),
+            "width": width,
+            "height": height,
+            "depth": depth,
+            "planted": planted,
+            "position": position
+        })
+
+    manifest = {
+        "params": params,
+        "template": TEMPLATE_NAME,
+        "images_dir": "images",
+        "images": images
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="生成确定性的合成图片语料")
+    parser.add_argument("--out", default="bench_corpus", help="输出目录")
+    parser.add_argument("--count", type=int, default=200, help="图片数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--max-depth", type=int, default=3, help="最大目录深度")
+    parser.add_argument("--plant-ratio", type=float, default=0.25, help="植入模板的图片比例")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out, args.count, args.seed, args.max_depth, args.plant_ratio)
+    planted = sum(1 for image in manifest["images"] if image["planted"])
+    print(f"语料已生成: {args.out} ({len(manifest['images'])} 张图片, {planted} 张植入模板)")
+
+if __name__ == "__main__":
+    main()
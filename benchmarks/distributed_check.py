@@ -0,0 +1,144 @@
+"""协调者 + 工作者端到端检查（本机，无界面）
+
+用法:
+    python -m benchmarks.distributed_check --corpus bench_corpus --count 120
+
+在本机随机端口上启动协调者，分别检查:
+    1. 两个工作者进程处理的结果与本地匹配完全一致
+    2. 认证密钥错误的工作者无法连接
+    3. 一个工作者中途被杀掉，租约过期后分片由另一个工作者完成
+    4. 没有工作者时等待超时后改在本地匹配
+    5. 任务被停止时只有该次运行的分发立即中止
+    6. 端口被占用时协调者启动失败（抛出 OSError）
+任何一项不通过时以非零状态退出。
+"""
+import os
+import sys
+import json
+import socket
+import time
+import argparse
+import threading
+import multiprocessing
+from multiprocessing import AuthenticationError
+from benchmarks.corpus import generate_corpus
+from src.models.task import Task
+from src.services.distributed import DistributedCoordinator, ShardsCancelled, run_worker
+from src.services.image_processor import ImageProcessor
+from src.services.metrics import NULL_RUN_METRICS
+
+def start_worker(address, authkey, worker_id):
+    process = multiprocessing.Process(target=run_worker, args=(address, authkey, 1, worker_id, 5), daemon=True)
+    process.start()
+    return process
+
+def summarize(results):
+    return sorted((result["path"], result["matched"], round(float(result["score"]), 4)) for result in results)
+
+def make_coordinator(settings):
+    settings = dict(settings, distributed_address="127.0.0.1:0")
+    coordinator = DistributedCoordinator(settings)
+    return coordinator, settings
+
+def run_check(corpus_dir, count, shard_size):
+    manifest = generate_corpus(corpus_dir, count=count)
+    image_files = sorted(os.path.join(corpus_dir, image["path"]) for image in manifest["images"])
+    task = Task(name="distributed-check", image_path=corpus_dir,
+                templates=[{"path": os.path.join(corpus_dir, manifest["template"]), "threshold": 0.8}])
+    base = {"thread_count": 2, "batch_size": 10, "result_store_enabled": False, "distributed_shard_size": shard_size,
+            "distributed_lease_seconds": 3, "distributed_wait_seconds": 2}
+
+    local = ImageProcessor(base)
+    expected = summarize(local._run_algorithm(task, image_files, NULL_RUN_METRICS))
+    checks = {}
+
+    def run_distributed(coordinator, settings, cancel_event=None):
+        processor = ImageProcessor(settings)
+        processor.shard_runner = lambda *args: coordinator.run_shards(*args, cancel_event=cancel_event)
+        return processor._run_algorithm(task, image_files, NULL_RUN_METRICS)
+
+    # 1. 两个工作者
+    coordinator, settings = make_coordinator(base)
+    workers = [start_worker(coordinator.address, settings["distributed_authkey"], f"worker-{index}")
+               for index in range(2)]
+    start = time.perf_counter()
+    results = run_distributed(coordinator, settings)
+    checks["two_workers"] = {"ok": summarize(results) == expected, "images": len(results),
+                             "seconds": round(time.perf_counter() - start, 3)}
+
+    # 2. 错误的认证密钥
+    try:
+        run_worker(coordinator.address, "wrong-key", idle_exit=0)
+        checks["wrong_authkey_rejected"] = {"ok": False}
+    except AuthenticationError:
+        checks["wrong_authkey_rejected"] = {"ok": True}
+
+    for worker in workers:
+        worker.join(timeout=10)
+    coordinator.shutdown()
+
+    # 3. 工作者中途被杀掉
+    coordinator, settings = make_coordinator(base)
+    victim = start_worker(coordinator.address, settings["distributed_authkey"], "victim")
+    threading.Timer(0.5, victim.kill).start()
+    survivors = []
+    threading.Timer(1.0, lambda: survivors.append(
+        start_worker(coordinator.address, settings["distributed_authkey"], "survivor"))).start()
+    results = run_distributed(coordinator, settings)
+    checks["worker_killed"] = {"ok": summarize(results) == expected, "images": len(results)}
+    for worker in survivors:
+        worker.join(timeout=10)
+    coordinator.shutdown()
+
+    # 4. 没有工作者：等待超时后本地匹配
+    coordinator, settings = make_coordinator(base)
+    start = time.perf_counter()
+    results = run_distributed(coordinator, settings)
+    checks["local_fallback"] = {"ok": summarize(results) == expected,
+                                "seconds": round(time.perf_counter() - start, 3)}
+    coordinator.shutdown()
+
+    # 5. 任务被停止：只取消被停止的那次运行，同时进行的另一次运行照常完成
+    coordinator, settings = make_coordinator(dict(base, distributed_wait_seconds=600))
+    stopped, other = threading.Event(), threading.Event()
+    other_results = []
+    other_thread = threading.Thread(target=lambda: other_results.extend(run_distributed(coordinator, settings, other)))
+    other_thread.start()
+    threading.Timer(0.5, stopped.set).start()
+    try:
+        run_distributed(coordinator, settings, stopped)
+        cancelled = False
+    except ShardsCancelled:
+        cancelled = True
+    worker = start_worker(coordinator.address, settings["distributed_authkey"], "after-stop")
+    other_thread.join(timeout=60)
+    checks["stop_cancels"] = {"ok": cancelled and summarize(other_results) == expected}
+    worker.join(timeout=10)
+    coordinator.shutdown()
+
+    # 6. 端口被占用时抛出 OSError（TaskExecutor 捕获后改在本地匹配）
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        try:
+            DistributedCoordinator(dict(base, distributed_address="127.0.0.1:%d" % busy.getsockname()[1]))
+            checks["port_in_use"] = {"ok": False}
+        except OSError:
+            checks["port_in_use"] = {"ok": True}
+
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="协调者 + 工作者端到端检查")
+    parser.add_argument("--corpus", default="bench_corpus", help="语料目录（不存在时自动生成）")
+    parser.add_argument("--count", type=int, default=120, help="图片数量")
+    parser.add_argument("--shard-size", type=int, default=10, help="分片大小")
+    args = parser.parse_args()
+
+    checks = run_check(args.corpus, args.count, args.shard_size)
+    print(json.dumps(checks, indent=4, ensure_ascii=False))
+    if not all(check["ok"] for check in checks.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""TaskExecutor / LogManager 端到端负载测试（无界面）
+
+用法:
+    python -m benchmarks.load_test --tasks 300 --concurrency 0 --rate 0
+    python -m benchmarks.load_test --tasks 500 --concurrency 32 --rate 50 --out load_results.json
+
+在临时目录中创建 N 个覆盖合成语料的任务，按指定并发上限和到达速率驱动
+TaskExecutor，统计任务延迟 p50/p95/p99、吞吐量、日志写入速率、峰值内存和线程数，
+并检查 running_tasks 是否始终保持一致。任务动作由本地空操作替代，不会执行系统命令。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from benchmarks.corpus import generate_corpus
+from src.models.task import Task, TaskManager
+from src.models.execution_log import LogManager
+from src.models.settings import Settings
+from src.services.task_executor import TaskExecutor
+
+FINAL_STATUSES = ("成功", "失败")
+
+class RecordingLogManager(LogManager):
+    """记录日志写入次数、耗时和每个任务的完成时间"""
+
+    def __init__(self, logs_dir):
+        super().__init__(logs_dir)
+        self.lock = threading.Lock()
+        self.write_count = 0
+        self.write_seconds = 0.0
+        self.finished = {}  # task_id -> 完成时间
+        self.duplicate_finishes = 0
+
+    def add_log(self, log):
+        start = time.perf_counter()
+        result = super().add_log(log)
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.write_count += 1
+            self.write_seconds += elapsed
+            if log.status in FINAL_STATUSES:
+                if log.task_id in self.finished:
+                    self.duplicate_finishes += 1
+                else:
+                    self.finished[log.task_id] = time.perf_counter()
+        return result
+
+class NoopActions:
+    """替代 _execute_action 的空操作，只统计调用次数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, action):
+        with self.lock:
+            self.calls += 1
+
+def current_rss_bytes():
+    """当前常驻内存（Linux 下读取 /proc，其他平台返回 None）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def percentile(values, pct):
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+class Sampler(threading.Thread):
+    """周期性采样线程数、运行中任务数和内存"""
+
+    def __init__(self, executor, interval=0.05):
+        super().__init__(daemon=True)
+        self.executor = executor
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.max_threads = threading.active_count()
+        self.max_running = 0
+        self.max_rss = current_rss_bytes() or 0
+        self.samples = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.max_threads = max(self.max_threads, threading.active_count())
+            self.max_running = max(self.max_running, len(self.executor.running_tasks))
+            self.max_rss = max(self.max_rss, current_rss_bytes() or 0)
+            self.samples += 1
+            self.stop_event.wait(self.interval)
+
+def run_load_test(corpus_dir, task_count, concurrency, rate, settings, timeout):
+    manifest = generate_corpus(corpus_dir, count=max(20, min(task_count, 200)))
+    image_files = [os.path.join(corpus_dir, image["path"]) for image in manifest["images"]]
+    template_file = os.path.join(corpus_dir, manifest["template"])
+
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        task_manager = TaskManager(os.path.join(work_dir, "tasks"))
+        log_manager = RecordingLogManager(os.path.join(work_dir, "logs"))
+        executor_settings = Settings(os.path.join(work_dir, "settings.json"))
+        # 所有路径设置都指向临时目录，测试结束后不在当前目录留下缓存、日志或指标文件
+        executor_settings.update(dict(settings,
+                                      task_path=os.path.join(work_dir, "tasks"),
+                                      log_path=os.path.join(work_dir, "logs"),
+                                      cache_path=os.path.join(work_dir, "cache"),
+                                      metrics_json_path=os.path.join(work_dir, "metrics.json")))
+        executor = TaskExecutor(task_manager, log_manager, executor_settings)
+        actions = NoopActions()
+        executor.image_processor._execute_action = actions
+
+        for i in range(task_count):
+            task_manager.add_task(Task(
+                name=f"负载任务{i}",
+                image_path=image_files[i % len(image_files)],
+                templates=[{"path": template_file, "threshold": None}],
+                match_action="noop",
+                fail_action="noop",
+                threshold=0.8,
+                recursive=False
+            ))
+
+        rss_start = current_rss_bytes()
+        sampler = Sampler(executor)
+        sampler.start()
+
+        submitted = {}
+        rejected = 0
+        overflow = 0
+        interval = 1.0 / rate if rate > 0 else 0
+        start = time.perf_counter()
+
+        for index, task in enumerate(task_manager.get_all_tasks()):
+            if interval:
+                # 按固定到达速率提交
+                delay = start + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            while concurrency and len(executor.running_tasks) >= concurrency:
+                time.sleep(0.001)
+
+            submitted_at = time.perf_counter()
+            success, _ = executor.execute_task(task.id)
+            if success:
+                submitted[task.id] = submitted_at
+            else:
+                rejected += 1
+            if concurrency and len(executor.running_tasks) > concurrency:
+                overflow += 1
+
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with log_manager.lock:
+                done = len(log_manager.finished)
+            if done >= len(submitted) and not executor.running_tasks:
+                break
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        # 给正在退出的线程一点时间，再检查 running_tasks
+        time.sleep(0.1)
+        sampler.stop_event.set()
+        sampler.join()
+
+        with log_manager.lock:
+            finished = dict(log_manager.finished)
+        latencies = [finished[task_id] - submitted_at
+                     for task_id, submitted_at in submitted.items() if task_id in finished]
+        missing = [task_id for task_id in submitted if task_id not in finished]
+
+        return {
+            "meta": {
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "tasks": task_count,
+                "concurrency": concurrency,
+                "rate": rate,
+                "settings": settings
+            },
+            "latency_ms": {
+                "p50": (percentile(latencies, 50) or 0) * 1000,
+                "p95": (percentile(latencies, 95) or 0) * 1000,
+                "p99": (percentile(latencies, 99) or 0) * 1000,
+                "max": max(latencies) * 1000 if latencies else 0
+            },
+            "throughput": {
+                "elapsed_s": elapsed,
+                "tasks_per_s": len(latencies) / elapsed if elapsed > 0 else 0,
+                "log_writes": log_manager.write_count,
+                "log_writes_per_s": log_manager.write_count / elapsed if elapsed > 0 else 0,
+                "log_write_avg_ms": (log_manager.write_seconds / log_manager.write_count * 1000
+                                     if log_manager.write_count else 0),
+                "actions": actions.calls
+            },
+            "resources": {
+                "peak_rss_mb": peak_rss_bytes() / 1024 / 1024,
+                "sampled_peak_rss_mb": sampler.max_rss / 1024 / 1024,
+                "rss_growth_mb": ((current_rss_bytes() or 0) - (rss_start or 0)) / 1024 / 1024,
+                "peak_threads": sampler.max_threads,
+                "peak_running_tasks": sampler.max_running
+            },
+            "consistency": {
+                "submitted": len(submitted),
+                "rejected": rejected,
+                "completed": len(latencies),
+                "missing": len(missing),
+                "duplicate_finishes": log_manager.duplicate_finishes,
+                "running_tasks_left": len(executor.running_tasks),
+                "concurrency_overflow": overflow,
+                "ok": (not missing and not executor.running_tasks
+                       and log_manager.duplicate_finishes == 0)
+            }
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="TaskExecutor / LogManager 负载测试")
+    parser.add_argument("--corpus", default="bench_corpus", help="语料目录（不存在时自动生成）")
+    parser.add_argument("--tasks", type=int, default=200, help="任务数量")
+    parser.add_argument("--concurrency", type=int, default=0, help="同时运行的任务上限，0 表示不限制")
+    parser.add_argument("--rate", type=float, default=0, help="每秒提交的任务数，0 表示一次性全部提交")
+    parser.add_argument("--threads", type=int, default=4, help="每个任务的处理线程数")
+    parser.add_argument("--batch-size", type=int, default=10, help="批量处理大小")
+    parser.add_argument("--timeout", type=float, default=600, help="等待所有任务完成的超时秒数")
+    parser.add_argument("--out", help="结果输出文件（JSON）")
+    args = parser.parse_args()
+
+    settings = {
+        "thread_count": args.threads,
+        "batch_size": args.batch_size,
+        "preprocess_image": True,
+        "image_algorithm": "模板匹配"
+    }
+    results = run_load_test(args.corpus, args.tasks, args.concurrency, args.rate, settings, args.timeout)
+
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    if not results["consistency"]["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""列式日志存储的过滤检查（无界面）
+
+用法:
+    python -m benchmarks.log_store_check
+
+分别检查:
+    1. 正常的开始 / 结束时间按范围过滤
+    2. 格式错误的时间（界面中手工输入）当作没有这一端的限制，不抛出异常
+任何一项不通过时以非零状态退出。
+"""
+import sys
+import json
+from src.models.execution_log import ExecutionLog
+from src.models.log_store import ColumnarLogStore
+
+def rows_of(indices):
+    return [int(row) for row in indices]
+
+def make_store():
+    store = ColumnarLogStore()
+    for day in range(1, 6):
+        store.append(ExecutionLog(task_id="task", task_name="检查", status="成功",
+                                  start_time=f"2026-01-0{day} 10:00:00", end_time=f"2026-01-0{day} 10:05:00"))
+    return store
+
+def run_check():
+    store = make_store()
+    everything = rows_of(store.filter())
+    checks = {}
+
+    rows = rows_of(store.filter(start_time="2026-01-02 00:00:00", end_time="2026-01-04 23:59:59"))
+    checks["valid_range"] = {"ok": rows == [1, 2, 3], "rows": rows}
+
+    for name, start_time, end_time, expected in (
+            ("malformed_start", "2026-13-45", None, everything),
+            ("malformed_end", None, "昨天", everything),
+            ("malformed_start_valid_end", "abc", "2026-01-02 23:59:59", [0, 1])):
+        try:
+            rows = rows_of(store.filter(start_time=start_time, end_time=end_time))
+            checks[name] = {"ok": rows == expected, "rows": rows}
+        except Exception as e:
+            checks[name] = {"ok": False, "error": repr(e)}
+    return checks
+
+def main():
+    checks = run_check()
+    print(json.dumps(checks, indent=4, ensure_ascii=False))
+    if not all(check["ok"] for check in checks.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""读取阶段检查（无界面）：模拟高延迟存储，在途批次远大于读取线程数时，解码线程不再自己读取文件
+
+用法:
+    python -m benchmarks.prefetch_check --corpus bench_corpus --count 200 --latency-ms 5
+
+分别检查:
+    1. 在途图片（线程数 × 批量大小）远多于读取线程时，所有文件都由读取线程提前读取，结果与 imread 一致
+    2. 已读未取的字节数上限很小时，超出部分由解码线程直接读取，结果仍然一致
+任何一项不通过时以非零状态退出。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from benchmarks.corpus import generate_corpus
+from src.models.task import Task
+from src.services import prefetch
+from src.services import image_processor as image_processor_module
+from src.services.image_processor import ImageProcessor
+from src.services.metrics import registry as metrics_registry
+
+def summarize(results):
+    return sorted((result["path"], result["matched"], round(float(result["score"]), 4)) for result in results)
+
+class RecordingPrefetcher(prefetch.FilePrefetcher):
+    """记下每次运行创建的读取阶段，检查解码线程直接读取了多少文件"""
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        RecordingPrefetcher.instances.append(self)
+
+def run_batches(settings, task, image_files):
+    processor = ImageProcessor(settings)
+    run_metrics = metrics_registry.new_run()
+    start = time.perf_counter()
+    results = processor._run_batches(image_files, processor._load_templates(task), run_metrics)
+    return results, time.perf_counter() - start
+
+def run_check(corpus_dir, count, latency):
+    manifest = generate_corpus(corpus_dir, count=count)
+    image_files = sorted(os.path.join(corpus_dir, image["path"]) for image in manifest["images"])
+    task = Task(name="prefetch-check", image_path=corpus_dir,
+                templates=[{"path": os.path.join(corpus_dir, manifest["template"]), "threshold": 0.8}])
+    base = {"thread_count": 4, "batch_size": 25, "result_store_enabled": False, "memory_budget_mb": 0}
+
+    expected, _ = run_batches(dict(base, io_thread_count=0), task, image_files)
+    expected = summarize(expected)
+
+    # 模拟网络存储：每次读取先等待 latency 秒
+    read_file = prefetch.read_file
+    def slow_read(path):
+        time.sleep(latency)
+        return read_file(path)
+    prefetch.read_file = slow_read
+    image_processor_module.FilePrefetcher = RecordingPrefetcher
+    checks = {}
+    try:
+        # 1. 在途 4 × 25 = 100 张图片，读取线程只有 2 个（旧实现只提前读取 8 个文件）
+        RecordingPrefetcher.instances.clear()
+        results, seconds = run_batches(dict(base, io_thread_count=2), task, image_files)
+        direct_reads = sum(instance.direct_reads for instance in RecordingPrefetcher.instances)
+        checks["batch_spread_larger_than_io_threads"] = {
+            "ok": summarize(results) == expected and direct_reads == 0,
+            "direct_reads": direct_reads, "seconds": round(seconds, 3)}
+
+        # 2. 字节上限很小：超出部分由解码线程直接读取
+        RecordingPrefetcher.instances.clear()
+        results, seconds = run_batches(dict(base, io_thread_count=2, io_prefetch_mb=0.01), task, image_files)
+        direct_reads = sum(instance.direct_reads for instance in RecordingPrefetcher.instances)
+        checks["byte_limit"] = {"ok": summarize(results) == expected, "direct_reads": direct_reads,
+                                "seconds": round(seconds, 3)}
+    finally:
+        prefetch.read_file = read_file
+        image_processor_module.FilePrefetcher = prefetch.FilePrefetcher
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="读取阶段检查")
+    parser.add_argument("--corpus", default="bench_corpus", help="语料目录（不存在时自动生成）")
+    parser.add_argument("--count", type=int, default=200, help="图片数量")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="模拟的每次读取延迟（毫秒）")
+    args = parser.parse_args()
+
+    checks = run_check(args.corpus, args.count, args.latency_ms / 1000)
+    print(json.dumps(checks, indent=4, ensure_ascii=False))
+    if not all(check["ok"] for check in checks.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,39 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from src.views.main_window import MainWindow
+from src.utils.startup_profiler import profiler
+
+with profiler.phase("导入 PyQt5"):
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+
+with profiler.phase("导入界面模块"):
+    from src.views.main_window import MainWindow
+
+with profiler.phase("导入控制器模块"):
+    from src.controller.main_controller import MainController
+
+def on_first_window_shown():
+    """事件循环开始后窗口已经可见，输出启动耗时报告"""
+    profiler.mark("首个窗口显示")
+    if profiler.enabled:
+        print(profiler.report())
+        profiler.save_report()
 
 def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
+    with profiler.phase("创建 QApplication"):
+        app = QApplication(sys.argv)
+    
+    with profiler.phase("创建主窗口"):
+        window = MainWindow()
+    
+    with profiler.phase("创建控制器"):
+        controller = MainController(window)
+        app.aboutToQuit.connect(controller.shutdown)
+    
+    with profiler.phase("显示主窗口"):
+        window.show()
+    
+    QTimer.singleShot(0, on_first_window_shown)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()    
\ No newline at end of file
+    main()
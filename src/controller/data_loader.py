@@ -0,0 +1,36 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+class DataLoader(QThread):
+    """后台加载任务和日志，分批通过信号交给界面线程"""
+    tasks_loaded = pyqtSignal(list)
+    logs_loaded = pyqtSignal(list)
+    loading_finished = pyqtSignal(int, int)
+
+    def __init__(self, task_manager, log_manager, load_tasks=True, chunk_size=200):
+        super().__init__()
+        self.task_manager = task_manager
+        self.log_manager = log_manager
+        self.load_tasks = load_tasks
+        self.chunk_size = chunk_size
+
+    def run(self):
+        task_count = 0
+        log_count = 0
+
+        # 先加载任务，任务表格通常比日志更早被用到
+        if self.load_tasks:
+            for chunk in self.task_manager.iter_load_tasks(self.chunk_size):
+                task_count += len(chunk)
+                self.tasks_loaded.emit(chunk)
+
+        # 上次异常退出或还没有统计文件时，从历史日志重建运行统计
+        self.log_manager.ensure_rollups()
+        
+        # 先压缩已结束日期的日志并执行保留策略，再加载
+        self.log_manager.maintain()
+        
+        for chunk in self.log_manager.iter_load_logs(chunk_size=self.chunk_size):
+            log_count += len(chunk)
+            self.logs_loaded.emit(chunk)
+
+        self.loading_finished.emit(task_count, log_count)
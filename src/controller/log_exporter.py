@@ -0,0 +1,28 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+from src.services.log_export import export_logs, ExportCancelled
+
+class LogExporter(QThread):
+    """后台导出日志，通过信号报告进度，可随时取消"""
+    progress = pyqtSignal(int, int, int)  # 已处理天数, 总天数, 已导出条数
+    export_finished = pyqtSignal(bool, int, str)  # 是否成功, 导出条数, 消息
+
+    def __init__(self, logs_dir, out_path, filters):
+        super().__init__()
+        self.logs_dir = logs_dir
+        self.out_path = out_path
+        self.filters = filters
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            count = export_logs(self.logs_dir, self.out_path, filters=self.filters,
+                                progress=self.progress.emit, cancel_event=self.cancel_event)
+            self.export_finished.emit(True, count, f"已导出 {count} 条日志到 {self.out_path}")
+        except ExportCancelled:
+            self.export_finished.emit(False, 0, "导出已取消")
+        except Exception as e:
+            self.export_finished.emit(False, 0, f"导出失败: {e}")
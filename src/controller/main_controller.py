@@ -1,20 +1,43 @@
-from src.models.task import Task, TaskManager
+import os
+from PyQt5.QtWidgets import QTableWidgetItem, QMessageBox, QFileDialog, QProgressDialog
+from src.models.task import (Task, TaskManager, parse_templates, format_templates,
+                             parse_time_windows, format_time_windows)
 from src.models.execution_log import LogManager
 from src.models.settings import Settings
+from src.models.score_table import ScoreTable, score_table_file
+from src.models.result_store import close_result_stores
 from src.services.task_executor import TaskExecutor
-from src.services.image_processor import ImageProcessor
+from src.services.metrics import configure_metrics
+from src.services.job_server import JobServer
+from src.services.scheduler import parse_schedule_text, format_schedule_text
+from src.controller.data_loader import DataLoader
+from src.controller.log_exporter import LogExporter
+from src.views.task_manager import FOLLOW_GLOBAL
+from src.views.calibration import ThresholdCalibrationDialog
+from src.utils.startup_profiler import profiler
 
 class MainController:
     def __init__(self, main_window):
         self.main_window = main_window
         
+        self.data_loader = None
+        self.log_exporter = None
+        
         # 初始化模型
-        self.settings = Settings()
-        self.task_manager = TaskManager(self.settings.get("task_path"))
-        self.log_manager = LogManager(self.settings.get("log_path"))
+        with profiler.phase("初始化模型"):
+            self.settings = Settings()
+            self.task_manager = TaskManager(self.settings.get("task_path"))
+            self.log_manager = LogManager(self.settings.get("log_path"), self.settings)
         
         # 初始化服务
-        self.task_executor = TaskExecutor(self.task_manager, self.log_manager, self.settings)
+        with profiler.phase("初始化服务"):
+            self.task_executor = TaskExecutor(self.task_manager, self.log_manager, self.settings)
+            
+            # 本地任务服务（可选），供其他程序提交任务
+            self.job_server = None
+            if self.settings.get("job_server_enabled", False):
+                self.job_server = JobServer(self.task_manager, self.task_executor,
+                                            self.log_manager, self.settings).start()
         
         # 加载数据
         self.load_data()
@@ -23,16 +46,36 @@ class MainController:
         self.connect_view_signals()
     
     def load_data(self):
-        """加载应用数据"""
+        """加载应用数据（任务和日志在后台线程中分批加载）"""
         # 加载设置
         self.load_settings()
         
-        # 加载任务（如果设置为自动加载）
-        if self.settings.get("auto_load_tasks", True):
-            self.load_tasks()
-        
-        # 加载日志
-        self.load_logs()
+        # 加载任务（如果设置为自动加载）和日志
+        self.data_loader = DataLoader(
+            self.task_manager, self.log_manager,
+            load_tasks=self.settings.get("auto_load_tasks", True)
+        )
+        self.data_loader.tasks_loaded.connect(self.on_tasks_loaded)
+        self.data_loader.logs_loaded.connect(self.on_logs_loaded)
+        self.data_loader.loading_finished.connect(self.on_loading_finished)
+        self.data_loader.start()
+    
+    def on_tasks_loaded(self, tasks):
+        """后台加载的一批任务到达"""
+        self.task_manager.tasks.extend(tasks)
+        self.append_task_rows(tasks)
+    
+    def on_logs_loaded(self, logs):
+        """后台加载的一批日志到达"""
+        self.log_manager.store.extend(logs)
+        self.append_log_display(logs)
+    
+    def on_loading_finished(self, task_count, log_count):
+        """后台加载完成，按开始时间重新排序显示日志"""
+        self.sync_schedules()
+        self.log_manager.sort_logs()
+        self.update_log_display(self.log_manager.logs)
+        profiler.mark("数据加载完成")
     
     def load_settings(self):
         """加载应用设置"""
@@ -57,23 +100,48 @@ class MainController:
         task_tab.task_table.setRowCount(len(tasks))
         
         for row, task in enumerate(tasks):
-            task_tab.task_table.setItem(row, 0, QTableWidgetItem(task.id))
-            task_tab.task_table.setItem(row, 1, QTableWidgetItem(task.name))
-            task_tab.task_table.setItem(row, 2, QTableWidgetItem(task.image_path))
-            task_tab.task_table.setItem(row, 3, QTableWidgetItem(task.match_action))
-            task_tab.task_table.setItem(row, 4, QTableWidgetItem(task.fail_action))
-            task_tab.task_table.setItem(row, 5, QTableWidgetItem(task.status))
+            self.set_task_row(row, task)
+    
+    def append_task_rows(self, tasks):
+        """在任务表格末尾追加任务"""
+        task_tab = self.main_window.task_manager_tab
+        start_row = task_tab.task_table.rowCount()
+        task_tab.task_table.setRowCount(start_row + len(tasks))
+        
+        for offset, task in enumerate(tasks):
+            self.set_task_row(start_row + offset, task)
+    
+    def set_task_row(self, row, task):
+        """填充任务表格的一行"""
+        task_tab = self.main_window.task_manager_tab
+        task_tab.task_table.setItem(row, 0, QTableWidgetItem(task.id))
+        task_tab.task_table.setItem(row, 1, QTableWidgetItem(task.name))
+        task_tab.task_table.setItem(row, 2, QTableWidgetItem(task.image_path))
+        task_tab.task_table.setItem(row, 3, QTableWidgetItem(task.match_action))
+        task_tab.task_table.setItem(row, 4, QTableWidgetItem(task.fail_action))
+        task_tab.task_table.setItem(row, 5, QTableWidgetItem(task.status))
     
     def update_log_display(self, logs):
         """更新日志显示"""
         log_tab = self.main_window.execution_log_tab
-        log_text = ""
-        
+        log_tab.log_text.setHtml("".join(self.format_log_entry(log) for log in logs))
+    
+    def append_log_display(self, logs):
+        """在日志显示末尾追加日志"""
+        log_tab = self.main_window.execution_log_tab
         for log in logs:
-            status_color = "green" if log.status == "成功" else "red" if log.status == "失败" else "blue"
-            match_text = "匹配成功" if log.matched else "匹配失败"
-            
-            log_entry = f"""
+            log_tab.log_text.append(self.format_log_entry(log))
+    
+    def format_log_entry(self, log):
+        """生成单条日志的 HTML"""
+        status_color = "green" if log.status == "成功" else "red" if log.status == "失败" else "blue"
+        match_text = "匹配成功" if log.matched else "匹配失败"
+        if log.new_image_count is not None:
+            match_text += f"，新增图片 {log.new_image_count} 张"
+        if log.matched_frame is not None:
+            match_text += f"，第 {log.matched_frame} 帧（{log.matched_timestamp:.3f} 秒）"
+        
+        return f"""
             <div style="border-bottom: 1px solid #eee; padding: 8px 0;">
                 <div style="font-weight: bold; color: {status_color};">{log.task_name} - {log.status}</div>
                 <div style="color: #666;">{log.start_time} - {log.end_time or ''}</div>
@@ -81,9 +149,6 @@ class MainController:
                 <div>{match_text} (得分: {log.match_score or 'N/A'})</div>
             </div>
             """
-            log_text += log_entry
-        
-        log_tab.log_text.setHtml(log_text)
     
     def connect_view_signals(self):
         """连接视图组件的信号到控制器方法"""
@@ -95,12 +160,14 @@ class MainController:
         task_tab.execute_task_btn.clicked.connect(self.handle_execute_task)
         task_tab.execute_all_btn.clicked.connect(self.handle_execute_all_tasks)
         task_tab.save_task_btn.clicked.connect(self.handle_save_task)
+        task_tab.calibrate_btn.clicked.connect(self.handle_calibrate_threshold)
         
         # 日志标签页信号
         log_tab = self.main_window.execution_log_tab
         log_tab.apply_filter_btn.clicked.connect(self.handle_filter_logs)
         log_tab.clear_log_btn.clicked.connect(self.handle_clear_logs)
         log_tab.export_log_btn.clicked.connect(self.handle_export_logs)
+        log_tab.stats_btn.clicked.connect(self.handle_show_stats)
         log_tab.refresh_log_btn.clicked.connect(self.handle_refresh_logs)
         
         # 设置标签页信号
@@ -116,6 +183,13 @@ class MainController:
         fail_action = self.main_window.task_manager_tab.fail_action_input.text()
         threshold = float(self.main_window.task_manager_tab.threshold_input.text() or 0.8)
         recursive = self.main_window.task_manager_tab.recursive_checkbox.isChecked()
+        templates = parse_templates(self.main_window.task_manager_tab.templates_input.text())
+        preprocess_variant = self.get_task_preprocess_variant()
+        frame_stride = self.main_window.task_manager_tab.frame_stride_spinbox.value() or None
+        time_windows = parse_time_windows(self.main_window.task_manager_tab.time_windows_input.text())
+        schedule = self.get_task_schedule()
+        if schedule is False:
+            return
         
         # 创建新任务
         task = Task(
@@ -124,11 +198,17 @@ class MainController:
             match_action=match_action,
             fail_action=fail_action,
             threshold=threshold,
-            recursive=recursive
+            recursive=recursive,
+            templates=templates,
+            preprocess_variant=preprocess_variant,
+            frame_stride=frame_stride,
+            time_windows=time_windows,
+            schedule=schedule
         )
         
         # 添加任务
         self.task_manager.add_task(task)
+        self.sync_schedules()
         
         # 更新任务表格
         self.update_task_table(self.task_manager.get_all_tasks())
@@ -151,10 +231,18 @@ class MainController:
             # 填充表单
             self.main_window.task_manager_tab.task_name_input.setText(task.name)
             self.main_window.task_manager_tab.image_path_input.setText(task.image_path)
+            self.main_window.task_manager_tab.templates_input.setText(format_templates(task.templates))
             self.main_window.task_manager_tab.match_action_input.setText(task.match_action)
             self.main_window.task_manager_tab.fail_action_input.setText(task.fail_action)
             self.main_window.task_manager_tab.threshold_input.setText(str(task.threshold))
             self.main_window.task_manager_tab.recursive_checkbox.setChecked(task.recursive)
+            self.main_window.task_manager_tab.preprocess_variant_combo.setCurrentText(
+                task.preprocess_variant or FOLLOW_GLOBAL)
+            self.main_window.task_manager_tab.frame_stride_spinbox.setValue(task.frame_stride or 0)
+            self.main_window.task_manager_tab.time_windows_input.setText(format_time_windows(task.time_windows))
+            self.main_window.task_manager_tab.schedule_input.setText(format_schedule_text(task.schedule))
+            catch_up_combo = self.main_window.task_manager_tab.catch_up_combo
+            catch_up_combo.setCurrentIndex(max(0, catch_up_combo.findData((task.schedule or {}).get("catch_up", "once"))))
     
     def handle_delete_task(self):
         """处理删除任务事件"""
@@ -176,6 +264,7 @@ class MainController:
         if reply == QMessageBox.Yes:
             # 删除任务
             self.task_manager.delete_task(task_id)
+            self.sync_schedules()
             
             # 更新任务表格
             self.update_task_table(self.task_manager.get_all_tasks())
@@ -214,6 +303,15 @@ class MainController:
         
         task_id = self.main_window.task_manager_tab.task_table.item(selected_row, 0).text()
         
+        schedule = self.get_task_schedule()
+        if schedule is False:
+            return
+        # 界面上没有的计划选项（抖动、重叠策略）保持不变
+        task = self.task_manager.get_task(task_id)
+        if schedule and task and task.schedule:
+            schedule = dict({key: value for key, value in task.schedule.items()
+                             if key not in ("interval", "cron")}, **schedule)
+        
         # 获取表单数据
         updated_data = {
             "name": self.main_window.task_manager_tab.task_name_input.text(),
@@ -221,11 +319,17 @@ class MainController:
             "match_action": self.main_window.task_manager_tab.match_action_input.text(),
             "fail_action": self.main_window.task_manager_tab.fail_action_input.text(),
             "threshold": float(self.main_window.task_manager_tab.threshold_input.text() or 0.8),
-            "recursive": self.main_window.task_manager_tab.recursive_checkbox.isChecked()
+            "recursive": self.main_window.task_manager_tab.recursive_checkbox.isChecked(),
+            "templates": parse_templates(self.main_window.task_manager_tab.templates_input.text()),
+            "preprocess_variant": self.get_task_preprocess_variant(),
+            "frame_stride": self.main_window.task_manager_tab.frame_stride_spinbox.value() or None,
+            "time_windows": parse_time_windows(self.main_window.task_manager_tab.time_windows_input.text()),
+            "schedule": schedule
         }
         
         # 更新任务
         task = self.task_manager.update_task(task_id, updated_data)
+        self.sync_schedules()
         
         if task:
             QMessageBox.information(self.main_window, "成功", "任务已更新")
@@ -234,21 +338,45 @@ class MainController:
         else:
             QMessageBox.critical(self.main_window, "错误", "更新任务失败")
     
+    def handle_calibrate_threshold(self):
+        """处理阈值校准事件：在最近一次运行保存的得分上调整阈值"""
+        selected_row = self.main_window.task_manager_tab.task_table.currentRow()
+        if selected_row < 0:
+            QMessageBox.warning(self.main_window, "警告", "请先选择一个任务")
+            return
+        
+        task_id = self.main_window.task_manager_tab.task_table.item(selected_row, 0).text()
+        task = self.task_manager.get_task(task_id)
+        if not task:
+            return
+        
+        score_table = ScoreTable.load(score_table_file(self.settings.get("cache_path", "cache"), task.id))
+        if score_table is None:
+            QMessageBox.information(self.main_window, "阈值校准", "没有该任务的得分记录，请先运行一次任务")
+            return
+        
+        dialog = ThresholdCalibrationDialog(task, score_table, self.main_window)
+        if not dialog.exec_():
+            return
+        
+        threshold = round(dialog.threshold(), 3)
+        template = dialog.selected_template()
+        if template is None:
+            # 统一阈值：各模板都改为跟随任务阈值
+            updated_data = {"threshold": threshold,
+                            "templates": [dict(t, threshold=None) for t in task.templates]}
+        else:
+            updated_data = {"templates": [dict(t, threshold=threshold) if t["path"] == template else t
+                                          for t in task.templates]}
+        self.task_manager.update_task(task.id, updated_data)
+        self.main_window.task_manager_tab.threshold_input.setText(str(task.threshold))
+        self.main_window.task_manager_tab.templates_input.setText(format_templates(task.templates))
+        QMessageBox.information(self.main_window, "成功", "阈值已更新")
+    
     def handle_filter_logs(self):
         """处理过滤日志事件"""
-        # 获取过滤条件
-        task_id = self.main_window.execution_log_tab.task_filter.currentText()
-        status = self.main_window.execution_log_tab.status_filter.currentText()
-        start_time = self.main_window.execution_log_tab.start_time.dateTime().toString("yyyy-MM-dd HH:mm:ss")
-        end_time = self.main_window.execution_log_tab.end_time.dateTime().toString("yyyy-MM-dd HH:mm:ss")
-        
         # 过滤日志
-        logs = self.log_manager.get_logs(
-            task_id=task_id if task_id != "所有任务" else None,
-            status=status if status != "所有状态" else None,
-            start_time=start_time,
-            end_time=end_time
-        )
+        logs = self.log_manager.get_logs(**self.get_log_filters())
         
         # 更新日志显示
         self.update_log_display(logs)
@@ -263,23 +391,78 @@ class MainController:
         )
         
         if reply == QMessageBox.Yes:
-            # 清空日志
-            self.log_manager.logs = []
-            # 清空日志文件
-            log_dir = self.settings.get("log_path", "logs")
-            if os.path.exists(log_dir):
-                for root, dirs, files in os.walk(log_dir):
-                    for file in files:
-                        os.remove(os.path.join(root, file))
+            # 清空日志（内存和文件）
+            self.log_manager.clear_logs()
             
             # 更新日志显示
             self.update_log_display([])
             QMessageBox.information(self.main_window, "成功", "日志已清空")
     
+    def get_log_filters(self):
+        """日志页面当前的过滤条件"""
+        task_id = self.main_window.execution_log_tab.task_filter.currentText()
+        status = self.main_window.execution_log_tab.status_filter.currentText()
+        return {
+            "task_id": task_id if task_id != "所有任务" else None,
+            "status": status if status != "所有状态" else None,
+            "start_time": self.main_window.execution_log_tab.start_time.dateTime().toString("yyyy-MM-dd HH:mm:ss"),
+            "end_time": self.main_window.execution_log_tab.end_time.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+        }
+    
     def handle_export_logs(self):
-        """处理导出日志事件"""
-        # 实现日志导出逻辑
-        pass
+        """处理导出日志事件：按当前过滤条件在后台流式导出"""
+        if self.log_exporter is not None and self.log_exporter.isRunning():
+            QMessageBox.warning(self.main_window, "警告", "已有导出正在进行")
+            return
+        
+        out_path, _ = QFileDialog.getSaveFileName(
+            self.main_window, "导出日志", "logs.csv",
+            "CSV 文件 (*.csv);;CSV 压缩文件 (*.csv.gz);;JSON Lines 文件 (*.jsonl);;JSON Lines 压缩文件 (*.jsonl.gz)"
+        )
+        if not out_path:
+            return
+        
+        progress_dialog = QProgressDialog("正在导出日志...", "取消", 0, 0, self.main_window)
+        progress_dialog.setWindowTitle("导出日志")
+        progress_dialog.setMinimumDuration(0)
+        
+        self.log_exporter = LogExporter(self.settings.get("log_path", "logs"), out_path, self.get_log_filters())
+        
+        def on_progress(done, total, written):
+            progress_dialog.setMaximum(total)
+            progress_dialog.setValue(done)
+            progress_dialog.setLabelText(f"已处理 {done}/{total} 天，导出 {written} 条")
+        
+        def on_finished(success, count, message):
+            progress_dialog.close()
+            if success:
+                QMessageBox.information(self.main_window, "成功", message)
+            else:
+                QMessageBox.warning(self.main_window, "导出日志", message)
+        
+        self.log_exporter.progress.connect(on_progress)
+        self.log_exporter.export_finished.connect(on_finished)
+        progress_dialog.canceled.connect(self.log_exporter.cancel)
+        self.log_exporter.start()
+    
+    def handle_show_stats(self):
+        """在日志区域显示各任务的运行统计（来自增量维护的统计，不需要加载日志）"""
+        def fmt(value, pattern="{:.3f}"):
+            return "-" if value is None else pattern.format(value)
+        
+        rows = "".join(
+            f"<tr><td>{name or task_id}</td><td>{s['runs']}</td><td>{fmt(s['success_rate'], '{:.1%}')}</td>"
+            f"<td>{fmt(s['match_rate'], '{:.1%}')}</td><td>{fmt(s['score_mean'])}</td>"
+            f"<td>{fmt(s['score_min'])} / {fmt(s['score_max'])}</td>"
+            f"<td>{fmt(s['duration_mean'], '{:.1f}')}</td><td>{fmt(s['duration_p95'], '{}')}</td></tr>"
+            for task_id, name, s in self.log_manager.rollups.all_task_summaries()
+        )
+        self.main_window.execution_log_tab.log_text.setHtml(
+            "<table border='1' cellspacing='0' cellpadding='4'>"
+            "<tr><th>任务</th><th>运行次数</th><th>成功率</th><th>匹配率</th><th>平均得分</th>"
+            "<th>最低 / 最高得分</th><th>平均耗时(秒)</th><th>P95 耗时(秒)</th></tr>"
+            f"{rows}</table>"
+        )
     
     def handle_refresh_logs(self):
         """处理刷新日志事件"""
@@ -294,15 +477,42 @@ class MainController:
             "log_path": self.main_window.settings_tab.log_path_input.text(),
             "auto_save_interval": self.main_window.settings_tab.auto_save_spinbox.value(),
             "auto_load_tasks": self.main_window.settings_tab.auto_load_tasks.isChecked(),
+            "log_retention_days": self.main_window.settings_tab.log_retention_spinbox.value(),
+            "log_max_total_mb": self.main_window.settings_tab.log_max_size_spinbox.value(),
+            "log_max_records": self.main_window.settings_tab.log_max_records_spinbox.value(),
+            "log_compress_closed_days": self.main_window.settings_tab.log_compress_checkbox.isChecked(),
             "image_algorithm": self.main_window.settings_tab.algorithm_combo.currentText(),
             "thread_count": self.main_window.settings_tab.thread_spinbox.value(),
             "batch_size": self.main_window.settings_tab.batch_size_spinbox.value(),
-            "preprocess_image": self.main_window.settings_tab.preprocess_checkbox.isChecked()
+            "io_thread_count": self.main_window.settings_tab.io_thread_spinbox.value(),
+            "memory_budget_mb": self.main_window.settings_tab.memory_budget_spinbox.value(),
+            "preprocess_image": self.main_window.settings_tab.preprocess_checkbox.isChecked(),
+            "preprocess_variant": self.main_window.settings_tab.preprocess_variant_combo.currentText(),
+            "adaptive_tuning": self.main_window.settings_tab.adaptive_tuning_checkbox.isChecked(),
+            "deduplicate_images": self.main_window.settings_tab.deduplicate_checkbox.isChecked(),
+            "directory_manifest": self.main_window.settings_tab.manifest_checkbox.isChecked(),
+            "record_scores": self.main_window.settings_tab.record_scores_checkbox.isChecked(),
+            "scan_videos": self.main_window.settings_tab.scan_videos_checkbox.isChecked(),
+            "video_frame_stride": self.main_window.settings_tab.video_stride_spinbox.value(),
+            "video_static_threshold": self.main_window.settings_tab.video_static_spinbox.value(),
+            "isolated_execution": self.main_window.settings_tab.isolated_checkbox.isChecked(),
+            "task_cpu_limit": self.main_window.settings_tab.cpu_limit_spinbox.value(),
+            "task_wall_limit": self.main_window.settings_tab.wall_limit_spinbox.value(),
+            "task_memory_limit_mb": self.main_window.settings_tab.memory_limit_spinbox.value(),
+            "distributed_enabled": self.main_window.settings_tab.distributed_checkbox.isChecked(),
+            "distributed_address": self.main_window.settings_tab.distributed_address_input.text(),
+            "job_server_enabled": self.main_window.settings_tab.job_server_checkbox.isChecked(),
+            "job_server_port": self.main_window.settings_tab.job_server_port_spinbox.value(),
+            "metrics_enabled": self.main_window.settings_tab.metrics_checkbox.isChecked(),
+            "metrics_exporter": self.main_window.settings_tab.metrics_exporter_combo.currentText()
         }
         
         # 保存设置
         success = self.settings.update(settings_data)
         
+        # 性能统计开关立即生效
+        configure_metrics(self.settings)
+        
         if success:
             QMessageBox.information(self.main_window, "成功", "设置已保存")
         else:
@@ -312,7 +522,43 @@ class MainController:
         """清空任务表单"""
         self.main_window.task_manager_tab.task_name_input.clear()
         self.main_window.task_manager_tab.image_path_input.clear()
+        self.main_window.task_manager_tab.templates_input.clear()
         self.main_window.task_manager_tab.match_action_input.clear()
         self.main_window.task_manager_tab.fail_action_input.clear()
         self.main_window.task_manager_tab.threshold_input.setText("0.8")
-        self.main_window.task_manager_tab.recursive_checkbox.setChecked(True)    
\ No newline at end of file
+        self.main_window.task_manager_tab.recursive_checkbox.setChecked(True)
+        self.main_window.task_manager_tab.preprocess_variant_combo.setCurrentText(FOLLOW_GLOBAL)
+        self.main_window.task_manager_tab.frame_stride_spinbox.setValue(0)
+        self.main_window.task_manager_tab.time_windows_input.clear()
+        self.main_window.task_manager_tab.schedule_input.clear()
+        self.main_window.task_manager_tab.catch_up_combo.setCurrentIndex(0)
+    
+    def get_task_schedule(self):
+        """任务表单中的定时计划，为空时返回 None，格式错误时提示并返回 False"""
+        task_tab = self.main_window.task_manager_tab
+        try:
+            schedule = parse_schedule_text(task_tab.schedule_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self.main_window, "警告", f"定时计划格式错误: {e}")
+            return False
+        if schedule:
+            schedule["catch_up"] = task_tab.catch_up_combo.currentData()
+        return schedule
+    
+    def sync_schedules(self):
+        """任务增删改后让调度器立即生效（否则最多等一个同步周期）"""
+        if self.task_executor.scheduler is not None:
+            self.task_executor.scheduler.sync()
+    
+    def get_task_preprocess_variant(self):
+        """任务表单中选择的预处理方式，跟随全局设置时返回 None"""
+        variant = self.main_window.task_manager_tab.preprocess_variant_combo.currentText()
+        return None if variant == FOLLOW_GLOBAL else variant
+    
+    def shutdown(self):
+        """程序退出前写入尚未保存的数据（QApplication.aboutToQuit 时调用）"""
+        if self.job_server is not None:
+            self.job_server.stop()
+        self.log_manager.close()
+        # 结果库由后台线程写入，写完队列中的结果再退出
+        close_result_stores()
@@ -1,11 +1,22 @@
 import os
 import json
+import threading
 from datetime import datetime
+from src.models.log_store import ColumnarLogStore
+from src.models.log_rollup import RollupStore, FINAL_STATUSES
+from src.models.log_retention import (list_segments, apply_retention, drop_segment, load_index,
+                                      save_index, purge_trash_in_background)
 
 class ExecutionLog:
+    __slots__ = ("task_id", "task_name", "status", "message", "start_time", "end_time", "matched",
+                 "match_score", "matched_image", "stage_timings", "matched_template", "new_image_count",
+                 "matched_frame", "matched_timestamp", "run_id")
+    
     def __init__(self, task_id, task_name, status, message="", 
                  start_time=None, end_time=None, matched=False, 
-                 match_score=None, matched_image=None):
+                 match_score=None, matched_image=None, stage_timings=None,
+                 matched_template=None, new_image_count=None, matched_frame=None,
+                 matched_timestamp=None, run_id=None):
         self.task_id = task_id
         self.task_name = task_name
         self.status = status  # 成功, 失败, 进行中
@@ -15,6 +26,17 @@ class ExecutionLog:
         self.matched = matched
         self.match_score = match_score
         self.matched_image = matched_image
+        self.stage_timings = stage_timings  # 各阶段耗时汇总（启用统计时）
+        self.matched_template = matched_template
+        self.new_image_count = new_image_count  # 相比上次扫描新增的图片数（启用目录清单时）
+        self.matched_frame = matched_frame  # 匹配图片是视频时的帧序号
+        self.matched_timestamp = matched_timestamp  # 以及该帧在视频中的时间（秒）
+        self.run_id = run_id  # 逐图片结果库中本次运行的 ID
+    
+    def update_from(self, other):
+        """用另一条日志的内容覆盖本日志（保持对象不变）"""
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
     
     def to_dict(self):
         return {
@@ -26,7 +48,13 @@ class ExecutionLog:
             "end_time": self.end_time,
             "matched": self.matched,
             "match_score": self.match_score,
-            "matched_image": self.matched_image
+            "matched_image": self.matched_image,
+            "stage_timings": self.stage_timings,
+            "matched_template": self.matched_template,
+            "new_image_count": self.new_image_count,
+            "matched_frame": self.matched_frame,
+            "matched_timestamp": self.matched_timestamp,
+            "run_id": self.run_id
         }
     
     @classmethod
@@ -40,46 +68,78 @@ class ExecutionLog:
             end_time=data.get("end_time"),
             matched=data.get("matched", False),
             match_score=data.get("match_score"),
-            matched_image=data.get("matched_image")
+            matched_image=data.get("matched_image"),
+            stage_timings=data.get("stage_timings"),
+            matched_template=data.get("matched_template"),
+            new_image_count=data.get("new_image_count"),
+            matched_frame=data.get("matched_frame"),
+            matched_timestamp=data.get("matched_timestamp"),
+            run_id=data.get("run_id")
         )
 
 class LogManager:
-    def __init__(self, logs_dir="logs"):
+    def __init__(self, logs_dir="logs", settings=None):
         self.logs_dir = logs_dir
-        self.logs = []
+        self.settings = settings if settings is not None else {}  # 保留策略设置
+        self.maintain_lock = threading.Lock()
+        self.current_date = None
+        self.store = ColumnarLogStore()  # 按列保存的日志，self.logs 是它的别名
+        self.rollups = RollupStore(os.path.join(logs_dir, "rollups.json"))  # 按任务 / 日期的运行统计
+        self.listeners = []  # 每写入一条日志调用 listener(log)，如任务服务的进度推送
         
         # 创建日志目录（如果不存在）
         if not os.path.exists(logs_dir):
             os.makedirs(logs_dir)
     
+    @property
+    def logs(self):
+        return self.store
+    
+    @logs.setter
+    def logs(self, logs):
+        self.store.clear()
+        self.store.extend(logs)
+    
     def add_log(self, log):
-        self.logs.append(log)
+        self.store.append(log)
         self.save_log(log)
+        if log.status in FINAL_STATUSES:
+            self.rollups.record(log.to_dict())
+            self.rollups.save()
+        for listener in list(self.listeners):
+            try:
+                listener(log)
+            except Exception as e:
+                print(f"Error notifying log listener: {e}")
         return log
     
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
     def get_logs(self, task_id=None, status=None, start_time=None, end_time=None):
-        filtered_logs = self.logs
-        
-        if task_id:
-            filtered_logs = [log for log in filtered_logs if log.task_id == task_id]
-        
-        if status:
-            filtered_logs = [log for log in filtered_logs if log.status == status]
-        
-        if start_time:
-            filtered_logs = [log for log in filtered_logs if log.start_time >= start_time]
-        
-        if end_time:
-            filtered_logs = [log for log in filtered_logs if (log.end_time and log.end_time <= end_time)]
-        
-        return filtered_logs
+        return self.store.rows(self.store.filter(task_id, status, start_time, end_time))
+    
+    def sort_logs(self, reverse=True):
+        """按开始时间排序（默认最新的在前）"""
+        self.store.sort_by_start(reverse)
     
     def save_log(self, log):
         # 按日期创建子目录
-        date_dir = os.path.join(self.logs_dir, datetime.now().strftime("%Y-%m-%d"))
+        date = datetime.now().strftime("%Y-%m-%d")
+        date_dir = os.path.join(self.logs_dir, date)
         if not os.path.exists(date_dir):
             os.makedirs(date_dir)
         
+        # 日期变化说明前一天已经结束，在后台压缩并执行保留策略
+        if self.current_date != date:
+            if self.current_date is not None:
+                threading.Thread(target=self.maintain, daemon=True).start()
+            self.current_date = date
+        
         # 使用时间戳作为文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         log_file = os.path.join(date_dir, f"{timestamp}.json")
@@ -88,30 +148,80 @@ class LogManager:
             json.dump(log.to_dict(), f, indent=4)
     
     def load_logs(self, date=None):
-        self.logs = []
+        self.store.clear()
+        for chunk in self.iter_load_logs(date):
+            self.store.extend(chunk)
         
-        # 如果没有指定日期，则加载所有日期的日志
-        if not date:
-            date_dirs = [os.path.join(self.logs_dir, d) for d in os.listdir(self.logs_dir) 
-                         if os.path.isdir(os.path.join(self.logs_dir, d))]
+        # 按开始时间排序（最新的在前）
+        self.sort_logs()
+        return self.logs
+    
+    def iter_load_logs(self, date=None, chunk_size=200):
+        """逐批读取日志（日期目录和压缩归档），供后台加载使用（不修改 self.logs，也不排序）"""
+        segments = list_segments(self.logs_dir)
+        if date:
+            segments = [segment for segment in segments if segment.date == date]
         else:
-            date_dirs = [os.path.join(self.logs_dir, date)]
-            if not os.path.exists(date_dirs[0]):
-                return []
+            # 最新的日期优先，界面可以先显示最近的日志
+            segments.reverse()
         
-        # 加载日志文件
-        for date_dir in date_dirs:
-            for filename in os.listdir(date_dir):
-                if filename.endswith(".json"):
-                    log_path = os.path.join(date_dir, filename)
-                    try:
-                        with open(log_path, "r") as f:
-                            log_data = json.load(f)
-                            log = ExecutionLog.from_dict(log_data)
-                            self.logs.append(log)
-                    except Exception as e:
-                        print(f"Error loading log {filename}: {e}")
+        chunk = []
+        for segment in segments:
+            for log_data in segment.iter_records():
+                chunk.append(ExecutionLog.from_dict(log_data))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
         
-        # 按开始时间排序（最新的在前）
-        self.logs.sort(key=lambda x: x.start_time, reverse=True)
-        return self.logs    
\ No newline at end of file
+        if chunk:
+            yield chunk
+    
+    def maintain(self):
+        """压缩已结束日期的日志并执行保留策略；已有维护在进行时直接返回"""
+        if not self.maintain_lock.acquire(blocking=False):
+            return [], []
+        self.rollups.save(force=True)
+        try:
+            return apply_retention(
+                self.logs_dir,
+                archive_format=self.settings.get("log_archive_format", "gzip"),
+                compress=self.settings.get("log_compress_closed_days", True),
+                max_age_days=self.settings.get("log_retention_days", 0),
+                max_total_mb=self.settings.get("log_max_total_mb", 0),
+                max_records=self.settings.get("log_max_records", 0)
+            )
+        except Exception as e:
+            print(f"Error maintaining logs: {e}")
+            return [], []
+        finally:
+            self.maintain_lock.release()
+    
+    def clear_logs(self):
+        """清空全部日志：每天的日志整段删除，不逐个删除文件"""
+        self.store.clear()
+        self.rollups.clear()
+        self.rollups.save(force=True)
+        index = load_index(self.logs_dir)
+        for segment in list_segments(self.logs_dir):
+            drop_segment(self.logs_dir, segment, index)
+        save_index(self.logs_dir, {})
+        purge_trash_in_background(self.logs_dir)
+    
+    def rebuild_rollups(self):
+        """从磁盘上的全部历史日志重建统计（流式读取）"""
+        self.rollups.rebuild(record for segment in list_segments(self.logs_dir)
+                             for record in segment.iter_records())
+    
+    def ensure_rollups(self):
+        """统计文件不存在或上次没有正常退出（可能缺少最后几次运行）时从历史日志重建"""
+        if not self.rollups.loaded_clean:
+            self.rebuild_rollups()
+            self.rollups.loaded_clean = True
+    
+    def flush(self):
+        """立即写入统计（每次运行结束后调用），不受写入间隔限制"""
+        self.rollups.save(force=True)
+    
+    def close(self):
+        """程序退出前调用：写入最终统计并标记为正常退出"""
+        self.rollups.save(force=True, clean=True)
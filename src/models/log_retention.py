@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import gzip
+import lzma
+import uuid
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+# 已结束的日期压缩成一个 JSON Lines 归档文件
+ARCHIVE_OPENERS = {
+    "gzip": (".jsonl.gz", gzip.open),
+    "xz": (".jsonl.xz", lzma.open)
+}
+DATE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(\.jsonl\.gz|\.jsonl\.xz)?$")
+INDEX_FILE = "archive_index.json"
+TRASH_PREFIX = ".trash-"
+
+class LogSegment:
+    """一天的日志：可能有尚未压缩的日期目录，也可能有压缩归档，或两者都有"""
+
+    def __init__(self, date):
+        self.date = date
+        self.dir_path = None
+        self.archive_path = None
+
+    def size(self):
+        total = 0
+        if self.archive_path:
+            total += os.path.getsize(self.archive_path)
+        if self.dir_path:
+            with os.scandir(self.dir_path) as entries:
+                total += sum(entry.stat().st_size for entry in entries if entry.is_file())
+        return total
+
+    def record_count(self, index):
+        count = 0
+        if self.archive_path:
+            count += index.get(self.date) or sum(1 for _ in iter_archive(self.archive_path))
+        if self.dir_path:
+            count += sum(1 for name in os.listdir(self.dir_path) if name.endswith(".json"))
+        return count
+
+    def iter_records(self):
+        """流式读取这一天的全部日志字典：先读归档，再读目录中的单个文件"""
+        if self.archive_path:
+            yield from iter_archive(self.archive_path)
+        if self.dir_path:
+            for name in sorted(os.listdir(self.dir_path)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.dir_path, name), "r") as f:
+                        yield json.load(f)
+                except Exception as e:
+                    print(f"Error loading log {name}: {e}")
+
+def archive_opener(path):
+    for suffix, opener in ARCHIVE_OPENERS.values():
+        if path.endswith(suffix):
+            return opener
+    return None
+
+def iter_archive(path):
+    """逐行解压读取归档，不会把整个文件读入内存"""
+    try:
+        with archive_opener(path)(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Error reading log archive {path}: {e}")
+
+def list_segments(logs_dir):
+    """按日期从旧到新返回全部日志段"""
+    segments = {}
+    if not os.path.isdir(logs_dir):
+        return []
+    for name in os.listdir(logs_dir):
+        match = DATE_PATTERN.match(name)
+        if not match:
+            continue
+        segment = segments.setdefault(match.group(1), LogSegment(match.group(1)))
+        path = os.path.join(logs_dir, name)
+        if match.group(2):
+            segment.archive_path = path
+        elif os.path.isdir(path):
+            segment.dir_path = path
+    return [segments[date] for date in sorted(segments)]
+
+def load_index(logs_dir):
+    try:
+        with open(os.path.join(logs_dir, INDEX_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_index(logs_dir, index):
+    path = os.path.join(logs_dir, INDEX_FILE)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, path)
+
+def compact_segment(logs_dir, segment, archive_format, index):
+    """把一天的单个日志文件合并进归档（原子替换），成功后删除这些文件"""
+    suffix, opener = ARCHIVE_OPENERS.get(archive_format, ARCHIVE_OPENERS["gzip"])
+    archive_path = os.path.join(logs_dir, segment.date + suffix)
+    files = sorted(name for name in os.listdir(segment.dir_path) if name.endswith(".json"))
+
+    tmp_path = f"{archive_path}.tmp"
+    count = 0
+    with opener(tmp_path, "wt", encoding="utf-8") as out:
+        # 已有归档（例如换了压缩格式，或当天目录在压缩后又写入了文件）先原样并入
+        if segment.archive_path:
+            for record in iter_archive(segment.archive_path):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        for name in files:
+            try:
+                with open(os.path.join(segment.dir_path, name), "r") as f:
+                    record = json.load(f)
+            except Exception as e:
+                print(f"Error loading log {name}: {e}")
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp_path, archive_path)
+    if segment.archive_path and segment.archive_path != archive_path:
+        os.remove(segment.archive_path)
+
+    for name in files:
+        os.remove(os.path.join(segment.dir_path, name))
+    try:
+        os.rmdir(segment.dir_path)
+    except OSError:
+        pass  # 压缩期间又写入了新文件，留到下次
+    segment.archive_path = archive_path
+    segment.dir_path = None
+    index[segment.date] = count
+
+def drop_segment(logs_dir, segment, index):
+    """整段删除一天的日志：归档直接删除，目录先改名再在后台删除，调用方不必逐个删文件"""
+    if segment.archive_path:
+        os.remove(segment.archive_path)
+    if segment.dir_path:
+        os.rename(segment.dir_path, os.path.join(logs_dir, f"{TRASH_PREFIX}{uuid.uuid4().hex}"))
+    index.pop(segment.date, None)
+
+def purge_trash(logs_dir):
+    for name in os.listdir(logs_dir):
+        if name.startswith(TRASH_PREFIX):
+            shutil.rmtree(os.path.join(logs_dir, name), ignore_errors=True)
+
+def purge_trash_in_background(logs_dir):
+    threading.Thread(target=purge_trash, args=(logs_dir,), daemon=True).start()
+
+def apply_retention(logs_dir, archive_format="gzip", compress=True, max_age_days=0,
+                    max_total_mb=0, max_records=0, today=None):
+    """压缩已结束的日期，再按天数、总大小、总条数删除最旧的日期（当天的日志总是保留）
+
+    限制为 0 表示不限制。返回 (压缩的日期, 删除的日期)。
+    """
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    index = load_index(logs_dir)
+    segments = list_segments(logs_dir)
+    compacted, dropped = [], []
+
+    if compress:
+        for segment in segments:
+            if segment.date < today and segment.dir_path:
+                compact_segment(logs_dir, segment, archive_format, index)
+                compacted.append(segment.date)
+
+    if max_age_days:
+        cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=max_age_days)).strftime("%Y-%m-%d")
+        while segments and segments[0].date < cutoff:
+            drop_segment(logs_dir, segments[0], index)
+            dropped.append(segments.pop(0).date)
+
+    if max_total_mb:
+        sizes = [segment.size() for segment in segments]
+        limit = max_total_mb * 1024 * 1024
+        while len(segments) > 1 and sum(sizes) > limit and segments[0].date < today:
+            drop_segment(logs_dir, segments[0], index)
+            dropped.append(segments.pop(0).date)
+            sizes.pop(0)
+
+    if max_records:
+        counts = [segment.record_count(index) for segment in segments]
+        while len(segments) > 1 and sum(counts) > max_records and segments[0].date < today:
+            drop_segment(logs_dir, segments[0], index)
+            dropped.append(segments.pop(0).date)
+            counts.pop(0)
+
+    if compacted or dropped:
+        save_index(logs_dir, index)
+    if dropped:
+        purge_trash_in_background(logs_dir)
+    return compacted, dropped
@@ -0,0 +1,228 @@
+"""按任务、按日期增量维护的运行统计
+
+每条最终日志（成功 / 失败）写入时 O(1) 更新计数，界面和命令行不必加载全部日志即可查看统计。
+统计保存在日志目录下的 rollups.json，可随时从历史日志重建。
+正常退出时写入的文件带有 clean 标记；启动时文件不存在或没有该标记（上次异常退出、旧版本）
+说明统计可能缺少最后几次运行，由 LogManager.ensure_rollups 从历史日志重建。
+
+命令行:
+    python -m src.models.log_rollup            # 显示各任务统计
+    python -m src.models.log_rollup --rebuild  # 从历史日志重建
+"""
+import os
+import json
+import time
+import bisect
+import argparse
+import threading
+from src.models.log_store import parse_time
+
+FINAL_STATUSES = ("成功", "失败")
+# 运行耗时直方图的桶上界（秒），最后一个桶收集更长的运行
+DURATION_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600]
+# 统计文件最多每隔这么久写一次
+SAVE_INTERVAL = 5.0
+
+def new_rollup():
+    return {
+        "runs": 0,
+        "successes": 0,
+        "failures": 0,
+        "matches": 0,
+        "score_count": 0,
+        "score_sum": 0.0,
+        "score_min": None,
+        "score_max": None,
+        "duration_count": 0,
+        "duration_sum": 0.0,
+        "duration_buckets": [0] * (len(DURATION_BUCKETS) + 1)
+    }
+
+def update_rollup(rollup, record):
+    rollup["runs"] += 1
+    if record.get("status") == "成功":
+        rollup["successes"] += 1
+    else:
+        rollup["failures"] += 1
+    if record.get("matched"):
+        rollup["matches"] += 1
+
+    score = record.get("match_score")
+    if score is not None:
+        rollup["score_count"] += 1
+        rollup["score_sum"] += score
+        rollup["score_min"] = score if rollup["score_min"] is None else min(rollup["score_min"], score)
+        rollup["score_max"] = score if rollup["score_max"] is None else max(rollup["score_max"], score)
+
+    start, end = parse_time(record.get("start_time")), parse_time(record.get("end_time"))
+    if start is not None and end is not None:
+        duration = max(0, end - start)
+        rollup["duration_count"] += 1
+        rollup["duration_sum"] += duration
+        rollup["duration_buckets"][bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+
+def summarize(rollup):
+    """把计数转换成便于显示的统计值"""
+    runs = rollup["runs"]
+    return {
+        "runs": runs,
+        "successes": rollup["successes"],
+        "failures": rollup["failures"],
+        "matches": rollup["matches"],
+        "success_rate": rollup["successes"] / runs if runs else None,
+        "match_rate": rollup["matches"] / runs if runs else None,
+        "score_mean": rollup["score_sum"] / rollup["score_count"] if rollup["score_count"] else None,
+        "score_min": rollup["score_min"],
+        "score_max": rollup["score_max"],
+        "duration_mean": rollup["duration_sum"] / rollup["duration_count"] if rollup["duration_count"] else None,
+        "duration_p50": duration_quantile(rollup, 0.5),
+        "duration_p95": duration_quantile(rollup, 0.95)
+    }
+
+def duration_quantile(rollup, quantile):
+    """由直方图估计耗时分位数（返回所在桶的上界，最后一个桶返回 None 表示超过最大上界）"""
+    total = sum(rollup["duration_buckets"])
+    if not total:
+        return None
+    target = quantile * total
+    seen = 0
+    for index, count in enumerate(rollup["duration_buckets"]):
+        seen += count
+        if seen >= target:
+            return DURATION_BUCKETS[index] if index < len(DURATION_BUCKETS) else None
+    return None
+
+class RollupStore:
+    """按任务和日期汇总的统计：tasks[任务ID]、days[日期]、task_days[任务ID][日期]"""
+
+    def __init__(self, rollup_file=None):
+        self.rollup_file = rollup_file
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.days = {}
+        self.task_days = {}
+        self.task_names = {}
+        self.dirty = False
+        self.last_save = 0.0
+        self.loaded_clean = False  # 读取的文件是否由正常退出写入
+        self.clean_on_disk = False
+        self.load()
+
+    def load(self):
+        if not self.rollup_file or not os.path.exists(self.rollup_file):
+            return
+        try:
+            with open(self.rollup_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.tasks = data.get("tasks", {})
+            self.days = data.get("days", {})
+            self.task_days = data.get("task_days", {})
+            self.task_names = data.get("task_names", {})
+            self.loaded_clean = self.clean_on_disk = bool(data.get("clean", False))
+        except Exception as e:
+            print(f"Error loading log rollups: {e}")
+
+    def save(self, force=False, clean=False):
+        """写入统计文件；force 为 False 时最多每 SAVE_INTERVAL 秒写一次
+
+        clean 为 True 表示正常退出前的最后一次写入，之后不会再有新的统计。
+        """
+        if not self.rollup_file or not (self.dirty or clean != self.clean_on_disk):
+            return
+        if not force and time.monotonic() - self.last_save < SAVE_INTERVAL:
+            return
+        with self.lock:
+            data = json.dumps({"tasks": self.tasks, "days": self.days,
+                               "task_days": self.task_days, "task_names": self.task_names,
+                               "clean": clean},
+                              ensure_ascii=False)
+            self.dirty = False
+            self.clean_on_disk = clean
+            self.last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.rollup_file) or ".", exist_ok=True)
+            tmp_file = f"{self.rollup_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_file, self.rollup_file)
+        except Exception as e:
+            print(f"Error saving log rollups: {e}")
+
+    def record(self, record):
+        """记录一条日志（字典）；进行中的日志不计入"""
+        if record.get("status") not in FINAL_STATUSES:
+            return
+        task_id = record.get("task_id")
+        date = (record.get("start_time") or "")[:10]
+        with self.lock:
+            update_rollup(self.tasks.setdefault(task_id, new_rollup()), record)
+            update_rollup(self.days.setdefault(date, new_rollup()), record)
+            update_rollup(self.task_days.setdefault(task_id, {}).setdefault(date, new_rollup()), record)
+            self.task_names[task_id] = record.get("task_name")
+            self.dirty = True
+
+    def clear(self):
+        with self.lock:
+            self.tasks, self.days, self.task_days, self.task_names = {}, {}, {}, {}
+            self.dirty = True
+
+    def rebuild(self, records):
+        """从历史日志重建（records 为日志字典的可迭代对象，可以是流式读取的生成器）"""
+        self.clear()
+        for record in records:
+            self.record(record)
+        self.save(force=True)
+
+    def task_summary(self, task_id):
+        with self.lock:
+            rollup = self.tasks.get(task_id)
+            return summarize(rollup) if rollup else None
+
+    def all_task_summaries(self):
+        """[(任务ID, 任务名称, 统计)]，按运行次数从多到少"""
+        with self.lock:
+            items = [(task_id, self.task_names.get(task_id), summarize(rollup))
+                     for task_id, rollup in self.tasks.items()]
+        return sorted(items, key=lambda item: item[2]["runs"], reverse=True)
+
+    def daily_summaries(self, task_id=None):
+        """[(日期, 统计)]，按日期排序；指定 task_id 时只统计该任务"""
+        with self.lock:
+            days = self.task_days.get(task_id, {}) if task_id else self.days
+            items = [(date, summarize(rollup)) for date, rollup in days.items()]
+        return sorted(items)
+
+def _format(value, pattern="{:.3f}"):
+    return "-" if value is None else pattern.format(value)
+
+def main():
+    from src.models.settings import Settings
+    from src.models.log_retention import list_segments
+
+    parser = argparse.ArgumentParser(description="查看任务运行统计")
+    parser.add_argument("--logs", default=None, help="日志目录（默认使用设置中的日志路径）")
+    parser.add_argument("--rebuild", action="store_true", help="从历史日志重建统计")
+    parser.add_argument("--task", default=None, help="显示指定任务的每日统计")
+    args = parser.parse_args()
+
+    logs_dir = args.logs or Settings().get("log_path", "logs")
+    store = RollupStore(os.path.join(logs_dir, "rollups.json"))
+    if args.rebuild:
+        store.rebuild(record for segment in list_segments(logs_dir) for record in segment.iter_records())
+
+    if args.task:
+        print(f"{'日期':<12}{'运行':>8}{'成功率':>10}{'匹配率':>10}{'平均得分':>10}{'平均耗时(s)':>12}")
+        for date, summary in store.daily_summaries(args.task):
+            print(f"{date:<12}{summary['runs']:>8}{_format(summary['success_rate'], '{:.1%}'):>10}"
+                  f"{_format(summary['match_rate'], '{:.1%}'):>10}{_format(summary['score_mean']):>10}"
+                  f"{_format(summary['duration_mean'], '{:.1f}'):>12}")
+        return
+
+    print(f"{'任务':<20}{'运行':>8}{'成功率':>10}{'匹配率':>10}{'平均得分':>10}{'平均耗时(s)':>12}{'P95(s)':>8}")
+    for task_id, name, summary in store.all_task_summaries():
+        print(f"{(name or task_id)[:20]:<20}{summary['runs']:>8}{_format(summary['success_rate'], '{:.1%}'):>10}"
+              f"{_format(summary['match_rate'], '{:.1%}'):>10}{_format(summary['score_mean']):>10}"
+              f"{_format(summary['duration_mean'], '{:.1f}'):>12}{_format(summary['duration_p95'], '{}'):>8}")
+
+if __name__ == "__main__":
+    main()
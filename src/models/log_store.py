@@ -0,0 +1,219 @@
+import threading
+from array import array
+from datetime import datetime, timedelta
+from src.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MISSING_TIME = -1  # 没有结束时间（或时间无法解析）
+STATUSES = ["成功", "失败", "进行中"]
+
+def parse_time(value):
+    """'YYYY-MM-DD HH:MM:SS' 转为秒数（本地时间，不做时区换算），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return int((datetime.fromisoformat(value) - EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def format_time(seconds):
+    return (EPOCH + timedelta(seconds=int(seconds))).strftime(TIME_FORMAT)
+
+class Interner:
+    """字符串与整数编码互转，重复的任务 ID、名称、消息只保存一份"""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """只查询不新增，不存在时返回 None"""
+        return self.codes.get(value)
+
+class ColumnarLogStore:
+    """按列保存执行日志：时间为 int64 秒，状态为小整数，得分为 float32，字符串编码为整数
+
+    每次 append 保存日志当时的快照（与磁盘上每次 save_log 写一个文件一致）。
+    读取时按行生成 ExecutionLog；过滤用 NumPy 向量化掩码完成。
+    不常用的字段（阶段耗时、新增图片数、视频帧等）按行号稀疏保存。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.start = array("q")
+            self.end = array("q")
+            self.status = array("b")
+            self.task = array("i")
+            self.name = array("i")
+            self.message = array("i")
+            self.template = array("i")
+            self.matched = array("B")
+            self.score = array("f")
+            self.image = []  # 匹配的图片路径，大多为 None
+            self.run = array("i")  # 同一次运行的多条快照共用一个运行 ID
+            self.extras = {}  # 行号 -> {字段: 值}
+            self.task_ids = Interner()
+            self.names = Interner()
+            self.messages = Interner()
+            self.templates = Interner([None])
+            self.run_ids = Interner([None])
+            self.statuses = Interner(STATUSES)
+
+    def __len__(self):
+        return len(self.start)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.row(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("log index out of range")
+        return self.row(index)
+
+    def append(self, log):
+        extras = {}
+        start = parse_time(log.start_time)
+        if start is None or len(log.start_time) != 19:
+            extras["start_time"] = log.start_time
+        end = parse_time(log.end_time)
+        if log.end_time and (end is None or len(log.end_time) != 19):
+            extras["end_time"] = log.end_time
+        if log.stage_timings is not None:
+            extras["stage_timings"] = log.stage_timings
+        if log.new_image_count is not None:
+            extras["new_image_count"] = log.new_image_count
+        if log.matched_frame is not None:
+            extras["matched_frame"] = log.matched_frame
+            extras["matched_timestamp"] = log.matched_timestamp
+        if log.match_score is None:
+            extras["match_score"] = None
+
+        with self.lock:
+            row = len(self.start)
+            self.start.append(MISSING_TIME if start is None else start)
+            self.end.append(MISSING_TIME if end is None else end)
+            self.status.append(self.statuses.code(log.status))
+            self.task.append(self.task_ids.code(log.task_id))
+            self.name.append(self.names.code(log.task_name))
+            self.message.append(self.messages.code(log.message))
+            self.template.append(self.templates.code(log.matched_template))
+            self.matched.append(1 if log.matched else 0)
+            self.score.append(float(log.match_score or 0))
+            self.image.append(log.matched_image)
+            self.run.append(self.run_ids.code(log.run_id))
+            if extras:
+                self.extras[row] = extras
+        return row
+
+    def extend(self, logs):
+        for log in logs:
+            self.append(log)
+
+    def row(self, row):
+        """生成第 row 行的 ExecutionLog（新对象，修改它不影响存储）"""
+        from src.models.execution_log import ExecutionLog
+
+        extras = self.extras.get(row, {})
+        start, end = self.start[row], self.end[row]
+        return ExecutionLog(
+            task_id=self.task_ids.values[self.task[row]],
+            task_name=self.names.values[self.name[row]],
+            status=self.statuses.values[self.status[row]],
+            message=self.messages.values[self.message[row]],
+            start_time=extras.get("start_time") or format_time(start),
+            end_time=extras.get("end_time") or (format_time(end) if end != MISSING_TIME else None),
+            matched=bool(self.matched[row]),
+            match_score=extras["match_score"] if "match_score" in extras else float(self.score[row]),
+            matched_image=self.image[row],
+            stage_timings=extras.get("stage_timings"),
+            matched_template=self.templates.values[self.template[row]],
+            new_image_count=extras.get("new_image_count"),
+            matched_frame=extras.get("matched_frame"),
+            matched_timestamp=extras.get("matched_timestamp"),
+            run_id=self.run_ids.values[self.run[row]]
+        )
+
+    def rows(self, indices):
+        return [self.row(int(row)) for row in indices]
+
+    def _column(self, column, dtype):
+        # 直接在 array 的缓冲区上建立视图，不复制；视图存在期间 array 不能扩容，调用方需持有锁
+        return np.frombuffer(column, dtype=dtype) if len(column) else np.zeros(0, dtype=dtype)
+
+    def filter(self, task_id=None, status=None, start_time=None, end_time=None):
+        """返回满足条件的行号（条件与 LogManager.get_logs 相同）
+
+        界面输入的时间可能格式错误，无法解析的时间当作没有这一端的限制。
+        """
+        start_bound = parse_time(start_time)
+        end_bound = parse_time(end_time)
+        with self.lock:
+            mask = np.ones(len(self.start), dtype=bool)
+            if task_id:
+                code = self.task_ids.lookup(task_id)
+                if code is None:
+                    return np.zeros(0, dtype=np.int64)
+                mask &= self._column(self.task, np.int32) == code
+            if status:
+                code = self.statuses.lookup(status)
+                if code is None:
+                    return np.zeros(0, dtype=np.int64)
+                mask &= self._column(self.status, np.int8) == code
+            if start_bound is not None:
+                mask &= self._column(self.start, np.int64) >= start_bound
+            if end_bound is not None:
+                end = self._column(self.end, np.int64)
+                mask &= (end != MISSING_TIME) & (end <= end_bound)
+                del end
+            return np.nonzero(mask)[0]
+
+    def sort_by_start(self, reverse=False):
+        """按开始时间稳定排序（相同时间保持原有顺序）"""
+        with self.lock:
+            count = len(self.start)
+            if count < 2:
+                return
+            start = self._column(self.start, np.int64)
+            key = -start if reverse else start
+            order = np.lexsort((np.arange(count), key))
+            del start, key
+
+            for name, dtype in (("start", np.int64), ("end", np.int64), ("status", np.int8),
+                                ("task", np.int32), ("name", np.int32), ("message", np.int32),
+                                ("template", np.int32), ("matched", np.uint8), ("score", np.float32),
+                                ("run", np.int32)):
+                column = getattr(self, name)
+                reordered = array(column.typecode)
+                reordered.frombytes(self._column(column, dtype)[order].tobytes())
+                setattr(self, name, reordered)
+            self.image = [self.image[row] for row in order]
+            new_row = np.empty(count, dtype=np.int64)
+            new_row[order] = np.arange(count)
+            self.extras = {int(new_row[row]): extras for row, extras in self.extras.items()}
+
+    def memory_usage(self):
+        """列数据占用的字节数（不含字符串表）"""
+        columns = (self.start, self.end, self.status, self.task, self.name,
+                   self.message, self.template, self.matched, self.score, self.run)
+        return sum(column.itemsize * len(column) for column in columns) + 8 * len(self.image)
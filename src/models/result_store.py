@@ -0,0 +1,356 @@
+"""逐图片结果库：每次运行的每张图片（视频为每个被匹配的帧）的得分、结果和错误
+
+保存在 SQLite（cache/results.db，WAL 模式）中：
+    runs     每次运行一行，run_id 与执行日志中的 run_id 相同
+    paths    图片和模板路径只保存一次，结果中保存整数编号
+    results  逐图片结果；只有出错的结果保存消息文本
+按运行、路径、得分区间、错误类型都有索引。
+
+写入由后台线程完成：处理流程每处理完一批图片就把结果放进队列，后台线程每批在一个事务中批量插入，
+不会拖慢匹配；中途崩溃时已处理的批次已经写入。队列有上限，数据库长时间被锁时处理流程在放入时等待，
+不会无限占用内存。程序退出前调用 close_result_stores 写完队列并关闭连接。同一数据库在进程内共享一个写入线程；多个进程（隔离执行的子进程）同时写入时由
+SQLite 的锁协调。
+
+命令行:
+    python -m src.models.result_store --runs --task <任务ID>
+    python -m src.models.result_store --error decode --since "2026-01-01 00:00:00"
+    python -m src.models.result_store --run <run_id> --min-score 0.6 --max-score 0.8
+"""
+import os
+import uuid
+import queue
+import sqlite3
+import argparse
+import threading
+
+# 结果的错误类型，按下标保存为整数；处理流程在结果的 "error" 键中给出类型名
+ERROR_CLASSES = ["", "decode", "template_size", "oversized", "no_frames", "exception"]
+ERROR_CODES = {name: code for code, name in enumerate(ERROR_CLASSES)}
+# 每个事务最多插入的行数
+INSERT_CHUNK = 5000
+# 队列中最多等待写入的批次数
+MAX_PENDING = 256
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL UNIQUE,
+    task_id TEXT,
+    task_name TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    status TEXT,
+    result_count INTEGER NOT NULL DEFAULT 0,
+    matched_count INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_task_start ON runs(task_id, start_time);
+CREATE INDEX IF NOT EXISTS runs_start ON runs(start_time);
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS results (
+    run INTEGER NOT NULL,
+    path INTEGER NOT NULL,
+    score REAL,
+    matched INTEGER NOT NULL,
+    error INTEGER NOT NULL DEFAULT 0,
+    template INTEGER,
+    frame_index INTEGER,
+    timestamp REAL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS results_run_score ON results(run, score);
+CREATE INDEX IF NOT EXISTS results_path ON results(path);
+CREATE INDEX IF NOT EXISTS results_error ON results(error, run) WHERE error != 0;
+"""
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+def _connect(db_file):
+    conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _result_row(result):
+    error = ERROR_CODES.get(result.get("error") or "", ERROR_CODES["exception"])
+    return (result["path"], result.get("template"), result.get("score"), 1 if result.get("matched") else 0,
+            error, result.get("frame_index"), result.get("timestamp"),
+            result.get("message") if error else None)
+
+class ResultStore:
+    def __init__(self, db_file, keep_runs=0):
+        self.db_file = db_file
+        self.keep_runs = keep_runs  # 每个任务保留最近多少次运行，0 表示不限制
+        self.queue = queue.Queue(maxsize=MAX_PENDING)
+        self.thread = None
+        self.lock = threading.Lock()  # 保护写入线程的启动、放入队列和关闭
+        self.closed = False
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        conn = _connect(db_file)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    # ---- 写入（放进队列，由后台线程完成） ----
+
+    def begin_run(self, run_id, task_id, task_name, start_time):
+        self._put(("begin", run_id, task_id, task_name, start_time))
+
+    def add_results(self, run_id, results):
+        if results:
+            self._put(("results", run_id, list(results)))
+
+    def finish_run(self, run_id, status, end_time):
+        self._put(("finish", run_id, status, end_time))
+
+    def flush(self):
+        """等待队列中的写入全部完成"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """写完队列中的结果后停止写入线程并关闭连接；关闭后的写入被丢弃
+
+        结束标记在锁内放入，之后不会再有结果排在它后面而丢失。
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread, self.thread = self.thread, None
+            if thread is not None:
+                self.queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _put(self, item):
+        with self.lock:
+            if self.closed:
+                print(f"Error writing results: result store {self.db_file} is closed")
+                return
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._writer, daemon=True)
+                self.thread.start()
+            self.queue.put(item)
+
+    def _writer(self):
+        """任何一批写入失败都只记录错误并继续取队列，写入线程不会退出，放入队列的线程不会一直等待"""
+        conn = None
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:
+                        return
+                    if conn is None:
+                        conn = _connect(self.db_file)
+                    with conn:
+                        self._apply(conn, item)
+                except Exception as e:
+                    print(f"Error writing results: {e}")
+                finally:
+                    self.queue.task_done()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _apply(self, conn, item):
+        kind, run_id = item[0], item[1]
+        if kind == "begin":
+            conn.execute("INSERT OR IGNORE INTO runs(run_id, task_id, task_name, start_time, status) "
+                         "VALUES (?, ?, ?, ?, '进行中')", (run_id, item[2], item[3], item[4]))
+        elif kind == "results":
+            run = self._run_key(conn, run_id)
+            results = item[2]
+            for start in range(0, len(results), INSERT_CHUNK):
+                rows = [_result_row(result) for result in results[start:start + INSERT_CHUNK]]
+                conn.executemany("INSERT OR IGNORE INTO paths(path) VALUES (?)",
+                                 {(row[0],) for row in rows} | {(row[1],) for row in rows if row[1]})
+                conn.executemany(
+                    "INSERT INTO results(run, path, template, score, matched, error, frame_index, timestamp, message) "
+                    "VALUES (?, (SELECT id FROM paths WHERE path = ?), (SELECT id FROM paths WHERE path = ?), "
+                    "?, ?, ?, ?, ?, ?)", [(run,) + row for row in rows])
+        elif kind == "finish":
+            run = self._run_key(conn, run_id, create=False)
+            if run is None:
+                # 运行在找到图片之前就结束了，没有结果
+                return
+            conn.execute(
+                "UPDATE runs SET status = ?, end_time = ?, "
+                "result_count = (SELECT COUNT(*) FROM results WHERE run = ?), "
+                "matched_count = (SELECT COUNT(*) FROM results WHERE run = ? AND matched), "
+                "error_count = (SELECT COUNT(*) FROM results WHERE run = ? AND error != 0) WHERE id = ?",
+                (item[2], item[3], run, run, run, run))
+            if self.keep_runs:
+                self._prune(conn, run)
+
+    def _run_key(self, conn, run_id, create=True):
+        row = conn.execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None and create:
+            # 没有 begin（例如旧版本的断点），补一行
+            return conn.execute("INSERT INTO runs(run_id) VALUES (?)", (run_id,)).lastrowid
+        return row[0] if row else None
+
+    def _prune(self, conn, run):
+        """只保留该任务最近 keep_runs 次运行的结果"""
+        task_id = conn.execute("SELECT task_id FROM runs WHERE id = ?", (run,)).fetchone()[0]
+        old = [row[0] for row in conn.execute(
+            "SELECT id FROM runs WHERE task_id = ? ORDER BY start_time DESC, id DESC LIMIT -1 OFFSET ?",
+            (task_id, self.keep_runs))]
+        for old_run in old:
+            conn.execute("DELETE FROM results WHERE run = ?", (old_run,))
+            conn.execute("DELETE FROM runs WHERE id = ?", (old_run,))
+
+    # ---- 查询（每次查询使用独立的只读连接，不阻塞写入） ----
+
+    def _query(self, sql, params):
+        conn = _connect(self.db_file)
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def runs(self, task_id=None, since=None, limit=50):
+        """最近的运行，最新的在前"""
+        where, params = [], []
+        if task_id:
+            where.append("task_id = ?")
+            params.append(task_id)
+        if since:
+            where.append("start_time >= ?")
+            params.append(since)
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(where) if where else "")
+        sql += " ORDER BY start_time DESC, id DESC LIMIT ?"
+        return self._query(sql, params + [limit])
+
+    def query(self, run_id=None, task_id=None, path=None, min_score=None, max_score=None,
+              error=None, matched=None, since=None, limit=1000, offset=0):
+        """按条件查询逐图片结果
+
+        path 为路径前缀（目录）或完整路径；error 为错误类型名，"any" 表示任意错误；
+        since 只查询该时间之后开始的运行。
+        """
+        where, params = [], []
+        if run_id:
+            where.append("runs.run_id = ?")
+            params.append(run_id)
+        if task_id:
+            where.append("runs.task_id = ?")
+            params.append(task_id)
+        if since:
+            where.append("runs.start_time >= ?")
+            params.append(since)
+        if path:
+            # 前缀查询用范围条件，可以利用 paths 的唯一索引
+            where.append("results.path IN (SELECT id FROM paths WHERE path >= ? AND path < ?)")
+            params.extend([path, path + "￿"])
+        if min_score is not None:
+            where.append("results.score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            where.append("results.score <= ?")
+            params.append(max_score)
+        if error == "any":
+            where.append("results.error != 0")
+        elif error:
+            if error not in ERROR_CODES:
+                raise ValueError(f"未知的错误类型: {error}")
+            where.append("results.error = ?")
+            params.append(ERROR_CODES[error])
+        if matched is not None:
+            where.append("results.matched = ?")
+            params.append(1 if matched else 0)
+
+        sql = ("SELECT runs.run_id, runs.task_id, runs.start_time, p.path, t.path AS template, results.score, "
+               "results.matched, results.error, results.frame_index, results.timestamp, results.message "
+               "FROM results JOIN runs ON runs.id = results.run JOIN paths p ON p.id = results.path "
+               "LEFT JOIN paths t ON t.id = results.template")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY runs.start_time DESC, results.rowid LIMIT ? OFFSET ?"
+        rows = self._query(sql, params + [limit, offset])
+        for row in rows:
+            row["matched"] = bool(row["matched"])
+            row["error"] = ERROR_CLASSES[row["error"]] or None
+        return rows
+
+    def error_summary(self, run_id):
+        """{错误类型: 数量}"""
+        rows = self._query("SELECT results.error AS error, COUNT(*) AS count FROM results "
+                           "JOIN runs ON runs.id = results.run WHERE runs.run_id = ? AND results.error != 0 "
+                           "GROUP BY results.error", (run_id,))
+        return {ERROR_CLASSES[row["error"]]: row["count"] for row in rows}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_result_store(cache_path, keep_runs=None):
+    """同一数据库在进程内共享一个实例（一个写入线程）；keep_runs 为 None 时不修改保留设置"""
+    db_file = os.path.join(cache_path, "results.db")
+    with _stores_lock:
+        if db_file not in _stores:
+            _stores[db_file] = ResultStore(db_file)
+        if keep_runs is not None:
+            _stores[db_file].keep_runs = keep_runs
+        return _stores[db_file]
+
+def flush_result_stores():
+    """等待所有结果写入完成（进程退出前调用）"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+def close_result_stores():
+    """写完所有结果并关闭数据库连接（程序退出前调用）"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+def main():
+    from src.models.settings import Settings
+
+    parser = argparse.ArgumentParser(description="查询逐图片结果")
+    parser.add_argument("--cache", default=None, help="缓存目录（默认使用设置中的缓存路径）")
+    parser.add_argument("--runs", action="store_true", help="列出最近的运行")
+    parser.add_argument("--run", default=None, help="运行 ID（执行日志中的 run_id）")
+    parser.add_argument("--task", default=None, help="任务 ID")
+    parser.add_argument("--path", default=None, help="路径或目录前缀")
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--max-score", type=float, default=None)
+    parser.add_argument("--error", default=None, choices=ERROR_CLASSES[1:] + ["any"], help="错误类型")
+    parser.add_argument("--matched", choices=("yes", "no"), default=None)
+    parser.add_argument("--since", default=None, help="只查询该时间之后开始的运行 YYYY-MM-DD HH:MM:SS")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    cache_path = args.cache or Settings().get("cache_path", "cache")
+    store = ResultStore(os.path.join(cache_path, "results.db"))
+
+    if args.runs:
+        for run in store.runs(args.task, args.since, args.limit):
+            print(f"{run['run_id']}  {run['start_time']}  {run['task_name'] or run['task_id']}  {run['status']}  "
+                  f"结果 {run['result_count']}  匹配 {run['matched_count']}  错误 {run['error_count']}")
+        return
+
+    matched = None if args.matched is None else args.matched == "yes"
+    rows = store.query(args.run, args.task, args.path, args.min_score, args.max_score,
+                       args.error, matched, args.since, args.limit)
+    for row in rows:
+        frame = "" if row["frame_index"] is None else f"#帧{row['frame_index']}"
+        score = "-" if row["score"] is None else f"{row['score']:.4f}"
+        status = row["error"] or ("匹配" if row["matched"] else "未匹配")
+        print(f"{row['start_time']}  {row['path']}{frame}  {score}  {status}  {row['message'] or ''}")
+    print(f"共 {len(rows)} 条")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""每个任务最近一次扫描的逐图片得分，用于不重新匹配就调整阈值
+
+每张图片保存各模板的最高得分（float32，一行一张图片、一列一个模板；视频每个被匹配的帧一行），
+无法读取或出错的图片记为 NaN，不参与统计。调整阈值时只需在已排序的得分上二分查找，毫秒级得到匹配数量和得分分布。
+
+得分表保存在 cache/scores/<任务ID>.npz。启用断点时每完成一块就写一次未完成的得分表，
+从断点继续时沿用。
+
+命令行:
+    python -m src.models.score_table <任务ID>                       # 得分分布和当前阈值下的匹配数
+    python -m src.models.score_table <任务ID> --sweep 0.5 0.95 0.05  # 扫描一组阈值
+"""
+import os
+import json
+import argparse
+from array import array
+from datetime import datetime
+from src.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+# 视频帧的行标签：<视频路径>#frame=<帧序号>
+FRAME_SEPARATOR = "#frame="
+
+def score_table_file(cache_path, task_id):
+    return os.path.join(cache_path, "scores", f"{task_id}.npz")
+
+def row_label(result):
+    if result.get("frame_index") is None:
+        return result["path"]
+    return f"{result['path']}{FRAME_SEPARATOR}{result['frame_index']}"
+
+def source_path(label):
+    """行标签对应的文件路径（视频帧去掉帧序号）"""
+    return label.split(FRAME_SEPARATOR, 1)[0]
+
+class ScoreTable:
+    """一个任务的逐图片、逐模板得分"""
+
+    def __init__(self, templates, signature=None):
+        self.templates = list(templates)  # [{"path": ..., "threshold": ...}]，与得分列一一对应
+        self.signature = signature
+        self.paths = []
+        self.complete = False
+        self.updated_at = None
+        self._column = {template["path"]: index for index, template in enumerate(self.templates)}
+        self._rows = array("f")  # 运行中逐行追加，读取时再整理成矩阵
+        self._scores = None
+        self._best_sorted = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    # ---- 记录 ----
+
+    def add_results(self, results):
+        """追加一批结果（_process_image_batch 返回的结果字典）"""
+        nan = float("nan")
+        width = len(self.templates)
+        for result in results:
+            row = [nan] * width
+            template_scores = result.get("template_scores")
+            if template_scores:
+                for path, score in template_scores.items():
+                    column = self._column.get(path)
+                    if column is not None:
+                        row[column] = score
+            elif result.get("template") in self._column:
+                row[self._column[result["template"]]] = result.get("score", 0)
+            self._rows.extend(row)
+            self.paths.append(row_label(result))
+        self._scores = None
+        self._best_sorted = None
+
+    def expand_duplicates(self, paths, representative_of):
+        """按内容去重时只匹配了代表图片，把代表图片（或视频各帧）的得分复制给内容相同的其他路径"""
+        rows_of = {}
+        for index, label in enumerate(self.paths):
+            rows_of.setdefault(source_path(label), []).append(index)
+        width = len(self.templates)
+        for path in paths:
+            representative = representative_of.get(path, path)
+            if representative == path or path in rows_of:
+                continue
+            for index in rows_of.get(representative, ()):
+                start = index * width
+                self._rows.extend(self._rows[start:start + width])
+                self.paths.append(path + self.paths[index][len(representative):])
+        self._scores = None
+        self._best_sorted = None
+
+    # ---- 查询 ----
+
+    @property
+    def scores(self):
+        """(图片数, 模板数) 的得分矩阵"""
+        if self._scores is None:
+            # 复制一份，不占用 array 的缓冲区，之后仍可继续追加
+            self._scores = np.frombuffer(self._rows, dtype=np.float32).reshape(
+                len(self.paths), len(self.templates)).copy()
+        return self._scores
+
+    @property
+    def best_scores(self):
+        """每张图片在全部模板中的最高得分；出错的图片为 NaN"""
+        scores = self.scores
+        if not scores.size:
+            return np.empty(len(self.paths), dtype=np.float32)
+        # 整行都是 NaN 时 fmax 仍返回 NaN，且不会产生警告
+        return np.fmax.reduce(scores, axis=1)
+
+    def scored_count(self):
+        return int(np.count_nonzero(~np.isnan(self.best_scores)))
+
+    def _sorted_column(self, template=None):
+        if template is None:
+            if self._best_sorted is None:
+                best = self.best_scores
+                self._best_sorted = np.sort(best[~np.isnan(best)])
+            return self._best_sorted
+        column = self.scores[:, self._column[template]]
+        return np.sort(column[~np.isnan(column)])
+
+    def sweep(self, thresholds, template=None):
+        """每个阈值下得分不低于阈值的图片数
+
+        template 为 None 时所有模板使用同一个阈值（按每张图片的最高得分统计），
+        否则只统计该模板一列。
+        """
+        values = self._sorted_column(template)
+        thresholds = np.asarray(thresholds, dtype=np.float32)
+        return (len(values) - np.searchsorted(values, thresholds, side="left")).tolist()
+
+    def histogram(self, bins=20, low=-1.0, high=1.0, template=None):
+        """得分直方图，返回 (各桶数量, 桶边界)"""
+        counts, edges = np.histogram(self._sorted_column(template), bins=bins, range=(low, high))
+        return counts.tolist(), edges.tolist()
+
+    def match_count(self, thresholds=None):
+        """按各模板自己的阈值判断时匹配的图片数；thresholds 默认使用得分表记录的阈值"""
+        if not len(self.paths) or not self.templates:
+            return 0
+        if thresholds is None:
+            thresholds = [template["threshold"] for template in self.templates]
+        with np.errstate(invalid="ignore"):
+            return int(np.count_nonzero((self.scores >= np.asarray(thresholds, dtype=np.float32)).any(axis=1)))
+
+    def matches_at(self, threshold, limit=50):
+        """统一阈值下匹配的图片 [(路径, 最高得分)]，按得分从高到低"""
+        best = self.best_scores
+        with np.errstate(invalid="ignore"):
+            indices = np.flatnonzero(best >= threshold)
+        indices = indices[np.argsort(-best[indices], kind="stable")][:limit]
+        return [(self.paths[index], float(best[index])) for index in indices]
+
+    def near_threshold(self, threshold, count=10):
+        """得分最接近阈值的图片 [(路径, 最高得分)]，最容易因阈值变化而改变结果"""
+        best = self.best_scores
+        valid = np.flatnonzero(~np.isnan(best))
+        order = valid[np.argsort(np.abs(best[valid] - threshold), kind="stable")][:count]
+        return [(self.paths[index], float(best[index])) for index in order]
+
+    def calibrate(self, thresholds=None, bins=20):
+        """阈值扫描和得分直方图，供界面和任务服务使用"""
+        if thresholds is None:
+            thresholds = [round(0.5 + 0.05 * step, 2) for step in range(10)]
+        counts, edges = self.histogram(bins)
+        return {
+            "images": len(self.paths),
+            "scored": self.scored_count(),
+            "complete": self.complete,
+            "updated_at": self.updated_at,
+            "templates": self.templates,
+            "current_matches": self.match_count(),
+            "sweep": [{"threshold": float(threshold), "matches": matches}
+                      for threshold, matches in zip(thresholds, self.sweep(thresholds))],
+            "histogram": {"counts": counts, "edges": edges}
+        }
+
+    # ---- 读写 ----
+
+    def save(self, table_file, complete=True):
+        """写入 npz（先写临时文件再原子替换）；路径用换行连接后按 UTF-8 保存，读取时不需要 pickle"""
+        self.complete = complete
+        self.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        meta = json.dumps({"templates": self.templates, "signature": self.signature,
+                           "complete": complete, "updated_at": self.updated_at}, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(table_file) or ".", exist_ok=True)
+            tmp_file = f"{table_file}.tmp"
+            with open(tmp_file, "wb") as f:
+                np.savez(f, scores=self.scores,
+                         paths=np.frombuffer("\n".join(self.paths).encode("utf-8"), dtype=np.uint8),
+                         meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8))
+            os.replace(tmp_file, table_file)
+        except Exception as e:
+            print(f"Error saving score table: {e}")
+
+    @classmethod
+    def load(cls, table_file):
+        """读取得分表，文件不存在或损坏时返回 None"""
+        if not os.path.exists(table_file):
+            return None
+        try:
+            with np.load(table_file, allow_pickle=False) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                paths = data["paths"].tobytes().decode("utf-8")
+                scores = data["scores"]
+        except Exception as e:
+            print(f"Error loading score table: {e}")
+            return None
+
+        table = cls(meta.get("templates", []), meta.get("signature"))
+        table.paths = paths.split("\n") if paths else []
+        table._rows = array("f", scores.astype(np.float32, copy=False).tobytes())
+        table.complete = meta.get("complete", True)
+        table.updated_at = meta.get("updated_at")
+        return table
+
+def main():
+    from src.models.settings import Settings
+
+    parser = argparse.ArgumentParser(description="根据保存的得分分布校准匹配阈值")
+    parser.add_argument("task_id", help="任务 ID")
+    parser.add_argument("--cache", default=None, help="缓存目录（默认使用设置中的缓存路径）")
+    parser.add_argument("--sweep", nargs=3, type=float, metavar=("START", "STOP", "STEP"),
+                        default=(0.5, 0.95, 0.05), help="扫描的阈值范围")
+    parser.add_argument("--bins", type=int, default=20, help="直方图桶数")
+    args = parser.parse_args()
+
+    cache_path = args.cache or Settings().get("cache_path", "cache")
+    table = ScoreTable.load(score_table_file(cache_path, args.task_id))
+    if table is None:
+        print("没有该任务的得分记录，请先运行一次任务")
+        return
+
+    start, stop, step = args.sweep
+    thresholds = [round(start + step * index, 4) for index in range(int((stop - start) / step + 1e-9) + 1)]
+    result = table.calibrate(thresholds, args.bins)
+    print(f"图片 {result['images']} 张，有得分 {result['scored']} 张，"
+          f"当前阈值下匹配 {result['current_matches']} 张（{result['updated_at']}"
+          f"{'' if result['complete'] else '，未完成'}）")
+    print(f"{'阈值':>8}{'匹配数':>10}")
+    for item in result["sweep"]:
+        print(f"{item['threshold']:>8.3f}{item['matches']:>10}")
+
+    counts, edges = result["histogram"]["counts"], result["histogram"]["edges"]
+    peak = max(counts) or 1
+    print("得分分布:")
+    for index, count in enumerate(counts):
+        if count:
+            print(f"  [{edges[index]:+.2f}, {edges[index + 1]:+.2f})  {'#' * max(1, count * 40 // peak)} {count}")
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,64 @@ class Settings:
         self.default_settings = {
             "task_path": "tasks",
             "log_path": "logs",
+            "log_compress_closed_days": True,
+            "log_archive_format": "gzip",
+            "log_retention_days": 0,
+            "log_max_total_mb": 0,
+            "log_max_records": 0,
+            "cache_path": "cache",
             "auto_save_interval": 5,
             "auto_load_tasks": True,
+            "scheduler_enabled": True,
+            "schedule_jitter_seconds": 30,
+            "schedule_misfire_grace": 60,
             "image_algorithm": "模板匹配",
             "thread_count": 4,
             "batch_size": 10,
-            "preprocess_image": True
+            "io_thread_count": 0,
+            "io_prefetch_mb": 256,
+            "preprocess_image": True,
+            "preprocess_variant": "高斯模糊+直方图均衡",
+            "template_cache_size": 64,
+            "adaptive_tuning": False,
+            "max_thread_count": (os.cpu_count() or 4) * 2,
+            "max_batch_size": 200,
+            "memory_budget_mb": 0,
+            "max_image_mb": 512,
+            "deduplicate_images": False,
+            "directory_manifest": False,
+            "checkpoint_interval": 1000,
+            "record_scores": True,
+            "result_store_enabled": True,
+            "result_store_keep_runs": 20,
+            "scan_videos": False,
+            "video_frame_stride": 10,
+            "video_static_threshold": 10.0,
+            "video_sequence_fps": 1.0,
+            "isolated_execution": False,
+            "task_cpu_limit": 0,
+            "task_wall_limit": 0,
+            "task_memory_limit_mb": 0,
+            "distributed_enabled": False,
+            "distributed_address": "127.0.0.1:50000",
+            "distributed_authkey": "",
+            "distributed_shard_size": 500,
+            "distributed_lease_seconds": 30,
+            "distributed_wait_seconds": 60,
+            "job_server_enabled": False,
+            "job_server_host": "127.0.0.1",
+            "job_server_port": 8765,
+            "job_server_allowed_actions": [],
+            "similarity_hash": "phash",
+            "similarity_max_distance": 10,
+            "metrics_enabled": False,
+            "metrics_exporter": "无",
+            "metrics_port": 9464,
+            "metrics_json_path": "metrics.json",
+            "metrics_interval": 10
         }
         self.settings = self.load_settings()
+        self.listeners = []  # 设置修改后调用 listener(changed)，changed 为值有变化的键，如执行器的实时调整
     
     def load_settings(self):
         # 如果设置文件存在，则加载
@@ -41,12 +91,30 @@ class Settings:
         return self.settings.get(key, default)
     
     def set(self, key, value):
-        self.settings[key] = value
-        return self.save_settings()
+        return self.update({key: value})
     
     def get_all(self):
         return self.settings
     
     def update(self, settings_dict):
+        changed = {key: value for key, value in settings_dict.items()
+                   if key not in self.settings or self.settings[key] != value}
         self.settings.update(settings_dict)
-        return self.save_settings()    
\ No newline at end of file
+        success = self.save_settings()
+        if changed:
+            self._notify(changed)
+        return success
+    
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
+    def _notify(self, changed):
+        for listener in list(self.listeners):
+            try:
+                listener(changed)
+            except Exception as e:
+                print(f"Error notifying settings listener: {e}")    
\ No newline at end of file
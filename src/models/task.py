@@ -3,11 +3,53 @@ import json
 import uuid
 from datetime import datetime
 
+def parse_templates(text):
+    """解析模板列表文本：多个模板用 ; 分隔，每项可写成 路径|阈值"""
+    templates = []
+    for item in (text or "").split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        path, _, threshold = item.partition("|")
+        templates.append({
+            "path": path.strip(),
+            "threshold": float(threshold) if threshold.strip() else None
+        })
+    return templates
+
+def format_templates(templates):
+    """把模板列表转换回文本，与 parse_templates 对应"""
+    items = []
+    for template in templates or []:
+        if template.get("threshold") is None:
+            items.append(template["path"])
+        else:
+            items.append(f"{template['path']}|{template['threshold']}")
+    return "; ".join(items)
+
+def parse_time_windows(text):
+    """解析视频时间段文本：多个时间段用 ; 分隔，每段写成 开始秒-结束秒，结束可省略"""
+    windows = []
+    for item in (text or "").split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        start, _, end = item.partition("-")
+        windows.append([float(start) if start.strip() else 0.0,
+                        float(end) if end.strip() else None])
+    return windows
+
+def format_time_windows(windows):
+    """把时间段列表转换回文本，与 parse_time_windows 对应"""
+    return "; ".join(f"{start:g}-{'' if end is None else f'{end:g}'}" for start, end in windows or [])
+
 class Task:
     def __init__(self, name="", image_path="", match_action="", 
                  fail_action="", threshold=0.8, recursive=True, 
                  task_id=None, status="就绪", created_at=None, 
-                 last_run=None):
+                 last_run=None, tuned_params=None, templates=None,
+                 preprocess_variant=None, frame_stride=None, time_windows=None,
+                 schedule=None, next_run=None):
         self.id = task_id or str(uuid.uuid4())
         self.name = name
         self.image_path = image_path
@@ -18,6 +60,26 @@ class Task:
         self.status = status
         self.created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.last_run = last_run
+        self.tuned_params = tuned_params  # 自适应调优得到的线程数和批量大小
+        # 模板列表 [{"path": ..., "threshold": ... 或 None}]；为空时以 image_path 作为模板
+        self.templates = templates or []
+        # 预处理方式，None 表示跟随全局设置
+        self.preprocess_variant = preprocess_variant
+        # 视频来源：每隔多少帧取一帧（None 表示跟随全局设置），只处理的时间段 [[开始秒, 结束秒或 None]]
+        self.frame_stride = frame_stride
+        self.time_windows = time_windows or []
+        # 定时计划（见 src/services/scheduler.py），None 表示只手动运行；next_run 为下次计划时间
+        self.schedule = schedule
+        self.next_run = next_run
+    
+    def get_templates(self):
+        """返回模板列表，未配置的阈值使用任务阈值"""
+        templates = self.templates or [{"path": self.image_path, "threshold": None}]
+        return [
+            {"path": template["path"],
+             "threshold": self.threshold if template.get("threshold") is None else template["threshold"]}
+            for template in templates
+        ]
     
     def to_dict(self):
         return {
@@ -30,7 +92,14 @@ class Task:
             "recursive": self.recursive,
             "status": self.status,
             "created_at": self.created_at,
-            "last_run": self.last_run
+            "last_run": self.last_run,
+            "tuned_params": self.tuned_params,
+            "templates": self.templates,
+            "preprocess_variant": self.preprocess_variant,
+            "frame_stride": self.frame_stride,
+            "time_windows": self.time_windows,
+            "schedule": self.schedule,
+            "next_run": self.next_run
         }
     
     @classmethod
@@ -45,7 +114,14 @@ class Task:
             recursive=data.get("recursive", True),
             status=data.get("status", "就绪"),
             created_at=data.get("created_at"),
-            last_run=data.get("last_run")
+            last_run=data.get("last_run"),
+            tuned_params=data.get("tuned_params"),
+            templates=data.get("templates"),
+            preprocess_variant=data.get("preprocess_variant"),
+            frame_stride=data.get("frame_stride"),
+            time_windows=data.get("time_windows"),
+            schedule=data.get("schedule"),
+            next_run=data.get("next_run")
         )
 
 class TaskManager:
@@ -97,14 +173,26 @@ class TaskManager:
     
     def load_all_tasks(self):
         self.tasks = []
+        for chunk in self.iter_load_tasks():
+            self.tasks.extend(chunk)
+        return self.tasks
+    
+    def iter_load_tasks(self, chunk_size=100):
+        """逐批读取任务文件，供后台加载使用（不修改 self.tasks）"""
+        chunk = []
         for filename in os.listdir(self.tasks_dir):
             if filename.endswith(".json"):
                 task_path = os.path.join(self.tasks_dir, filename)
                 try:
                     with open(task_path, "r") as f:
                         task_data = json.load(f)
-                        task = Task.from_dict(task_data)
-                        self.tasks.append(task)
+                        chunk.append(Task.from_dict(task_data))
                 except Exception as e:
                     print(f"Error loading task {filename}: {e}")
-        return self.tasks    
\ No newline at end of file
+            
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        
+        if chunk:
+            yield chunk
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+
+class HillClimbTuner:
+    """根据吞吐量用爬山法调整线程数和批量大小
+
+    每个测量窗口结束时比较吞吐量（图片/秒）：比上一个窗口好就沿当前方向继续，
+    否则反向并切换到另一个维度。
+
+    批次按在途窗口提交，提交后立即开始处理，排队等待总是接近 0，不能用来判断是否饱和。
+    改用每张图片的处理时间（批次处理时间 / 图片数，包括读取等待、解码和匹配）：
+    比目前最快的窗口慢了 contention_limit 倍以上，说明线程已经在争抢 CPU（或存储已经饱和），不再增加线程数。
+    """
+
+    def __init__(self, workers, batch_size, max_workers, max_batch_size,
+                 min_workers=1, min_batch_size=1, window_seconds=2.0,
+                 min_window_images=20, improvement=0.03, contention_limit=1.5):
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max(min_batch_size, max_batch_size)
+        self.workers = self._clamp(workers, self.min_workers, self.max_workers)
+        self.batch_size = self._clamp(batch_size, self.min_batch_size, self.max_batch_size)
+
+        self.window_seconds = window_seconds
+        self.min_window_images = min_window_images
+        self.improvement = improvement
+        self.contention_limit = contention_limit
+        self.fastest_image_time = None  # 目前最快窗口的每张图片处理时间（秒）
+
+        self.dimension = 0  # 0 调整线程数，1 调整批量大小
+        self.direction = [1, 1]
+        self.last_throughput = None
+        self.best = (self.workers, self.batch_size, 0.0)
+        self.history = []
+
+        self.lock = threading.Lock()
+        self._reset_window()
+
+    @classmethod
+    def for_task(cls, task, settings):
+        """以任务上次调优的结果（没有则用全局设置）作为起点"""
+        tuned = getattr(task, "tuned_params", None) or {}
+        cpu_count = os.cpu_count() or 4
+        return cls(
+            workers=tuned.get("thread_count", settings.get("thread_count", 4)),
+            batch_size=tuned.get("batch_size", settings.get("batch_size", 10)),
+            max_workers=settings.get("max_thread_count") or cpu_count * 2,
+            max_batch_size=settings.get("max_batch_size", 200)
+        )
+
+    @staticmethod
+    def _clamp(value, low, high):
+        return max(low, min(high, int(value)))
+
+    def _reset_window(self):
+        self.window_start = time.perf_counter()
+        self.window_images = 0
+        self.window_batches = 0
+        self.window_busy = 0.0
+
+    def record(self, images, busy):
+        """记录一个完成的批次：图片数和处理时间（秒）"""
+        with self.lock:
+            self.window_images += images
+            self.window_batches += 1
+            self.window_busy += busy
+
+            elapsed = time.perf_counter() - self.window_start
+            if elapsed >= self.window_seconds and self.window_images >= self.min_window_images:
+                throughput = self.window_images / elapsed
+                image_time = self.window_busy / self.window_images
+                if self.fastest_image_time is None or image_time < self.fastest_image_time:
+                    self.fastest_image_time = image_time
+                self._step(throughput, image_time / self.fastest_image_time if self.fastest_image_time else 1.0)
+                self._reset_window()
+
+    def _step(self, throughput, slowdown):
+        self.history.append((self.workers, self.batch_size, throughput))
+        if throughput > self.best[2]:
+            self.best = (self.workers, self.batch_size, throughput)
+
+        improved = self.last_throughput is None or throughput >= self.last_throughput * (1 + self.improvement)
+        if not improved:
+            # 变差或持平：反向，并换另一个维度试探
+            self.direction[self.dimension] = -self.direction[self.dimension]
+            self.dimension = 1 - self.dimension
+        self.last_throughput = throughput
+
+        # 每张图片明显变慢，线程之间已经在争抢，不再增加线程
+        if self.dimension == 0 and slowdown > self.contention_limit:
+            self.direction[0] = -1
+
+        if not self._move():
+            # 已到边界，换方向再试一次
+            self.direction[self.dimension] = -self.direction[self.dimension]
+            self._move()
+
+    def _move(self):
+        if self.dimension == 0:
+            workers = self._clamp(self.workers + self.direction[0], self.min_workers, self.max_workers)
+            moved = workers != self.workers
+            self.workers = workers
+        else:
+            if self.direction[1] > 0:
+                batch_size = self.batch_size * 2
+            else:
+                batch_size = self.batch_size // 2
+            batch_size = self._clamp(batch_size, self.min_batch_size, self.max_batch_size)
+            moved = batch_size != self.batch_size
+            self.batch_size = batch_size
+        return moved
+
+    def best_params(self):
+        """目前吞吐量最高的参数，用于保存到任务"""
+        workers, batch_size, throughput = self.best
+        if throughput <= 0:
+            workers, batch_size = self.workers, self.batch_size
+        return {
+            "thread_count": workers,
+            "batch_size": batch_size,
+            "images_per_sec": round(throughput, 2)
+        }
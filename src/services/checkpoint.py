@@ -0,0 +1,106 @@
+import os
+import json
+import bisect
+from datetime import datetime
+
+class TaskCheckpoint:
+    """单个任务的扫描进度，用于中断后从断点继续
+
+    图片按路径排序后分块处理，每完成一块就把游标（已处理的最后一个路径）、匹配结果、
+    最高得分结果和已处理数量写入旁路文件（先写临时文件再原子替换）。
+    只保存匹配的结果和最高得分结果，足以在继续运行后生成同样的日志。
+    """
+
+    def __init__(self, checkpoint_file, signature):
+        self.checkpoint_file = checkpoint_file
+        self.signature = signature
+        self.cursor = None
+        self.processed = 0
+        self.matched_results = []
+        self.best_result = None
+        self.run_id = None  # 结果库中的运行 ID，继续运行时沿用
+        self.resumed = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.checkpoint_file):
+            return
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading checkpoint: {e}")
+            return
+
+        # 任务配置变了，旧进度作废
+        if data.get("signature") != self.signature:
+            return
+        self.cursor = data.get("cursor")
+        self.processed = data.get("processed", 0)
+        self.matched_results = data.get("matched_results", [])
+        self.best_result = data.get("best_result")
+        self.run_id = data.get("run_id")
+        self.resumed = self.cursor is not None
+
+    def save(self):
+        data = {
+            "signature": self.signature,
+            "cursor": self.cursor,
+            "processed": self.processed,
+            "matched_results": self.matched_results,
+            "best_result": self.best_result,
+            "run_id": self.run_id,
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_file) or ".", exist_ok=True)
+            tmp_file = f"{self.checkpoint_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                # NumPy 标量等按浮点数保存
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"), default=float)
+            os.replace(tmp_file, self.checkpoint_file)
+        except Exception as e:
+            print(f"Error saving checkpoint: {e}")
+
+    def remaining(self, sorted_paths):
+        """返回游标之后尚未处理的路径（sorted_paths 必须已排序）"""
+        if self.cursor is None:
+            return sorted_paths
+        return sorted_paths[bisect.bisect_right(sorted_paths, self.cursor):]
+
+    def results(self):
+        """已保存的结果：全部匹配结果，加上未匹配时的最高得分结果"""
+        results = list(self.matched_results)
+        if self.best_result and not self.best_result.get("matched"):
+            results.append(self.best_result)
+        return results
+
+    def advance(self, chunk_paths, chunk_results):
+        """一块图片处理完成后更新进度并写盘"""
+        for result in chunk_results:
+            if result.get("matched"):
+                self.matched_results.append(result)
+            if self.best_result is None or result.get("score", 0) > self.best_result.get("score", 0):
+                self.best_result = result
+        self.cursor = chunk_paths[-1]
+        self.processed += len(chunk_paths)
+        self.save()
+
+    def clear(self):
+        """任务完成后删除断点文件"""
+        try:
+            os.remove(self.checkpoint_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing checkpoint: {e}")
+
+def task_signature(task, algorithm, variant):
+    """影响扫描结果的任务配置；任何一项变化都不能沿用旧进度"""
+    return {
+        "image_path": task.image_path,
+        "recursive": task.recursive,
+        "templates": task.get_templates(),
+        "algorithm": algorithm,
+        "preprocess_variant": variant
+    }
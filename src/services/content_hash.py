@@ -0,0 +1,131 @@
+import os
+import json
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash  # 可选依赖，安装后使用更快的 xxh3
+except ImportError:
+    xxhash = None
+
+CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+    """流式计算文件内容哈希（非加密哈希，只用于判断内容是否相同）"""
+    size = 0
+    if xxhash is not None:
+        hasher = xxhash.xxh3_64()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+                size += len(chunk)
+        return f"{size:x}-{hasher.hexdigest()}"
+
+    # 没有 xxhash 时组合 crc32 和 adler32，再加上文件大小降低碰撞概率
+    crc = 0
+    adler = 1
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            adler = zlib.adler32(chunk, adler)
+            size += len(chunk)
+    return f"{size:x}-{crc:08x}{adler:08x}"
+
+class ContentHasher:
+    """带缓存的文件内容哈希，缓存按路径 + 修改时间失效"""
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.cache = {}  # path -> [mtime_ns, size, digest]
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load_cache()
+
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                self.cache = json.load(f)
+        except Exception as e:
+            print(f"Error loading content hash cache: {e}")
+            self.cache = {}
+
+    def save_cache(self):
+        if not self.cache_file or not self.dirty:
+            return
+        with self.lock:
+            data = dict(self.cache)
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving content hash cache: {e}")
+
+    def get_hash(self, path):
+        """返回文件内容哈希，读取失败时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        try:
+            digest = hash_file(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            self.cache[path] = [stat.st_mtime_ns, stat.st_size, digest]
+            self.dirty = True
+        return digest
+
+    def deduplicate(self, paths, thread_count=4):
+        """按内容分组，返回 (每组代表路径列表, 路径 -> 代表路径)
+
+        代表路径按原顺序取每组第一次出现的路径；无法计算哈希的文件各自成组。
+        """
+        with ThreadPoolExecutor(max_workers=max(1, thread_count)) as executor:
+            digests = list(executor.map(self.get_hash, paths))
+
+        unique_paths = []
+        representative_of = {}
+        first_by_digest = {}
+        for path, digest in zip(paths, digests):
+            if digest is None:
+                unique_paths.append(path)
+                representative_of[path] = path
+                continue
+            representative = first_by_digest.setdefault(digest, path)
+            representative_of[path] = representative
+            if representative == path:
+                unique_paths.append(path)
+
+        self.save_cache()
+        return unique_paths, representative_of
+
+def expand_duplicate_results(paths, results, representative_of):
+    """把代表路径的结果复制给内容相同的其他路径，保持原有路径顺序
+
+    视频的每个被匹配的帧各有一个结果，同一路径可能对应多个结果。
+    """
+    results_by_path = {}
+    for result in results:
+        results_by_path.setdefault(result["path"], []).append(result)
+    expanded = []
+    for path in paths:
+        representative = representative_of.get(path, path)
+        for result in results_by_path.get(representative, ()):
+            if representative != path:
+                result = dict(result, path=path, duplicate_of=representative)
+            expanded.append(result)
+    return expanded
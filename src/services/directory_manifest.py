@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import threading
+from src.services.video_source import is_video_name
+
+IMAGE_EXTENSIONS = frozenset(['.png', '.jpg', '.jpeg', '.bmp'])
+
+# 修改时间距扫描时刻不足这么久的目录，下次仍重新列出：
+# 同一时间粒度内的后续修改可能不会改变 mtime
+RACY_WINDOW_NS = 2 * 1000 ** 3
+MANIFEST_VERSION = 2
+
+def is_image_name(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+class DirectoryManifest:
+    """持久化的目录清单，记录每个目录的修改时间、图片文件名和子目录名
+
+    目录的修改时间在增删、重命名其中的条目时会改变，mtime 未变的目录直接使用缓存的清单，
+    只有变化的目录才用 os.scandir 重新列出。
+
+    清单由所有任务共享，"新增"则按任务计算：每次重新列出目录时递增一个编号，文件记录第一次出现时的编号；
+    每个任务记录自己上次扫描时看到的各目录的最大编号，编号更大的文件才是这个任务的新增文件。
+    两个任务监视同一目录时互不影响。
+    """
+
+    def __init__(self, manifest_file=None):
+        self.manifest_file = manifest_file
+        # 目录 -> {"mtime": ns 或 None, "images": [文件名], "videos": [文件名], "subdirs": [目录名],
+        #          "image_seen": [编号], "video_seen": [编号], "stamp": 最大编号}
+        self.dirs = {}
+        self.generation = 0  # 最近一次列出目录使用的编号
+        self.tasks = {}  # 任务 ID -> {目录: 上次扫描时看到的最大编号}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.dirs = data["dirs"]
+                self.generation = data.get("generation", 0)
+                self.tasks = data.get("tasks", {})
+            else:
+                # 旧版本只保存了目录清单，没有编号，这些目录下次扫描时重新列出
+                self.dirs = data
+        except Exception as e:
+            print(f"Error loading directory manifest: {e}")
+            self.dirs = {}
+
+    def save(self):
+        if not self.manifest_file or not self.dirty:
+            return
+        with self.lock:
+            data = {"version": MANIFEST_VERSION, "generation": self.generation,
+                    "dirs": dict(self.dirs), "tasks": dict(self.tasks)}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.manifest_file) or ".", exist_ok=True)
+            tmp_file = f"{self.manifest_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.manifest_file)
+        except Exception as e:
+            print(f"Error saving directory manifest: {e}")
+
+    def _list_directory(self, directory, mtime, cached=None):
+        """用 os.scandir 列出目录；DirEntry 自带的类型信息通常不需要额外 stat
+
+        之前已经在清单中的文件保留原来的编号，新出现的文件使用新的编号。
+        """
+        images, videos, subdirs = [], [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # 不进入指向目录的符号链接（与 os.walk 默认一致），指向上级目录的链接不会造成无限遍历
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file() and is_image_name(entry.name):
+                        images.append(entry.name)
+                    elif entry.is_file() and is_video_name(entry.name):
+                        videos.append(entry.name)
+                except OSError:
+                    continue
+
+        if time.time_ns() - mtime < RACY_WINDOW_NS:
+            mtime = None
+        with self.lock:
+            self.generation += 1
+            stamp = self.generation
+        old_seen = {}
+        if cached:
+            for kind in ("images", "videos"):
+                names = cached.get(kind, ())
+                old_seen.update(zip(names, cached.get(kind[:-1] + "_seen") or [0] * len(names)))
+        return {"mtime": mtime, "images": images, "videos": videos, "subdirs": subdirs,
+                "image_seen": [old_seen.get(name, stamp) for name in images],
+                "video_seen": [old_seen.get(name, stamp) for name in videos],
+                "stamp": stamp}
+
+    def _forget(self, directory):
+        """删除目录及其所有子目录的缓存（调用方持有锁）"""
+        entry = self.dirs.pop(directory, None)
+        if entry:
+            for name in entry["subdirs"]:
+                self._forget(os.path.join(directory, name))
+
+    def iter_images(self, root, recursive=True, new_files=None, include_videos=False, last_seen=None, seen=None):
+        """逐个目录产出图片路径（include_videos 为 True 时也产出视频文件）
+
+        new_files 为列表时，把新出现的图片路径追加进去：给出 last_seen（任务上次扫描时各目录的最大编号）时
+        按编号判断，目录不在其中表示任务第一次扫描这个目录，全部算作新增；否则为本次重新列出时新出现的文件。
+        seen 为字典时记录本次经过的各目录的最大编号，作为该任务下次扫描的 last_seen。
+        """
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                with self.lock:
+                    self._forget(directory)
+                continue
+
+            with self.lock:
+                cached = self.dirs.get(directory)
+            # 旧版本的清单没有记录视频文件或编号，重新列出一次
+            relisted = None
+            if cached is None or cached["mtime"] != mtime or "video_seen" not in cached:
+                try:
+                    listing = self._list_directory(directory, mtime, cached)
+                except OSError:
+                    continue
+                removed = set(cached["subdirs"]) - set(listing["subdirs"]) if cached else set()
+                with self.lock:
+                    for name in removed:
+                        self._forget(os.path.join(directory, name))
+                    self.dirs[directory] = listing
+                    self.dirty = True
+                relisted = listing["stamp"]
+                cached = listing
+
+            if new_files is not None:
+                if last_seen is not None:
+                    # 编号大于该任务上次看到的最大编号的文件；目录的最大编号没有变化时直接跳过
+                    after = last_seen.get(directory, -1)
+                elif relisted is not None:
+                    after = relisted - 1
+                else:
+                    after = cached["stamp"]
+                if cached["stamp"] > after:
+                    kinds = ("images", "videos") if include_videos else ("images",)
+                    for kind in kinds:
+                        new_files.extend(os.path.join(directory, name)
+                                         for name, stamp in zip(cached[kind], cached[kind[:-1] + "_seen"])
+                                         if stamp > after)
+            if seen is not None:
+                seen[directory] = cached["stamp"]
+
+            for name in cached["images"]:
+                yield os.path.join(directory, name)
+            if include_videos:
+                for name in cached["videos"]:
+                    yield os.path.join(directory, name)
+            if recursive:
+                pending.extend(os.path.join(directory, name) for name in reversed(cached["subdirs"]))
+
+    def scan(self, root, recursive=True, include_videos=False, task_id=None):
+        """返回 (全部图片路径, 新出现的图片路径)，并保存清单
+
+        给出 task_id 时新增相对于该任务上次扫描；否则相对于任何任务的上次扫描。
+        """
+        new_files = []
+        last_seen = seen = None
+        if task_id is not None:
+            with self.lock:
+                last_seen = self.tasks.get(task_id, {})
+            seen = {}
+        image_paths = list(self.iter_images(root, recursive, new_files, include_videos, last_seen, seen))
+        if task_id is not None:
+            with self.lock:
+                self.tasks[task_id] = seen
+                self.dirty = True
+        self.save()
+        return image_paths, new_files
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+def get_directory_manifest(cache_path):
+    """同一缓存目录在进程内共享一个清单"""
+    manifest_file = os.path.join(cache_path, "directory_manifest.json")
+    with _manifests_lock:
+        if manifest_file not in _manifests:
+            _manifests[manifest_file] = DirectoryManifest(manifest_file)
+        return _manifests[manifest_file]
@@ -0,0 +1,319 @@
+"""协调者 / 工作者模式：把一个任务的图片分片交给多个工作进程匹配
+
+协调者在 TaskExecutor 所在进程中运行一个 multiprocessing.managers 服务，
+工作者通过 TCP 连接后领取分片、匹配、交回结果。每个领取的分片有租约，
+工作者定期续约；租约过期（工作者退出或失联）的分片重新排队。
+扫描、去重、断点、动作和日志仍由协调者的 ImageProcessor 完成，只有匹配步骤被分发。
+一段时间内没有任何工作者在处理（从未连接或全部退出）时，剩余分片改在协调者本地匹配。
+
+管理服务的协议会反序列化（pickle）对端发来的数据，认证密钥就是唯一的防线：
+没有设置密钥（或仍是旧版本的公开默认值）时协调者第一次启动会生成随机密钥并保存到设置中。
+
+启动工作者（图片和模板路径在工作者上必须可以访问；与协调者在同一台机器上时可省略 --authkey，从设置中读取）:
+    python -m src.services.distributed --address 127.0.0.1:50000 --authkey <协调者设置中的 distributed_authkey>
+"""
+import os
+import time
+import uuid
+import secrets
+import argparse
+import platform
+import threading
+from collections import OrderedDict, deque
+from multiprocessing.managers import BaseManager
+
+# 等待工作者领取分片时的轮询间隔
+POLL_INTERVAL = 0.5
+# 旧版本写在设置中的公开默认密钥，视为没有设置
+LEGACY_AUTHKEY = "wgjx"
+# 同一分片在工作者上出错的次数达到上限后不再重试，记为出错结果
+MAX_SHARD_FAILURES = 3
+
+class ShardsCancelled(Exception):
+    """任务被停止，分发中止"""
+    pass
+
+def ensure_authkey(settings):
+    """返回协调者的认证密钥；没有设置时生成随机密钥并保存到设置中"""
+    authkey = settings.get("distributed_authkey") or ""
+    if authkey and authkey != LEGACY_AUTHKEY:
+        return authkey
+    authkey = secrets.token_hex(16)
+    if hasattr(settings, "set"):
+        settings.set("distributed_authkey", authkey)
+    else:
+        settings["distributed_authkey"] = authkey
+    print(f"已生成分布式认证密钥，启动工作者时使用 --authkey {authkey}")
+    return authkey
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def split_shards(image_paths, shard_size):
+    """按目录分片：同一目录的图片尽量在同一分片，大目录再按 shard_size 切开"""
+    by_directory = OrderedDict()
+    for path in image_paths:
+        by_directory.setdefault(os.path.dirname(path), []).append(path)
+
+    shards, current = [], []
+    for paths in by_directory.values():
+        for i in range(0, len(paths), shard_size):
+            piece = paths[i:i + shard_size]
+            if current and len(current) + len(piece) > shard_size:
+                shards.append(current)
+                current = []
+            current.extend(piece)
+    if current:
+        shards.append(current)
+    return shards
+
+class ShardBoard:
+    """分片看板，由协调者的管理服务提供给所有工作者（方法在服务线程中调用）"""
+
+    def __init__(self, lease_seconds=30):
+        self.lease_seconds = lease_seconds
+        self.jobs = {}  # job_id -> {"task", "settings", "shards", "results"}
+        self.queue = deque()  # 待领取的 (job_id, 分片号)
+        self.leases = {}  # (job_id, 分片号) -> [工作者, 到期时间]
+        self.failures = {}  # (job_id, 分片号) -> 出错次数
+        self.lock = threading.Lock()
+
+    def submit(self, job_id, task_data, settings_data, shards):
+        with self.lock:
+            self.jobs[job_id] = {"task": task_data, "settings": settings_data,
+                                 "shards": shards, "results": {}}
+            self.queue.extend((job_id, shard_id) for shard_id in range(len(shards)))
+
+    def take(self, worker_id):
+        """领取一个分片，没有可领取的分片时返回 None"""
+        with self.lock:
+            self._requeue_expired()
+            while self.queue:
+                key = self.queue.popleft()
+                job = self.jobs.get(key[0])
+                if job is None or key[1] in job["results"]:
+                    continue
+                self.leases[key] = [worker_id, time.monotonic() + self.lease_seconds]
+                return key[0], key[1], job["task"], job["settings"], job["shards"][key[1]]
+            return None
+
+    def get_lease_seconds(self):
+        return self.lease_seconds
+
+    def heartbeat(self, worker_id):
+        """续约该工作者持有的全部分片"""
+        deadline = time.monotonic() + self.lease_seconds
+        with self.lock:
+            for lease in self.leases.values():
+                if lease[0] == worker_id:
+                    lease[1] = deadline
+
+    def complete(self, worker_id, job_id, shard_id, results):
+        """交回结果；分片被重新分配后两份结果都可能到达，先到者为准"""
+        with self.lock:
+            self.leases.pop((job_id, shard_id), None)
+            job = self.jobs.get(job_id)
+            if job is not None and shard_id not in job["results"]:
+                job["results"][shard_id] = results
+
+    def fail(self, worker_id, job_id, shard_id, message):
+        """工作者处理分片出错：释放租约并重新排队，出错次数达到上限时记为出错结果"""
+        with self.lock:
+            key = (job_id, shard_id)
+            self.leases.pop(key, None)
+            job = self.jobs.get(job_id)
+            if job is None or shard_id in job["results"]:
+                return
+            self.failures[key] = self.failures.get(key, 0) + 1
+            print(f"工作者 {worker_id} 处理分片 {shard_id} 出错: {message}")
+            if self.failures[key] < MAX_SHARD_FAILURES:
+                self.queue.appendleft(key)
+                return
+            job["results"][shard_id] = [
+                {"path": path, "matched": False, "score": 0, "message": f"工作者处理出错: {message}",
+                 "error": "exception"} for path in job["shards"][shard_id]]
+
+    def progress(self, job_id):
+        """返回 (已完成分片数, 分片总数, 正在被工作者处理的分片数)"""
+        with self.lock:
+            self._requeue_expired()
+            job = self.jobs.get(job_id)
+            if job is None:
+                return 0, 0, 0
+            leased = sum(1 for key in self.leases if key[0] == job_id)
+            return len(job["results"]), len(job["shards"]), leased
+
+    def withdraw(self, job_id):
+        """收回全部未完成的分片（不再分给工作者），返回 [(分片号, 路径列表)]"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return []
+            self.queue = deque(key for key in self.queue if key[0] != job_id)
+            for key in [key for key in self.leases if key[0] == job_id]:
+                del self.leases[key]
+            return [(shard_id, shard) for shard_id, shard in enumerate(job["shards"])
+                    if shard_id not in job["results"]]
+
+    def collect(self, job_id):
+        """取出全部结果（按分片顺序）并删除任务"""
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return []
+            for key in [key for key in self.leases if key[0] == job_id]:
+                del self.leases[key]
+            for key in [key for key in self.failures if key[0] == job_id]:
+                del self.failures[key]
+            results = []
+            for shard_id in range(len(job["shards"])):
+                results.extend(job["results"].get(shard_id, []))
+            return results
+
+    def _requeue_expired(self):
+        now = time.monotonic()
+        for key, (worker_id, deadline) in list(self.leases.items()):
+            if deadline < now:
+                print(f"工作者 {worker_id} 租约过期，分片 {key[1]} 重新排队")
+                del self.leases[key]
+                self.queue.appendleft(key)
+
+class DistributedCoordinator:
+    """在本进程中提供分片看板服务，并把匹配步骤分发给工作者"""
+
+    def __init__(self, settings):
+        self.address = parse_address(settings.get("distributed_address", "127.0.0.1:50000"))
+        self.authkey = ensure_authkey(settings).encode("utf-8")
+        self.shard_size = settings.get("distributed_shard_size", 500)
+        # 这么多秒内没有任何分片完成、也没有工作者在处理时，剩余分片改在本地匹配
+        self.wait_seconds = settings.get("distributed_wait_seconds", 60)
+        self.board = ShardBoard(settings.get("distributed_lease_seconds", 30))
+
+        # 每个协调者使用独立的管理器类，注册的是本实例的看板
+        manager_class = type("CoordinatorManager", (BaseManager,), {})
+        manager_class.register("board", callable=lambda: self.board)
+        self.server = manager_class(address=self.address, authkey=self.authkey).get_server()
+        self.address = self.server.address  # 端口为 0 时取实际端口
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def run_shards(self, task, image_paths, settings_data, local_runner=None, cancel_event=None):
+        """分发一组图片并等待全部分片完成，返回与本地匹配相同格式的结果
+
+        local_runner(paths) 为本地匹配；没有工作者可用时用它处理剩余分片。
+        cancel_event 是本次运行自己的停止标志，被设置时收回分片并抛出 ShardsCancelled。
+        """
+        job_id = str(uuid.uuid4())
+        shards = split_shards(image_paths, self.shard_size)
+        self.board.submit(job_id, task.to_dict(), settings_data, shards)
+        last_done, last_activity = 0, time.monotonic()
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self.board.collect(job_id)
+                raise ShardsCancelled("任务已被停止")
+            
+            done, total, leased = self.board.progress(job_id)
+            if done >= total:
+                break
+            now = time.monotonic()
+            if done != last_done or leased:
+                last_done, last_activity = done, now
+            elif local_runner is not None and now - last_activity > self.wait_seconds:
+                remaining = self.board.withdraw(job_id)
+                print(f"{self.wait_seconds} 秒内没有工作者处理分片，剩余 {len(remaining)} 个分片改在本地匹配")
+                for shard_id, paths in remaining:
+                    self.board.complete("local", job_id, shard_id, local_runner(paths))
+                break
+            time.sleep(POLL_INTERVAL)
+        return self.board.collect(job_id)
+
+    def shutdown(self):
+        stop_event = getattr(self.server, "stop_event", None)
+        if stop_event is not None:
+            stop_event.set()
+
+class WorkerManager(BaseManager):
+    pass
+
+WorkerManager.register("board")
+
+def run_worker(address, authkey, thread_count=None, worker_id=None, idle_exit=None):
+    """工作者主循环：领取分片、匹配、交回结果
+
+    idle_exit 秒内没有领到分片时退出（None 表示一直运行）。
+    """
+    from src.models.task import Task
+    from src.services.image_processor import ImageProcessor
+    from src.services.metrics import NULL_RUN_METRICS
+
+    worker_id = worker_id or f"{platform.node()}-{os.getpid()}"
+    if isinstance(address, str):
+        address = parse_address(address)
+    if isinstance(authkey, str):
+        authkey = authkey.encode("utf-8")
+    manager = WorkerManager(address=address, authkey=authkey)
+    manager.connect()
+    board = manager.board()
+
+    # 心跳线程：每个租约期内续约三次，匹配耗时再长租约也不会过期
+    stopped = threading.Event()
+    interval = max(1.0, board.get_lease_seconds() / 3)
+
+    def heartbeat():
+        heartbeat_board = manager.board()
+        while not stopped.wait(interval):
+            heartbeat_board.heartbeat(worker_id)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    processors = {}  # 按设置快照复用 ImageProcessor
+    idle_since = time.monotonic()
+    try:
+        while True:
+            shard = board.take(worker_id)
+            if shard is None:
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    return
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            job_id, shard_id, task_data, settings_data, paths = shard
+            if thread_count:
+                settings_data = dict(settings_data, thread_count=thread_count)
+            processor = processors.get(job_id)
+            if processor is None:
+                processors.clear()
+                processor = processors[job_id] = ImageProcessor(settings_data)
+            try:
+                results = processor._run_algorithm(Task.from_dict(task_data), paths, NULL_RUN_METRICS)
+            except Exception as e:
+                # 释放租约，分片立即重新排队，不必等租约过期
+                board.fail(worker_id, job_id, shard_id, str(e))
+            else:
+                board.complete(worker_id, job_id, shard_id, results)
+            idle_since = time.monotonic()
+    except (EOFError, ConnectionError):
+        print(f"工作者 {worker_id} 与协调者的连接已断开，退出")
+    finally:
+        stopped.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式匹配工作者")
+    parser.add_argument("--address", default="127.0.0.1:50000", help="协调者地址 host:port")
+    parser.add_argument("--authkey", default=None,
+                        help="与协调者设置一致的认证密钥（默认读取本机设置中的 distributed_authkey）")
+    parser.add_argument("--threads", type=int, default=None, help="本机处理线程数（默认沿用协调者设置）")
+    parser.add_argument("--worker-id", default=None, help="工作者名称")
+    args = parser.parse_args()
+
+    authkey = args.authkey
+    if not authkey:
+        from src.models.settings import Settings
+        authkey = Settings().get("distributed_authkey")
+    if not authkey or authkey == LEGACY_AUTHKEY:
+        parser.error("没有认证密钥：请用 --authkey 指定协调者设置中的 distributed_authkey")
+    run_worker(args.address, authkey, args.threads, args.worker_id)
+
+if __name__ == "__main__":
+    main()
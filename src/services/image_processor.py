@@ -1,53 +1,175 @@
 import os
-import cv2
-import numpy as np
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from src.models.execution_log import ExecutionLog
+from src.services.metrics import registry as metrics_registry, NULL_RUN_METRICS
+from src.services.autotuner import HillClimbTuner
+from src.services.memory_budget import get_memory_budget, OversizedImageError, BYTES_PER_PIXEL
+from src.services.content_hash import ContentHasher, expand_duplicate_results
+from src.services.similarity_index import get_similarity_index, HASH_FUNCTIONS, verify_similarity
+from src.services.template_matcher import TemplateEntry, TemplateSet
+from src.services.template_cache import template_cache
+from src.services.checkpoint import TaskCheckpoint, task_signature
+from src.services.directory_manifest import get_directory_manifest, is_image_name
+from src.services.video_source import (VideoFrames, StaticFrameFilter, VideoOpenError, is_video_name,
+                                       is_frame_sequence, is_video_source)
+from src.services.prefetch import FilePrefetcher
+from src.services.preprocessing import PREPROCESS_VARIANTS, DEFAULT_VARIANT, NO_PREPROCESS, resolve_variant
+from src.models.score_table import ScoreTable, score_table_file
+from src.models.result_store import get_result_store, new_run_id
+from src.utils.lazy_import import lazy_import
+
+# 图像库体积较大，延迟到第一次使用时再导入，缩短启动时间
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 class ImageProcessor:
     def __init__(self, settings):
         self.settings = settings
+        self.shard_runner = None  # 分布式模式下由 TaskExecutor 设置，匹配步骤交给工作者
+        self.content_hasher = None  # 第一次去重时再加载哈希缓存
+        self.reconfigure()
+    
+    def reconfigure(self):
+        """按当前设置更新处理参数，运行中修改设置时由 TaskExecutor 调用
+
+        线程数和批量大小从下一批图片开始生效（见 _run_batches）；读取线程数、算法和预处理方式从下一个断点块开始生效，
+        同一块内的图片总是使用同一套配置。已提交的批次照常完成，进度不会丢失。
+        """
+        settings = self.settings
         self.thread_count = settings.get("thread_count", 4)
         self.batch_size = settings.get("batch_size", 10)
+        self.max_thread_count = settings.get("max_thread_count") or (os.cpu_count() or 4) * 2
+        # 读取线程数，与处理线程数分开设置；0 表示不单独读取，由处理线程自己读文件
+        self.io_thread_count = settings.get("io_thread_count", 0)
+        self.io_prefetch_bytes = int(settings.get("io_prefetch_mb", 256) * 1024 * 1024)
         self.preprocess = settings.get("preprocess_image", True)
         self.algorithm = settings.get("image_algorithm", "模板匹配")
+        self.adaptive_tuning = settings.get("adaptive_tuning", False)
+        self.memory_budget = get_memory_budget(settings)
+        self.deduplicate = settings.get("deduplicate_images", False)
+        self.cache_path = settings.get("cache_path", "cache")
+        self.use_manifest = settings.get("directory_manifest", False)
+        self.checkpoint_interval = settings.get("checkpoint_interval", 1000)
+        # 逐图片得分只对模板匹配有意义（相似度检索只返回候选图）
+        self.record_scores = settings.get("record_scores", True) and self.algorithm == "模板匹配"
+        # 逐图片结果库，后台线程写入
+        if settings.get("result_store_enabled", True):
+            self.result_store = get_result_store(self.cache_path, settings.get("result_store_keep_runs", 20))
+        else:
+            self.result_store = None
+        self.similarity_hash = settings.get("similarity_hash", "phash")
+        self.similarity_max_distance = settings.get("similarity_max_distance", 10)
+        # 视频来源：目录中的视频文件默认不处理，直接指定的视频文件或帧序列总是处理
+        self.scan_videos = settings.get("scan_videos", False)
+        self.video_frame_stride = settings.get("video_frame_stride", 10)
+        self.video_static_threshold = settings.get("video_static_threshold", 10.0)
+        self.video_sequence_fps = settings.get("video_sequence_fps", 1.0)
+        template_cache.resize(settings.get("template_cache_size", 64))
     
     def process_task(self, task, log_manager):
         """处理单个任务，识别指定路径下的图片"""
+        run_metrics = metrics_registry.new_run()
+        # 结果库在整次运行中保持不变，运行中修改设置不会留下没有结束的运行
+        result_store = self.result_store
+        
         # 创建执行日志
         log = ExecutionLog(
             task_id=task.id,
             task_name=task.name,
             status="进行中",
-            message="开始处理任务..."
+            message="开始处理任务...",
+            run_id=new_run_id()
         )
-        log_manager.add_log(log)
+        self._write_log(log_manager, log, run_metrics)
         
         try:
             # 获取所有需要处理的图片路径
-            image_paths = self._get_image_paths(task.image_path, task.recursive)
+            start = run_metrics.clock()
+            image_paths, new_image_paths = self._scan_image_paths(task.image_path, task.recursive, task.id)
+            run_metrics.observe("scan", start)
+            if new_image_paths is not None:
+                log.new_image_count = len(new_image_paths)
             
             if not image_paths:
                 log.status = "失败"
                 log.message = "未找到图片文件"
                 log.end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                log_manager.add_log(log)
+                self._finish_log(log_manager, log, run_metrics, result_store)
                 return False
             
-            # 根据算法类型处理图片
-            if self.algorithm == "模板匹配":
-                results = self._process_with_template_matching(task, image_paths)
-            elif self.algorithm == "特征点匹配":
-                results = self._process_with_feature_matching(task, image_paths)
-            elif self.algorithm == "深度学习":
-                results = self._process_with_deep_learning(task, image_paths)
+            # 启用断点时按路径排序，游标才有意义
+            checkpoint = self._open_checkpoint(task, image_paths)
+            if checkpoint:
+                image_paths = sorted(image_paths)
+                if checkpoint.resumed and checkpoint.run_id:
+                    # 继续的运行沿用原来的运行 ID，结果库中前后两段结果属于同一次运行
+                    log.run_id = checkpoint.run_id
+                checkpoint.run_id = log.run_id
+                if checkpoint.resumed:
+                    log.message = f"从断点继续，已处理 {checkpoint.processed} 张图片..."
+                    self._write_log(log_manager, log, run_metrics)
+            
+            if result_store is not None:
+                result_store.begin_run(log.run_id, task.id, task.name, log.start_time)
+            
+            # 按内容去重，内容相同的图片只处理一次
+            all_image_paths = image_paths
+            representative_of = None
+            if self.deduplicate:
+                start = run_metrics.clock()
+                image_paths, representative_of = self._get_content_hasher().deduplicate(
+                    image_paths, self.thread_count)
+                run_metrics.observe("hash", start)
+            
+            # 记录逐图片得分，之后调整阈值不必重新扫描
+            scores = self._open_score_table(task, checkpoint) if self.record_scores else None
+            
+            if checkpoint:
+                # 分块处理，每块完成后保存进度
+                results = checkpoint.results()
+                image_paths = checkpoint.remaining(image_paths)
+                for i in range(0, len(image_paths), self.checkpoint_interval):
+                    chunk = image_paths[i:i + self.checkpoint_interval]
+                    # 运行中修改了算法或预处理方式时，断点按新配置保存，中断后按新配置继续
+                    checkpoint.signature = self._task_signature(task)
+                    if scores is not None:
+                        scores.signature = checkpoint.signature
+                    chunk_results = self._run_algorithm(task, chunk, run_metrics)
+                    results.extend(chunk_results)
+                    checkpoint.advance(chunk, chunk_results)
+                    if result_store is not None:
+                        result_store.add_results(log.run_id, chunk_results)
+                    if scores is not None:
+                        scores.add_results(chunk_results)
+                        scores.save(score_table_file(self.cache_path, task.id), complete=False)
             else:
-                results = []
+                # 每处理完一批就写入结果库，中途崩溃时已处理的结果不会丢失
+                on_results = None
+                if result_store is not None:
+                    on_results = lambda batch_results: result_store.add_results(log.run_id, batch_results)
+                results = self._run_algorithm(task, image_paths, run_metrics, on_results)
+                if scores is not None:
+                    scores.add_results(results)
+            
+            # 把结果复制给内容重复的路径，逐路径的结果保持完整
+            if representative_of:
+                results = expand_duplicate_results(all_image_paths, results, representative_of)
+                if scores is not None:
+                    scores.expand_duplicates(all_image_paths, representative_of)
+            
+            if scores is not None:
+                scores.save(score_table_file(self.cache_path, task.id))
+            
+            if result_store is not None:
+                # 处理过的结果已经逐批写入，只剩复制给重复路径的结果
+                result_store.add_results(log.run_id, [r for r in results if r.get("duplicate_of")])
             
             # 处理结果
             matched = any(result["matched"] for result in results)
             
+            start = run_metrics.clock()
             if matched:
                 # 执行匹配成功动作
                 self._execute_action(task.match_action)
@@ -56,6 +178,7 @@ class ImageProcessor:
                 # 执行匹配失败动作
                 self._execute_action(task.fail_action)
                 log.message = "匹配失败！未找到符合条件的图片"
+            run_metrics.observe("action", start)
             
             # 更新任务状态和最后运行时间
             task.status = "已完成"
@@ -66,9 +189,16 @@ class ImageProcessor:
             log.end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             log.matched = matched
             log.match_score = max(result["score"] for result in results) if results else 0
-            log.matched_image = next((result["path"] for result in results if result["matched"]), None)
+            matched_result = next((result for result in results if result["matched"]), None)
+            log.matched_image = matched_result["path"] if matched_result else None
+            log.matched_template = matched_result.get("template") if matched_result else None
+            log.matched_frame = matched_result.get("frame_index") if matched_result else None
+            log.matched_timestamp = matched_result.get("timestamp") if matched_result else None
             
-            log_manager.add_log(log)
+            metrics_registry.increment("images_total", len(all_image_paths))
+            if checkpoint:
+                checkpoint.clear()
+            self._finish_log(log_manager, log, run_metrics, result_store)
             return True
             
         except Exception as e:
@@ -76,136 +206,412 @@ class ImageProcessor:
             log.status = "失败"
             log.message = f"处理任务时出错: {str(e)}"
             log.end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_manager.add_log(log)
+            self._finish_log(log_manager, log, run_metrics, result_store)
             return False
     
+    def _run_algorithm(self, task, image_paths, run_metrics, on_results=None):
+        """根据算法类型处理图片
+
+        on_results 不为 None 时，每得到一批结果就以该批结果调用一次（顺序不保证），全部结果仍作为返回值。
+        """
+        if self.shard_runner is not None:
+            settings_data = self.settings.get_all() if hasattr(self.settings, "get_all") else self.settings
+            # 没有工作者可用时协调者用本地匹配处理剩余分片
+            results = self.shard_runner(task, image_paths, dict(settings_data),
+                                        lambda paths: self._run_local_algorithm(task, paths, run_metrics))
+        elif self.algorithm == "模板匹配":
+            return self._process_with_template_matching(task, image_paths, run_metrics, on_results)
+        else:
+            results = self._run_local_algorithm(task, image_paths, run_metrics)
+        if on_results is not None:
+            on_results(results)
+        return results
+    
+    def _run_local_algorithm(self, task, image_paths, run_metrics):
+        """在本进程中按算法类型处理图片"""
+        if self.algorithm == "模板匹配":
+            return self._process_with_template_matching(task, image_paths, run_metrics)
+        elif self.algorithm == "特征点匹配":
+            return self._process_with_feature_matching(task, image_paths)
+        elif self.algorithm == "深度学习":
+            return self._process_with_deep_learning(task, image_paths, run_metrics)
+        return []
+    
+    def _open_checkpoint(self, task, image_paths):
+        """图片数量超过一个断点间隔时才记录进度，0 表示不记录"""
+        if not self.checkpoint_interval or len(image_paths) <= self.checkpoint_interval:
+            return None
+        return TaskCheckpoint(os.path.join(self.cache_path, "checkpoints", f"{task.id}.json"),
+                              self._task_signature(task))
+    
+    def _task_signature(self, task):
+        return task_signature(task, self.algorithm, resolve_variant(task, self.settings))
+    
+    def _open_score_table(self, task, checkpoint):
+        """本次运行的得分表；从断点继续时沿用上次未完成的得分表
+
+        未完成的得分表与断点进度对不上时（例如在两次写盘之间中断）不再记录，保留旧表。
+        """
+        if checkpoint and checkpoint.resumed:
+            table = ScoreTable.load(score_table_file(self.cache_path, task.id))
+            if (table is None or table.complete or table.signature != checkpoint.signature
+                    or len(table) != checkpoint.processed):
+                return None
+            return table
+        return ScoreTable(task.get_templates(), checkpoint.signature if checkpoint else None)
+    
+    def _get_content_hasher(self):
+        if self.content_hasher is None:
+            self.content_hasher = ContentHasher(os.path.join(self.cache_path, "content_hashes.json"))
+        return self.content_hasher
+    
+    def _write_log(self, log_manager, log, run_metrics):
+        """写入日志并记录写入耗时"""
+        start = run_metrics.clock()
+        log_manager.add_log(log)
+        run_metrics.observe("log_write", start)
+    
+    def _finish_log(self, log_manager, log, run_metrics, result_store=None):
+        """写入最终日志，附带本次运行的阶段耗时汇总"""
+        metrics_registry.increment("runs_total", status=log.status)
+        log.stage_timings = run_metrics.summary()
+        self._write_log(log_manager, log, run_metrics)
+        if result_store is not None:
+            result_store.finish_run(log.run_id, log.status, log.end_time)
+    
     def _get_image_paths(self, path, recursive=True):
         """获取指定路径下的所有图片文件"""
-        image_extensions = ['.png', '.jpg', '.jpeg', '.bmp']
-        image_paths = []
-        
+        return self._scan_image_paths(path, recursive)[0]
+    
+    def _scan_image_paths(self, path, recursive=True, task_id=None):
+        """返回 (图片路径列表, 该任务上次扫描之后新增的图片路径)；未启用目录清单时后者为 None"""
         if os.path.isfile(path):
-            if any(path.lower().endswith(ext) for ext in image_extensions):
-                return [path]
-            else:
-                return []
-        
-        elif os.path.isdir(path):
-            if recursive:
-                for root, _, files in os.walk(path):
-                    for file in files:
-                        if any(file.lower().endswith(ext) for ext in image_extensions):
-                            image_paths.append(os.path.join(root, file))
-            else:
-                for file in os.listdir(path):
-                    file_path = os.path.join(path, file)
-                    if os.path.isfile(file_path) and any(file.lower().endswith(ext) for ext in image_extensions):
-                        image_paths.append(file_path)
+            return ([path] if is_image_name(path) or is_video_name(path) else []), None
+        
+        # 帧序列（例如 frames/img_%05d.png）交给 cv2.VideoCapture 逐帧读取
+        if is_frame_sequence(path) and os.path.isdir(os.path.dirname(path) or "."):
+            return [path], None
+        
+        if not os.path.isdir(path):
+            return [], None
+        
+        if self.use_manifest:
+            # 新增图片按任务计算，多个任务监视同一目录时互不影响
+            return get_directory_manifest(self.cache_path).scan(path, recursive, self.scan_videos, task_id)
+        
+        def wanted(name):
+            return is_image_name(name) or (self.scan_videos and is_video_name(name))
+        
+        image_paths = []
+        if recursive:
+            for root, _, files in os.walk(path):
+                for file in files:
+                    if wanted(file):
+                        image_paths.append(os.path.join(root, file))
+        else:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file() and wanted(entry.name):
+                        image_paths.append(entry.path)
         
-        return image_paths
+        return image_paths, None
     
-    def _process_with_template_matching(self, task, image_paths):
-        """使用模板匹配算法处理图片"""
+    def _process_with_template_matching(self, task, image_paths, run_metrics=NULL_RUN_METRICS, on_results=None):
+        """使用模板匹配算法处理图片；on_results 见 _run_algorithm"""
         results = []
         
         try:
-            # 读取模板图片
-            template = cv2.imread(task.image_path)
-            if template is None:
-                raise ValueError(f"无法读取模板图片: {task.image_path}")
-            
-            # 转换为灰度图（如果需要）
-            if len(template.shape) == 3:
-                template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            # 读取所有模板，每张图片只解码一次，与全部模板匹配
+            template_set = self._load_templates(task)
+            
+            # 视频按帧处理，每个视频占一个线程，与图片分开提交
+            video_paths = [path for path in image_paths if is_video_source(path)]
+            if video_paths:
+                image_paths = [path for path in image_paths if not is_video_source(path)]
+            
+            if self.adaptive_tuning:
+                # 自适应模式：运行中根据吞吐量调整线程数和批量大小
+                results = self._run_adaptive_batches(task, image_paths, template_set, run_metrics, on_results)
             else:
-                template_gray = template
+                results = self._run_batches(image_paths, template_set, run_metrics, on_results=on_results)
             
-            # 使用线程池并行处理图片
-            with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
-                futures = []
-                
-                # 分批处理图片
-                for i in range(0, len(image_paths), self.batch_size):
-                    batch = image_paths[i:i+self.batch_size]
-                    futures.append(executor.submit(self._process_image_batch, batch, template_gray, task.threshold))
-                
-                # 收集结果
-                for future in futures:
-                    batch_results = future.result()
-                    results.extend(batch_results)
+            if video_paths:
+                stride = task.frame_stride or self.video_frame_stride
+                with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+                    for video_results in executor.map(
+                            lambda path: self._process_video(path, template_set, stride, task.time_windows,
+                                                             run_metrics), video_paths):
+                        results.extend(video_results)
+                        if on_results is not None:
+                            on_results(video_results)
         
         except Exception as e:
             print(f"模板匹配处理出错: {e}")
         
         return results
     
-    def _process_image_batch(self, image_paths, template, threshold):
+    def _load_templates(self, task, variant=None):
+        """从模板缓存取出任务的全部模板，模板与图片使用同一种预处理方式
+
+        无法读取的模板会被跳过。
+        """
+        if variant is None:
+            variant = resolve_variant(task, self.settings)
+        
+        entries = []
+        for template in task.get_templates():
+            prepared = template_cache.get(template["path"], variant)
+            if prepared is None:
+                print(f"无法读取模板图片: {template['path']}")
+                continue
+            entries.append(TemplateEntry(prepared, template["threshold"]))
+        
+        if not entries:
+            raise ValueError(f"无法读取模板图片: {', '.join(t['path'] for t in task.get_templates())}")
+        return TemplateSet(entries, variant)
+    
+    def _run_adaptive_batches(self, task, image_paths, template_set, run_metrics, on_results=None):
+        """按调优器当前的线程数和批量大小逐批提交"""
+        tuner = HillClimbTuner.for_task(task, self.settings)
+        results = self._run_batches(image_paths, template_set, run_metrics, tuner, on_results)
+        
+        # 有测量结果时才保存，下次运行从这里开始
+        if tuner.history:
+            task.tuned_params = tuner.best_params()
+        return results
+    
+    def _run_batches(self, image_paths, template_set, run_metrics, tuner=None, on_results=None):
+        """逐批提交图片，结果保持原有顺序；每批完成后以该批结果调用 on_results
+
+        在途批次数即为生效的线程数，每次提交前重新读取：自适应模式取调优器的当前值，否则取当前设置，
+        运行中修改线程数或批量大小从下一批开始生效。减少线程数时已提交的批次照常完成，
+        在途批次降到新的上限以下后才继续提交；线程数超过线程池大小时换一个更大的线程池，
+        旧线程池处理完已提交的批次后自行退出。
+        设置了读取线程时，每提交一批就把这一批的文件交给单独的读取线程提前读取（见 FilePrefetcher），
+        提前读取的范围与在途批次一致。
+        """
+        pool_size = tuner.max_workers if tuner else max(self.max_thread_count, self.thread_count)
+        executor = ThreadPoolExecutor(max_workers=pool_size)  # 线程在需要时才启动
+        prefetcher = None
+        if self.io_thread_count and image_paths:
+            prefetcher = FilePrefetcher(self.io_thread_count, self.io_prefetch_bytes)
+        completed = []  # (起始位置, 批次结果)
+        pending = {}
+        position = 0
+        
+        try:
+            while position < len(image_paths) or pending:
+                if tuner:
+                    workers, batch_size = tuner.workers, tuner.batch_size
+                else:
+                    workers, batch_size = self.thread_count, self.batch_size
+                if workers > pool_size:
+                    executor.shutdown(wait=False)
+                    pool_size = workers
+                    executor = ThreadPoolExecutor(max_workers=pool_size)
+                
+                while position < len(image_paths) and len(pending) < workers:
+                    batch = image_paths[position:position + batch_size]
+                    if prefetcher is not None:
+                        prefetcher.add(batch)
+                    future = executor.submit(self._timed_image_batch, batch,
+                                             template_set, run_metrics, run_metrics.clock(), prefetcher)
+                    pending[future] = position
+                    position += len(batch)
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    offset = pending.pop(future)
+                    busy, batch_results = future.result()
+                    if tuner:
+                        tuner.record(len(batch_results), busy)
+                    completed.append((offset, batch_results))
+                    if on_results is not None:
+                        on_results(batch_results)
+        finally:
+            executor.shutdown(wait=True)
+            if prefetcher is not None:
+                prefetcher.close()
+        
+        completed.sort(key=lambda item: item[0])
+        return [result for _, batch_results in completed for result in batch_results]
+    
+    def _timed_image_batch(self, image_paths, template_set, run_metrics, submitted_at, prefetcher=None):
+        """处理一批图片，同时返回处理时间（秒），供调优器判断线程是否在争抢"""
+        started = time.perf_counter()
+        batch_results = self._process_image_batch(image_paths, template_set, run_metrics, submitted_at,
+                                                  prefetcher)
+        return time.perf_counter() - started, batch_results
+    
+    def _process_image_batch(self, image_paths, template_set,
+                             run_metrics=NULL_RUN_METRICS, submitted_at=0, prefetcher=None):
         """处理一批图片"""
         batch_results = []
+        if submitted_at:
+            run_metrics.observe("queue_wait", submitted_at)
         
         for img_path in image_paths:
-            try:
-                # 读取图片
+            batch_results.append(self._process_single_image(img_path, template_set, run_metrics, prefetcher))
+        
+        return batch_results
+    
+    def _process_single_image(self, img_path, template_set, run_metrics=NULL_RUN_METRICS, prefetcher=None):
+        """在内存预算内处理单张图片；有读取阶段时从已读取的文件内容解码"""
+        reserved = 0
+        try:
+            data = None
+            if prefetcher is not None:
+                start = run_metrics.clock()
+                data = prefetcher.take(img_path) or b""
+                run_metrics.observe("io_wait", start)
+            
+            # 按图片头中的尺寸申请解码内存，预算不足时在这里等待
+            if self.memory_budget.enabled:
+                start = run_metrics.clock()
+                reserved = self.memory_budget.acquire(self.memory_budget.estimate(img_path, data))
+                run_metrics.observe("memory_wait", start)
+            
+            # 读取图片；文件内容直接作为 NumPy 视图交给 imdecode，不复制
+            start = run_metrics.clock()
+            if data is None:
                 img = cv2.imread(img_path)
-                if img is None:
-                    batch_results.append({
-                        "path": img_path,
-                        "matched": False,
-                        "score": 0,
-                        "message": "无法读取图片"
-                    })
-                    continue
-                
-                # 转换为灰度图
-                if len(img.shape) == 3:
-                    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                else:
-                    img_gray = img
-                
-                # 图像预处理（如果需要）
-                if self.preprocess:
-                    img_gray = self._preprocess_image(img_gray)
-                
-                # 模板匹配
-                result = cv2.matchTemplate(img_gray, template, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                
-                # 判断是否匹配
-                matched = max_val >= threshold
-                
-                batch_results.append({
-                    "path": img_path,
-                    "matched": matched,
-                    "score": max_val,
-                    "message": "匹配成功" if matched else "匹配失败"
-                })
-                
-            except Exception as e:
-                batch_results.append({
+            else:
+                img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+            run_metrics.observe("decode", start)
+            if img is None:
+                return {
                     "path": img_path,
                     "matched": False,
                     "score": 0,
-                    "message": f"处理图片时出错: {str(e)}"
-                })
+                    "message": "无法读取图片",
+                    "error": "decode"
+                }
+            
+            return self._match_image(img_path, img, template_set, run_metrics)
         
-        return batch_results
+        except OversizedImageError as e:
+            return {
+                "path": img_path,
+                "matched": False,
+                "score": 0,
+                "message": str(e),
+                "error": "oversized"
+            }
+        
+        except Exception as e:
+            return {
+                "path": img_path,
+                "matched": False,
+                "score": 0,
+                "message": f"处理图片时出错: {str(e)}",
+                "error": "exception"
+            }
+        
+        finally:
+            self.memory_budget.release(reserved)
     
-    def _preprocess_image(self, image):
-        """图像预处理"""
-        # 高斯模糊降噪
-        image = cv2.GaussianBlur(image, (5, 5), 0)
+    def _match_image(self, img_path, img, template_set, run_metrics=NULL_RUN_METRICS):
+        """用全部模板匹配一张已解码的图片（或视频帧）"""
+        # 转换为灰度图
+        if len(img.shape) == 3:
+            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        else:
+            img_gray = img
+        
+        # 图像预处理：与模板使用同一种方式
+        if template_set.variant != NO_PREPROCESS:
+            start = run_metrics.clock()
+            img_gray = template_set.preprocess(img_gray)
+            run_metrics.observe("preprocess", start)
+        
+        # 模板匹配（同一张图片与全部模板匹配）
+        start = run_metrics.clock()
+        scores = template_set.match(img_gray)
+        run_metrics.observe("match", start)
+        
+        best_entry, max_val, matched = template_set.best(scores)
+        if best_entry is None:
+            return {
+                "path": img_path,
+                "matched": False,
+                "score": 0,
+                "message": "模板尺寸大于图片",
+                "error": "template_size"
+            }
+        
+        result = {
+            "path": img_path,
+            "matched": matched,
+            "score": max_val,
+            "template": best_entry.path,
+            "message": "匹配成功" if matched else "匹配失败"
+        }
+        if len(template_set) > 1:
+            result["template_scores"] = {entry.path: score for entry, score in scores.items()}
+        return result
+    
+    def _process_video(self, video_path, template_set, stride, windows, run_metrics=NULL_RUN_METRICS):
+        """按步长和时间段取帧匹配，与上一张被匹配帧几乎相同的静态帧直接跳过
+
+        每个被匹配的帧返回一个结果，附带帧序号和时间戳（秒）。
+        """
+        results = []
+        reserved = 0
+        sampled = skipped = 0
+        try:
+            with VideoFrames(video_path, stride, windows, self.video_sequence_fps) as frames:
+                # 同一时间只解码一帧，按帧尺寸申请一次内存
+                if self.memory_budget.enabled:
+                    start = run_metrics.clock()
+                    reserved = self.memory_budget.acquire(frames.width * frames.height * BYTES_PER_PIXEL)
+                    run_metrics.observe("memory_wait", start)
+                
+                static_filter = StaticFrameFilter(self.video_static_threshold)
+                frame_iter = iter(frames)
+                while True:
+                    start = run_metrics.clock()
+                    item = next(frame_iter, None)
+                    run_metrics.observe("decode", start)
+                    if item is None:
+                        break
+                    
+                    frame_index, timestamp, frame = item
+                    sampled += 1
+                    if static_filter.is_static(frame):
+                        skipped += 1
+                        continue
+                    
+                    result = self._match_image(video_path, frame, template_set, run_metrics)
+                    result["frame_index"] = frame_index
+                    result["timestamp"] = round(timestamp, 3)
+                    results.append(result)
+            
+            if not results:
+                results.append({"path": video_path, "matched": False, "score": 0,
+                                "message": "视频中没有可处理的帧", "error": "no_frames"})
+        
+        except VideoOpenError as e:
+            results.append({"path": video_path, "matched": False, "score": 0, "message": str(e),
+                            "error": "decode"})
         
-        # 直方图均衡化增强对比度
-        if len(image.shape) == 2:  # 灰度图
-            image = cv2.equalizeHist(image)
-        else:  # 彩色图
-            ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
-            channels = cv2.split(ycrcb)
-            channels[0] = cv2.equalizeHist(channels[0])
-            ycrcb = cv2.merge(channels)
-            image = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
+        except OversizedImageError as e:
+            results.append({"path": video_path, "matched": False, "score": 0, "message": str(e),
+                            "error": "oversized"})
         
-        return image
+        except Exception as e:
+            results.append({"path": video_path, "matched": False, "score": 0,
+                            "message": f"处理视频时出错: {str(e)}", "error": "exception"})
+        
+        finally:
+            self.memory_budget.release(reserved)
+            metrics_registry.increment("video_frames_total", sampled)
+            metrics_registry.increment("video_frames_static_total", skipped)
+        
+        return results
+    
+    def _preprocess_image(self, image, variant=DEFAULT_VARIANT):
+        """图像预处理"""
+        return PREPROCESS_VARIANTS[variant](image)
     
     def _process_with_feature_matching(self, task, image_paths):
         """使用特征点匹配算法处理图片"""
@@ -214,11 +620,68 @@ class ImageProcessor:
         # ...
         return results
     
-    def _process_with_deep_learning(self, task, image_paths):
-        """使用深度学习算法处理图片"""
-        # 实现深度学习匹配逻辑
+    def _process_with_deep_learning(self, task, image_paths, run_metrics=NULL_RUN_METRICS):
+        """整图相似度检索（仅使用 CPU）
+
+        先用持久化的感知哈希索引找出与模板汉明距离足够小的候选图，
+        再对候选图做像素级验证。只返回候选图的结果。
+        """
         results = []
-        # ...
+        
+        try:
+            # 相似度检索只支持图片
+            image_paths = [path for path in image_paths if not is_video_source(path)]
+            
+            # 索引里是原始图片的哈希，模板也不做预处理
+            template_set = self._load_templates(task, NO_PREPROCESS)
+            
+            # 增量更新索引：只为新增或修改过的图片计算哈希
+            index = get_similarity_index(self.cache_path, self.similarity_hash)
+            start = run_metrics.clock()
+            if index.prune_due():
+                # 定期删除已被删除的图片的行，索引不会无限增长
+                index.prune(self.thread_count)
+            index.update(image_paths, self.thread_count)
+            index.save()
+            run_metrics.observe("hash", start)
+            
+            # 每个模板分别检索候选图
+            start = run_metrics.clock()
+            candidates = []
+            scope = set(image_paths)
+            for entry in template_set.entries:
+                query_hash = HASH_FUNCTIONS[index.hash_type](entry.gray)
+                for path, distance in index.query(query_hash, self.similarity_max_distance, scope):
+                    candidates.append((entry, path, distance))
+            run_metrics.observe("match", start)
+            
+            # 候选图做像素级验证
+            def verify(candidate):
+                entry, path, distance = candidate
+                score = verify_similarity(entry.gray, path)
+                if score is None:
+                    return {"path": path, "matched": False, "score": 0, "template": entry.path,
+                            "message": "无法读取图片", "error": "decode", "hash_distance": distance}
+                matched = score >= entry.threshold
+                return {"path": path, "matched": matched, "score": score, "template": entry.path,
+                        "message": "匹配成功" if matched else "匹配失败", "hash_distance": distance}
+            
+            start = run_metrics.clock()
+            with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+                verified = list(executor.map(verify, candidates))
+            run_metrics.observe("match", start)
+            
+            # 同一张图片被多个模板命中时，保留最佳模板的结果
+            best_by_path = {}
+            for result in verified:
+                current = best_by_path.get(result["path"])
+                if current is None or (result["matched"], result["score"]) > (current["matched"], current["score"]):
+                    best_by_path[result["path"]] = result
+            results = list(best_by_path.values())
+        
+        except Exception as e:
+            print(f"相似度检索出错: {e}")
+        
         return results
     
     def _execute_action(self, action):
@@ -0,0 +1,182 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from datetime import datetime
+from src.models.task import Task
+from src.models.execution_log import ExecutionLog
+
+try:
+    import resource  # 仅 Unix 可用，其他平台不限制资源
+except ImportError:
+    resource = None
+
+# 终止子进程时先发 SIGTERM，等待这么久仍未退出再强制结束
+TERMINATE_GRACE = 2.0
+POLL_INTERVAL = 0.2
+
+class PipeLogManager:
+    """子进程中代替 LogManager，把日志通过管道发回父进程"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def add_log(self, log):
+        self.conn.send(("log", log.to_dict()))
+        return log
+
+def _apply_limits(cpu_seconds, memory_mb):
+    if resource is None:
+        return
+    if cpu_seconds:
+        # 超过软限制收到 SIGXCPU，再多 5 秒被内核直接杀掉
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _child_main(task_data, settings_data, conn, cpu_seconds, memory_mb):
+    """子进程入口：独立进程组、资源限制，然后正常执行 process_task"""
+    # 自成进程组，终止时连同动作命令启动的子进程一起结束
+    if hasattr(os, "setsid"):
+        os.setsid()
+    _apply_limits(cpu_seconds, memory_mb)
+
+    from src.services.image_processor import ImageProcessor
+    from src.models.result_store import close_result_stores
+
+    task = Task.from_dict(task_data)
+    try:
+        success = ImageProcessor(settings_data).process_task(task, PipeLogManager(conn))
+        # 结果库由后台线程写入，进程退出前等它写完
+        close_result_stores()
+        conn.send(("done", success, task.to_dict()))
+    except MemoryError:
+        conn.send(("error", "超过内存限制"))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+class IsolatedTaskRunner:
+    """在受监督的子进程中运行单个任务，可随时强制终止"""
+
+    def __init__(self, task, settings, log_manager):
+        self.task = task
+        self.log_manager = log_manager
+        self.settings_data = dict(settings.get_all() if hasattr(settings, "get_all") else settings)
+        self.cpu_seconds = settings.get("task_cpu_limit", 0)
+        self.wall_seconds = settings.get("task_wall_limit", 0)
+        self.memory_mb = settings.get("task_memory_limit_mb", 0)
+        self.process = None
+        self.log = None
+        self.stop_reason = None
+        # 启动子进程和 terminate 互斥：启动前已被停止就不再启动，启动过程中到达的停止在启动后立即执行
+        self.lock = threading.Lock()
+
+    def run(self):
+        """启动子进程并转发日志，直到子进程结束；返回是否成功"""
+        # spawn 启动：父进程有 Qt 和多个线程，fork 不安全
+        context = multiprocessing.get_context("spawn")
+        with self.lock:
+            if self.stop_reason is not None:
+                self._write_failure(self.stop_reason)
+                return False
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            self.process = context.Process(
+                target=_child_main,
+                args=(self.task.to_dict(), self.settings_data, child_conn, self.cpu_seconds, self.memory_mb),
+                daemon=True
+            )
+            self.process.start()
+        child_conn.close()
+
+        started = time.monotonic()
+        success = None
+        error = None
+        try:
+            while True:
+                if self.wall_seconds and time.monotonic() - started > self.wall_seconds:
+                    self.terminate("超过运行时间限制")
+                if parent_conn.poll(POLL_INTERVAL):
+                    try:
+                        message = parent_conn.recv()
+                    except EOFError:
+                        break
+                    if message[0] == "log":
+                        self._forward_log(message[1])
+                    elif message[0] == "done":
+                        success = message[1]
+                        self._update_task(message[2])
+                    elif message[0] == "error":
+                        error = message[1]
+                elif not self.process.is_alive():
+                    break
+        finally:
+            parent_conn.close()
+            self.process.join(TERMINATE_GRACE)
+
+        if success is None:
+            self._write_failure(error or self._exit_reason())
+            return False
+        return success
+
+    def terminate(self, reason="任务已被停止"):
+        """终止子进程及其整个进程组"""
+        with self.lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+            process = self.process
+        if process is None or not process.is_alive():
+            return
+        self._signal(signal.SIGTERM)
+        process.join(TERMINATE_GRACE)
+        if process.is_alive():
+            self._signal(getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def _signal(self, signum):
+        try:
+            if hasattr(os, "killpg"):
+                try:
+                    os.killpg(self.process.pid, signum)
+                    return
+                except ProcessLookupError:
+                    # 子进程刚启动，还没有调用 setsid 建立自己的进程组
+                    pass
+            if signum == signal.SIGTERM:
+                self.process.terminate()
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _exit_reason(self):
+        if self.stop_reason:
+            return self.stop_reason
+        exitcode = self.process.exitcode
+        if exitcode is not None and exitcode < 0:
+            if hasattr(signal, "SIGXCPU") and -exitcode in (signal.SIGXCPU, signal.SIGKILL) and self.cpu_seconds:
+                return "超过 CPU 时间限制"
+            return f"子进程被信号 {-exitcode} 终止"
+        return f"子进程异常退出（退出码 {exitcode}）"
+
+    def _forward_log(self, data):
+        """子进程对同一条日志会多次写入，父进程也复用同一个日志对象"""
+        if self.log is None:
+            self.log = ExecutionLog.from_dict(data)
+        else:
+            self.log.update_from(ExecutionLog.from_dict(data))
+        self.log_manager.add_log(self.log)
+
+    def _update_task(self, data):
+        self.task.last_run = data.get("last_run")
+        self.task.tuned_params = data.get("tuned_params")
+
+    def _write_failure(self, message):
+        if self.log is None:
+            self.log = ExecutionLog(task_id=self.task.id, task_name=self.task.name, status="失败")
+        self.log.status = "失败"
+        self.log.message = f"处理任务时出错: {message}"
+        self.log.end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log_manager.add_log(self.log)
@@ -0,0 +1,456 @@
+"""本地任务服务：其他程序通过 HTTP 提交任务和查询结果
+
+POST /rpc      JSON-RPC 2.0（支持批量请求），方法:
+               create_tasks {"tasks": [任务字典, ...]}      -> {"task_ids": [...]}
+               run_tasks    {"task_ids": [...]}              -> {"queued": 数量}
+               get_status   {"task_id": ...}                 -> 任务信息和是否正在运行
+               get_results  {"task_id": ..., "limit": 20}    -> 最近的执行日志
+               list_tasks   {}                               -> 全部任务
+               calibrate    {"task_id": ..., "thresholds": [...]} -> 各阈值下的匹配数和得分直方图
+               query_results {"run_id"/"task_id", "path", "min_score", "max_score", "error", "matched",
+                              "since", "limit", "offset"} -> 逐图片结果
+GET  /events   server-sent events，推送每一次日志写入；可用 ?task_id= 只订阅一个任务
+
+每个请求都要带 Authorization: Bearer <令牌>（/events 也可用 ?token=），令牌在第一次启动时随机生成，
+保存在缓存目录的 job_server.token 中（仅当前用户可读）。/rpc 只接受 Content-Type: application/json，
+带有其他来源 Origin 头的请求（浏览器中的网页）一律拒绝。通过任务服务创建的任务不能设置动作命令，
+除非命令在设置 job_server_allowed_actions 的白名单中。
+
+所有连接都在一个 asyncio 事件循环中处理，挂起的请求不占用线程。
+运行请求先进入队列，由调度协程交给 TaskExecutor；同一任务正在运行时排到队尾。
+
+单独运行（不启动界面）:
+    python -m src.services.job_server --port 8765
+"""
+import os
+import hmac
+import json
+import asyncio
+import secrets
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from src.models.task import Task
+from src.models.score_table import ScoreTable, score_table_file
+from src.models.result_store import get_result_store, ERROR_CLASSES
+
+MAX_BODY_SIZE = 16 * 1024 * 1024
+# SSE 连接空闲时发送注释行，避免被代理断开
+KEEPALIVE_INTERVAL = 15
+# 每个事件订阅者最多缓存的事件数，消费太慢的订阅者会丢弃最旧的事件
+SUBSCRIBER_QUEUE_SIZE = 1000
+TOKEN_FILE_NAME = "job_server.token"
+
+def load_or_create_token(token_file):
+    """读取本机的访问令牌，不存在时生成一个（文件权限 0600）"""
+    try:
+        with open(token_file, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(token_file) or ".", exist_ok=True)
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class JobServer:
+    def __init__(self, task_manager, task_executor, log_manager, settings):
+        self.task_manager = task_manager
+        self.task_executor = task_executor
+        self.log_manager = log_manager
+        self.host = settings.get("job_server_host", "127.0.0.1")
+        self.port = settings.get("job_server_port", 8765)
+        self.cache_path = settings.get("cache_path", "cache")
+        self.token_file = os.path.join(self.cache_path, TOKEN_FILE_NAME)
+        self.token = load_or_create_token(self.token_file)
+        # 允许通过任务服务设置的动作命令（完全一致才允许），默认不允许任何命令
+        self.allowed_actions = set(settings.get("job_server_allowed_actions", []) or [])
+        self.loop = None
+        self.server = None
+        self.run_queue = None
+        self.parked_runs = {}  # 任务 ID -> 因任务正在运行而暂存的运行请求数，只在事件循环中访问
+        self.subscribers = set()  # (asyncio.Queue, task_id 或 None)
+        self.thread = None
+        self.started = threading.Event()
+        self.methods = {
+            "create_tasks": self.rpc_create_tasks,
+            "run_tasks": self.rpc_run_tasks,
+            "get_status": self.rpc_get_status,
+            "get_results": self.rpc_get_results,
+            "list_tasks": self.rpc_list_tasks,
+            "calibrate": self.rpc_calibrate,
+            "query_results": self.rpc_query_results
+        }
+
+    def start(self):
+        """在后台线程中运行事件循环"""
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start_server())
+        except OSError as e:
+            print(f"任务服务启动失败: {e}")
+            self.started.set()
+            return
+        self.log_manager.add_listener(self._on_log)
+        self.task_executor.add_finish_listener(self._on_task_finished)
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.task_executor.remove_finish_listener(self._on_task_finished)
+            self.log_manager.remove_listener(self._on_log)
+            self.server.close()
+
+    async def _start_server(self):
+        self.run_queue = asyncio.Queue()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.loop.create_task(self._dispatch_runs())
+
+    # ---- 日志推送 ----
+
+    def _on_log(self, log):
+        """在写日志的线程中调用：立即序列化（日志对象之后还会被修改），交给事件循环分发"""
+        event = json.dumps(log.to_dict(), ensure_ascii=False)
+        self.loop.call_soon_threadsafe(self._publish, log.task_id, event)
+
+    def _publish(self, task_id, event):
+        for queue, wanted in list(self.subscribers):
+            if wanted and wanted != task_id:
+                continue
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    # ---- 运行调度 ----
+
+    async def _dispatch_runs(self):
+        """把排队的运行请求交给 TaskExecutor
+
+        同一任务正在运行时按任务暂存，不阻塞后面其他任务的请求；任务结束时（_on_task_finished）
+        再放回队列，与调度器的 on_task_finished 相同。
+        """
+        while True:
+            task_id = await self.run_queue.get()
+            try:
+                if self.task_executor.is_task_running(task_id):
+                    self._park(task_id)
+                    continue
+                # execute_task 会写任务文件，放到线程池中执行，不阻塞事件循环
+                started, _ = await self.loop.run_in_executor(None, self.task_executor.execute_task, task_id)
+                if not started and self.task_executor.is_task_running(task_id):
+                    # 检查之后被调度器或界面抢先启动了
+                    self._park(task_id)
+            except Exception as e:
+                # 单个任务启动失败不能让调度协程退出，否则之后的运行请求都不会被处理
+                print(f"任务服务启动任务时出错: {e}")
+
+    def _park(self, task_id):
+        self.parked_runs[task_id] = self.parked_runs.get(task_id, 0) + 1
+        # 暂存前任务可能刚好结束（结束通知已经处理过），立即放回，不会一直等下去
+        if not self.task_executor.is_task_running(task_id):
+            self._release_parked(task_id)
+
+    def _on_task_finished(self, task_id):
+        """在任务线程中调用，交给事件循环处理"""
+        self.loop.call_soon_threadsafe(self._release_parked, task_id)
+
+    def _release_parked(self, task_id):
+        """任务结束后放回一个暂存的运行请求，其余的等下一次结束"""
+        runs = self.parked_runs.get(task_id, 0)
+        if not runs:
+            return
+        if runs > 1:
+            self.parked_runs[task_id] = runs - 1
+        else:
+            del self.parked_runs[task_id]
+        self.run_queue.put_nowait(task_id)
+
+    # ---- JSON-RPC 方法 ----
+
+    async def rpc_create_tasks(self, params):
+        items = params.get("tasks")
+        if not isinstance(items, list):
+            raise RpcError(-32602, "tasks 必须是列表")
+        tasks = []
+        for data in items:
+            if not isinstance(data, dict) or not data.get("image_path"):
+                raise RpcError(-32602, "每个任务至少需要 image_path")
+            for key in ("match_action", "fail_action"):
+                action = data.get(key)
+                if action and action not in self.allowed_actions:
+                    raise RpcError(-32602, f"不允许通过任务服务设置动作命令: {key}")
+            # 忽略客户端给出的 id，总是新建任务，不能覆盖或重复已有任务
+            data = {key: value for key, value in data.items() if key != "id"}
+            tasks.append(Task.from_dict(dict(data, status="就绪")))
+
+        def add_all():
+            for task in tasks:
+                self.task_manager.add_task(task)
+            if self.task_executor.scheduler is not None:
+                self.task_executor.scheduler.sync()
+        await self.loop.run_in_executor(None, add_all)
+        return {"task_ids": [task.id for task in tasks]}
+
+    async def rpc_run_tasks(self, params):
+        task_ids = params.get("task_ids")
+        if task_ids is None and params.get("task_id"):
+            task_ids = [params["task_id"]]
+        if not isinstance(task_ids, list):
+            raise RpcError(-32602, "task_ids 必须是列表")
+        missing = [task_id for task_id in task_ids if not self.task_manager.get_task(task_id)]
+        if missing:
+            raise RpcError(-32602, f"任务不存在: {', '.join(missing)}")
+        for task_id in task_ids:
+            self.run_queue.put_nowait(task_id)
+        return {"queued": len(task_ids)}
+
+    async def rpc_get_status(self, params):
+        task = self.task_manager.get_task(params.get("task_id"))
+        if not task:
+            raise RpcError(-32602, "任务不存在")
+        return dict(task.to_dict(), running=self.task_executor.is_task_running(task.id))
+
+    async def rpc_get_results(self, params):
+        task_id = params.get("task_id")
+        if not self.task_manager.get_task(task_id):
+            raise RpcError(-32602, "任务不存在")
+        limit = params.get("limit", 20)
+        # 同一次运行会写入多条快照（进行中、完成），按运行 ID 只保留最后一条；旧日志没有运行 ID 时按开始时间
+        latest = {}
+        for log in self.log_manager.get_logs(task_id=task_id):
+            latest[log.run_id or log.start_time] = log
+        runs = sorted(latest.values(), key=lambda log: log.start_time, reverse=True)
+        return {"results": [log.to_dict() for log in runs[:limit]]}
+
+    async def rpc_list_tasks(self, params):
+        return {"tasks": [dict(task.to_dict(), running=self.task_executor.is_task_running(task.id))
+                          for task in self.task_manager.get_all_tasks()]}
+
+    async def rpc_calibrate(self, params):
+        task_id = params.get("task_id")
+        if not self.task_manager.get_task(task_id):
+            raise RpcError(-32602, "任务不存在")
+        thresholds = params.get("thresholds")
+        if thresholds is not None and not (isinstance(thresholds, list)
+                                           and all(isinstance(value, (int, float)) for value in thresholds)):
+            raise RpcError(-32602, "thresholds 必须是数字列表")
+        bins = params.get("bins", 20)
+        if not isinstance(bins, int) or not 1 <= bins <= 1000:
+            raise RpcError(-32602, "bins 必须是 1 到 1000 之间的整数")
+
+        def calibrate():
+            table = ScoreTable.load(score_table_file(self.cache_path, task_id))
+            return None if table is None else table.calibrate(thresholds, bins)
+        result = await self.loop.run_in_executor(None, calibrate)
+        if result is None:
+            raise RpcError(-32001, "没有该任务的得分记录，请先运行一次任务")
+        return result
+
+    async def rpc_query_results(self, params):
+        error = params.get("error")
+        if error is not None and error not in ERROR_CLASSES[1:] + ["any"]:
+            raise RpcError(-32602, f"error 必须是 {', '.join(ERROR_CLASSES[1:])} 或 any")
+        for key in ("min_score", "max_score"):
+            if params.get(key) is not None and not isinstance(params[key], (int, float)):
+                raise RpcError(-32602, f"{key} 必须是数字")
+        limit = params.get("limit", 1000)
+        offset = params.get("offset", 0)
+        if not isinstance(limit, int) or not 1 <= limit <= 100000 or not isinstance(offset, int) or offset < 0:
+            raise RpcError(-32602, "limit 必须是 1 到 100000 之间的整数，offset 不能为负数")
+
+        def query():
+            return get_result_store(self.cache_path).query(
+                params.get("run_id"), params.get("task_id"), params.get("path"), params.get("min_score"),
+                params.get("max_score"), error, params.get("matched"), params.get("since"), limit, offset)
+        return {"results": await self.loop.run_in_executor(None, query)}
+
+    async def _call(self, request):
+        """处理单个 JSON-RPC 请求；通知（没有 id）不返回响应"""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or "method" not in request:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "无效的请求"}}
+        request_id = request.get("id")
+        method = self.methods.get(request["method"])
+        try:
+            if method is None:
+                raise RpcError(-32601, f"未知方法: {request['method']}")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(-32602, "params 必须是对象")
+            response = {"jsonrpc": "2.0", "id": request_id, "result": await method(params)}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": str(e)}}
+        return response if "id" in request else None
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                return
+            method, target, _ = parts
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            url = urlsplit(target)
+            status, error = self._check_request(method, url, headers)
+            if status:
+                await self._respond(writer, status, {"error": error})
+                return
+            if method == "POST" and url.path == "/rpc":
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "请求体过大"})
+                    return
+                body = await reader.readexactly(length)
+                await self._handle_rpc(writer, body)
+            elif method == "GET" and url.path == "/events":
+                task_id = parse_qs(url.query).get("task_id", [None])[0]
+                await self._stream_events(writer, task_id)
+            else:
+                await self._respond(writer, 404, {"error": "未找到"})
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _check_request(self, method, url, headers):
+        """鉴权和来源检查，通过时返回 (None, None)，否则返回 (状态码, 错误信息)"""
+        origin = headers.get("origin")
+        if origin and origin not in self._allowed_origins():
+            return 403, "不允许跨站请求"
+
+        token = None
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:].strip()
+        elif method == "GET":
+            # EventSource 不能设置请求头，/events 允许把令牌放在查询参数中
+            token = parse_qs(url.query).get("token", [None])[0]
+        if not token or not hmac.compare_digest(token.encode("utf-8"), self.token.encode("utf-8")):
+            return 401, "缺少或错误的访问令牌"
+
+        if method == "POST":
+            content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                return 415, "Content-Type 必须是 application/json"
+        return None, None
+
+    def _allowed_origins(self):
+        return {f"http://{host}:{self.port}" for host in (self.host, "127.0.0.1", "localhost")}
+
+    async def _handle_rpc(self, writer, body):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            await self._respond(writer, 200, {"jsonrpc": "2.0", "id": None,
+                                              "error": {"code": -32700, "message": "JSON 解析错误"}})
+            return
+
+        if isinstance(payload, list):
+            if not payload:
+                response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "空的批量请求"}}
+            else:
+                responses = await asyncio.gather(*(self._call(request) for request in payload))
+                response = [item for item in responses if item is not None]
+        else:
+            response = await self._call(payload)
+
+        if response is None or response == []:
+            await self._respond(writer, 204, None)
+        else:
+            await self._respond(writer, 200, response)
+
+    async def _respond(self, writer, status, data):
+        reasons = {200: "OK", 204: "No Content", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+                   413: "Payload Too Large", 415: "Unsupported Media Type"}
+        body = b"" if data is None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write((f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                      f"Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: close\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer, task_id):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        await writer.drain()
+
+        subscriber = (asyncio.Queue(SUBSCRIBER_QUEUE_SIZE), task_id)
+        self.subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber[0].get(), KEEPALIVE_INTERVAL)
+                    writer.write(f"event: log\ndata: {event}\n\n".encode("utf-8"))
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                await writer.drain()
+        finally:
+            self.subscribers.discard(subscriber)
+
+def main():
+    from src.models.settings import Settings
+    from src.models.task import TaskManager
+    from src.models.execution_log import LogManager
+    from src.services.task_executor import TaskExecutor
+
+    parser = argparse.ArgumentParser(description="本地任务服务（无界面）")
+    parser.add_argument("--host", default=None, help="监听地址（默认使用设置）")
+    parser.add_argument("--port", type=int, default=None, help="监听端口（默认使用设置）")
+    args = parser.parse_args()
+
+    settings = Settings()
+    task_manager = TaskManager(settings.get("task_path"))
+    task_manager.load_all_tasks()
+    log_manager = LogManager(settings.get("log_path"), settings)
+    task_executor = TaskExecutor(task_manager, log_manager, settings)
+
+    server = JobServer(task_manager, task_executor, log_manager, settings)
+    if args.host:
+        server.host = args.host
+    if args.port is not None:
+        server.port = args.port
+    server.start()
+    print(f"任务服务已启动: http://{server.host}:{server.port}（访问令牌见 {server.token_file}）")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""流式导出执行日志到 CSV 或 JSON Lines（可 gzip 压缩）
+
+直接从磁盘上的日志段（日期目录和压缩归档）逐条读取、过滤、写出，内存占用与日志总量无关。
+过滤条件与 LogManager.get_logs 相同。
+
+命令行:
+    python -m src.services.log_export --out logs.csv.gz --status 失败 --start "2026-01-01 00:00:00"
+"""
+import os
+import csv
+import gzip
+import json
+import argparse
+from datetime import datetime, timedelta
+from src.models.log_retention import list_segments
+
+EXPORT_FIELDS = ["task_id", "task_name", "status", "message", "start_time", "end_time", "matched",
+                 "match_score", "matched_image", "matched_template", "new_image_count", "matched_frame", "matched_timestamp",
+                 "run_id", "stage_timings"]
+FORMATS = ("csv", "jsonl")
+
+class ExportCancelled(Exception):
+    pass
+
+def record_matches(record, task_id=None, status=None, start_time=None, end_time=None):
+    if task_id and record.get("task_id") != task_id:
+        return False
+    if status and record.get("status") != status:
+        return False
+    if start_time and (record.get("start_time") or "") < start_time:
+        return False
+    if end_time and not (record.get("end_time") and record["end_time"] <= end_time):
+        return False
+    return True
+
+def iter_log_records(logs_dir, task_id=None, status=None, start_time=None, end_time=None, progress=None):
+    """按日期从旧到新逐条产出满足条件的日志字典
+
+    日志段按写入日期组织：写入日期早于开始日期的段、晚于结束日期一天以上的段不可能有满足条件的日志，
+    整段跳过。progress(已处理段数, 段总数) 在每个段读完后调用。
+    """
+    segments = list_segments(logs_dir)
+    if start_time:
+        # 日志在运行开始之后才写入
+        segments = [segment for segment in segments if segment.date >= start_time[:10]]
+    if end_time:
+        # 结束时间在写入之前，跨零点写入的日志可能落在下一天
+        last_date = (datetime.strptime(end_time[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        segments = [segment for segment in segments if segment.date <= last_date]
+
+    for done, segment in enumerate(segments, 1):
+        for record in segment.iter_records():
+            if record_matches(record, task_id, status, start_time, end_time):
+                yield record
+        if progress:
+            progress(done, len(segments))
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def _csv_row(record):
+    row = {field: record.get(field) for field in EXPORT_FIELDS}
+    if row["stage_timings"] is not None:
+        row["stage_timings"] = json.dumps(row["stage_timings"], ensure_ascii=False)
+    return row
+
+def export_logs(logs_dir, out_path, fmt=None, compress=None, filters=None,
+                progress=None, cancel_event=None):
+    """导出日志，返回写出的条数
+
+    fmt 和 compress 默认根据文件名推断（.csv / .jsonl，结尾 .gz 表示压缩）。
+    先写临时文件，完成后原子替换；cancel_event 被设置时中止并删除临时文件。
+    progress(已处理段数, 段总数, 已写出条数)。
+    """
+    name = out_path[:-3] if out_path.endswith(".gz") else out_path
+    compress = out_path.endswith(".gz") if compress is None else compress
+    fmt = fmt or ("jsonl" if name.endswith((".jsonl", ".json")) else "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    written = 0
+    state = {"segments": (0, 0)}
+
+    def on_segment(done, total):
+        state["segments"] = (done, total)
+        if progress:
+            progress(done, total, written)
+
+    tmp_path = f"{out_path}.tmp"
+    try:
+        with _open_output(tmp_path, compress) as out:
+            writer = None
+            if fmt == "csv":
+                writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+            for record in iter_log_records(logs_dir, progress=on_segment, **(filters or {})):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                if writer:
+                    writer.writerow(_csv_row(record))
+                else:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+                if progress and written % 1000 == 0:
+                    progress(*state["segments"], written)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="导出执行日志")
+    parser.add_argument("--logs", default=None, help="日志目录（默认使用设置中的日志路径）")
+    parser.add_argument("--out", required=True, help="输出文件，.csv / .jsonl，结尾加 .gz 表示压缩")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="导出格式（默认根据文件名推断）")
+    parser.add_argument("--task", default=None, help="只导出指定任务 ID")
+    parser.add_argument("--status", default=None, help="只导出指定状态")
+    parser.add_argument("--start", default=None, help="开始时间 YYYY-MM-DD HH:MM:SS")
+    parser.add_argument("--end", default=None, help="结束时间 YYYY-MM-DD HH:MM:SS")
+    args = parser.parse_args()
+
+    logs_dir = args.logs
+    if logs_dir is None:
+        from src.models.settings import Settings
+        logs_dir = Settings().get("log_path", "logs")
+
+    filters = {"task_id": args.task, "status": args.status, "start_time": args.start, "end_time": args.end}
+    count = export_logs(logs_dir, args.out, args.format, filters=filters,
+                        progress=lambda done, total, written: print(
+                            f"\r已处理 {done}/{total} 天，导出 {written} 条", end="", flush=True))
+    print(f"\n已导出 {count} 条日志到 {args.out}")
+
+if __name__ == "__main__":
+    main()
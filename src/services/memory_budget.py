@@ -0,0 +1,114 @@
+import io
+import os
+import threading
+from collections import deque
+from src.services.metrics import registry as metrics_registry
+from src.utils.lazy_import import lazy_import
+
+# 只读取图片头获取尺寸，不解码像素
+PILImage = lazy_import("PIL.Image")
+
+# 每个像素在处理过程中大约占用的字节数：
+# BGR 解码 3 + 灰度图 1 + 预处理副本 1 + matchTemplate 的 float32 结果 4
+BYTES_PER_PIXEL = 9
+
+class OversizedImageError(Exception):
+    """单张图片超过单图内存上限"""
+    pass
+
+class MemoryBudget:
+    """进程级的解码内存预算，按字节计数的信号量
+
+    所有任务的工作线程在解码前按图片头中的尺寸申请预算，预算用完时阻塞等待
+    （按申请顺序放行，大图不会被小图饿死）。超过总预算但未超过单图上限的图片
+    等到预算完全空闲后独占执行；超过单图上限的图片直接拒绝。
+    """
+
+    def __init__(self, capacity_bytes, max_single_bytes):
+        self.capacity = capacity_bytes
+        self.max_single = max_single_bytes
+        self.in_use = 0
+        self.waiting = deque()
+        self.condition = threading.Condition()
+        self._publish()
+
+    def configure(self, capacity_bytes, max_single_bytes):
+        with self.condition:
+            self.capacity = capacity_bytes
+            self.max_single = max_single_bytes
+            self.condition.notify_all()
+        self._publish()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def estimate(self, path, data=None):
+        """根据图片头中的尺寸估算处理该图片需要的字节数；data 为已读取的文件内容时不再打开文件"""
+        try:
+            with PILImage.open(path if data is None else io.BytesIO(data)) as image:
+                width, height = image.size
+            return width * height * BYTES_PER_PIXEL
+        except Exception:
+            # 读不到图片头时按文件大小粗略估计（压缩图片一般不超过 10 倍）
+            if data is not None:
+                return len(data) * 10
+            try:
+                return os.path.getsize(path) * 10
+            except OSError:
+                return 0
+
+    def acquire(self, nbytes):
+        """申请 nbytes 字节，预算不足时阻塞，返回实际占用的字节数（用于 release）"""
+        if not self.enabled:
+            return 0
+        if self.max_single and nbytes > self.max_single:
+            metrics_registry.increment("memory_budget_rejected_total")
+            raise OversizedImageError(f"图片过大，需要 {nbytes / 1024 / 1024:.1f} MB，"
+                                      f"超过单图上限 {self.max_single / 1024 / 1024:.1f} MB")
+
+        ticket = object()
+        with self.condition:
+            self.waiting.append(ticket)
+            if self.waiting[0] is not ticket or not self._fits(nbytes):
+                metrics_registry.increment("memory_budget_waits_total")
+            while self.waiting[0] is not ticket or not self._fits(nbytes):
+                self.condition.wait()
+            self.waiting.popleft()
+            self.in_use += nbytes
+            # 下一个排队者可能也放得下
+            self.condition.notify_all()
+        self._publish()
+        return nbytes
+
+    def _fits(self, nbytes):
+        # 预算为空时总是放行，这样超过总预算的大图也能独占执行
+        return self.in_use == 0 or self.in_use + nbytes <= self.capacity
+
+    def release(self, nbytes):
+        if not nbytes:
+            return
+        with self.condition:
+            self.in_use = max(0, self.in_use - nbytes)
+            self.condition.notify_all()
+        self._publish()
+
+    def _publish(self):
+        metrics_registry.set_gauge("memory_budget_in_use_bytes", self.in_use)
+        metrics_registry.set_gauge("memory_budget_capacity_bytes", self.capacity)
+
+_budget = None
+_budget_lock = threading.Lock()
+
+def get_memory_budget(settings):
+    """返回进程级共享的内存预算，并按设置更新容量"""
+    global _budget
+
+    capacity = int(settings.get("memory_budget_mb", 0) * 1024 * 1024)
+    max_single = int(settings.get("max_image_mb", 512) * 1024 * 1024)
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget(capacity, max_single)
+        else:
+            _budget.configure(capacity, max_single)
+    return _budget
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 流水线各阶段
+STAGES = ("scan", "hash", "memory_wait", "decode", "preprocess", "match", "action", "log_write", "queue_wait",
+          "io_wait")
+
+# 直方图桶上界（秒）
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                     0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    """固定桶的耗时直方图（非线程安全，由调用方加锁）"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(HISTOGRAM_BUCKETS) and seconds > HISTOGRAM_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+class RunMetrics:
+    """单次任务运行的阶段计时，同时汇总到全局注册表"""
+    enabled = True
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def clock(self):
+        return time.perf_counter_ns()
+
+    def observe(self, stage, start_ns):
+        """记录从 start_ns 到现在的耗时"""
+        seconds = (time.perf_counter_ns() - start_ns) / 1e9
+        with self.lock:
+            self.histograms[stage].observe(seconds)
+        self.registry.observe(stage, seconds)
+
+    def summary(self):
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()
+                    if histogram.count}
+
+class NullRunMetrics:
+    """关闭统计时使用的空实现，热路径上只剩两次空调用"""
+    enabled = False
+
+    def clock(self):
+        return 0
+
+    def observe(self, stage, start_ns):
+        pass
+
+    def summary(self):
+        return None
+
+NULL_RUN_METRICS = NullRunMetrics()
+
+class MetricsRegistry:
+    """进程级的实时汇总：阶段直方图、计数器和仪表值"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def new_run(self):
+        return RunMetrics(self) if self.enabled else NULL_RUN_METRICS
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def snapshot(self):
+        """当前汇总数据，供导出器使用"""
+        with self.lock:
+            return {
+                "time": time.time(),
+                "stages": {stage: dict(histogram.summary(), buckets=list(histogram.buckets))
+                           for stage, histogram in self.histograms.items()},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self.counters.items()],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in self.gauges.items()]
+            }
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP wgjx_stage_duration_seconds 图像处理各阶段耗时",
+            "# TYPE wgjx_stage_duration_seconds histogram"
+        ]
+        for stage, data in snapshot["stages"].items():
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS, data["buckets"]):
+                cumulative += count
+                lines.append(f'wgjx_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'wgjx_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+            lines.append(f'wgjx_stage_duration_seconds_sum{{stage="{stage}"}} {data["total_ms"] / 1000}')
+            lines.append(f'wgjx_stage_duration_seconds_count{{stage="{stage}"}} {data["count"]}')
+
+        for kind, items in (("counter", snapshot["counters"]), ("gauge", snapshot["gauges"])):
+            declared = set()
+            for item in items:
+                name = f"wgjx_{item['name']}"
+                if name not in declared:
+                    lines.append(f"# TYPE {name} {kind}")
+                    declared.add(name)
+                labels = ",".join(f'{key}="{value}"' for key, value in item["labels"].items())
+                lines.append(f"{name}{{{labels}}} {item['value']}" if labels else f"{name} {item['value']}")
+
+        return "\n".join(lines) + "\n"
+
+class PrometheusExporter:
+    """在本机端口上提供 /metrics 文本接口"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+class JsonFileExporter:
+    """定期把汇总数据写入 JSON 文件"""
+
+    def __init__(self, registry, path="metrics.json", interval=10):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.registry.snapshot(), f, indent=4)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error writing metrics: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        self.dump()
+
+# 导出器注册表，可以在这里注册自定义导出器
+EXPORTERS = {
+    "prometheus": lambda registry, settings: PrometheusExporter(
+        registry, port=settings.get("metrics_port", 9464)),
+    "json": lambda registry, settings: JsonFileExporter(
+        registry, settings.get("metrics_json_path", "metrics.json"), settings.get("metrics_interval", 10))
+}
+
+# 进程级注册表
+registry = MetricsRegistry()
+_exporter = None
+
+def configure_metrics(settings):
+    """根据设置启用统计并启动导出器"""
+    global _exporter
+
+    registry.enabled = settings.get("metrics_enabled", False)
+
+    if _exporter:
+        _exporter.stop()
+        _exporter = None
+
+    factory = EXPORTERS.get(settings.get("metrics_exporter", "无"))
+    if registry.enabled and factory:
+        try:
+            _exporter = factory(registry, settings)
+            _exporter.start()
+        except Exception as e:
+            print(f"Error starting metrics exporter: {e}")
+            _exporter = None
+
+    return registry
@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def read_file(path):
+    """读取整个文件；提示内核按顺序预读（支持 posix_fadvise 的平台）"""
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        return f.read()
+
+class FilePrefetcher:
+    """单独的读取阶段：读取线程提前读取已提交批次的文件内容，解码线程取用时通常已经读完
+
+    网络存储（NFS、SMB）上读取主要在等待延迟，需要比解码更多的线程；解码和匹配受 CPU 限制，
+    线程多了反而争抢。两者分开设置，解码线程不再阻塞在网络读取上。
+    每提交一批图片就把这一批的文件加入读取队列，提前读取的范围就是在途批次的全部文件
+    （线程数 × 批量大小），而不是固定的几个文件。已读未取的字节数有上限，读取远快于解码时
+    剩余文件留在队列中，每取走一个文件就补充读取，不会占满内存。
+    """
+
+    def __init__(self, io_threads, max_bytes):
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=io_threads)
+        self.queued = deque()  # 已加入但还没开始读取的路径
+        self.futures = {}  # 路径 -> Future，已提交读取但还没被取走
+        self.consumed = set()  # 还在队列中就被直接读取的路径，不再提前读取
+        self.held_bytes = 0
+        self.direct_reads = 0  # 解码线程没等到提前读取、自己读取的文件数
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def add(self, paths):
+        """把一批图片加入读取队列（提交批次时调用）"""
+        with self.lock:
+            self.queued.extend(paths)
+        self.fill()
+
+    def fill(self):
+        with self.lock:
+            while (not self.closed and self.queued
+                   and (not self.max_bytes or self.held_bytes < self.max_bytes)):
+                path = self.queued.popleft()
+                if path in self.consumed:
+                    self.consumed.discard(path)
+                elif path not in self.futures:
+                    self.futures[path] = self.executor.submit(self._read, path)
+
+    def _read(self, path):
+        data = read_file(path)
+        with self.lock:
+            self.held_bytes += len(data)
+        return data
+
+    def take(self, path):
+        """取出文件内容（bytes），还没读完时等待；读取失败返回 None"""
+        with self.lock:
+            future = self.futures.pop(path, None)
+            if future is None:
+                self.consumed.add(path)
+                self.direct_reads += 1
+        try:
+            if future is None:
+                # 已读未取的字节数达到上限，这个文件还在队列中，直接读取
+                return read_file(path)
+            data = future.result()
+            with self.lock:
+                self.held_bytes -= len(data)
+            return data
+        except OSError:
+            return None
+        finally:
+            self.fill()
+
+    def close(self):
+        """取消还没开始的读取，等待正在进行的读取结束"""
+        with self.lock:
+            self.closed = True
+            self.queued.clear()
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,63 @@
+import threading
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+DEFAULT_VARIANT = "高斯模糊+直方图均衡"
+NO_PREPROCESS = "无"
+
+_local = threading.local()
+
+def _clahe():
+    # CLAHE 对象内部有缓冲区，每个线程各用一个
+    clahe = getattr(_local, "clahe", None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        _local.clahe = clahe
+    return clahe
+
+def gaussian_equalize(image):
+    """高斯模糊降噪 + 直方图均衡化增强对比度"""
+    image = cv2.GaussianBlur(image, (5, 5), 0)
+
+    if len(image.shape) == 2:  # 灰度图
+        return cv2.equalizeHist(image)
+
+    # 彩色图只均衡亮度通道
+    ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+    channels = list(cv2.split(ycrcb))
+    channels[0] = cv2.equalizeHist(channels[0])
+    return cv2.cvtColor(cv2.merge(channels), cv2.COLOR_YCrCb2BGR)
+
+def clahe(image):
+    """限制对比度的自适应直方图均衡（只处理灰度图）"""
+    return _clahe().apply(image)
+
+def box_blur(image):
+    """均值模糊，比高斯模糊更快"""
+    return cv2.blur(image, (3, 3))
+
+def box_blur_clahe(image):
+    return _clahe().apply(cv2.blur(image, (3, 3)))
+
+def identity(image):
+    return image
+
+# 预处理方式名称 -> 处理函数；模板和待匹配图片使用同一个函数
+PREPROCESS_VARIANTS = {
+    DEFAULT_VARIANT: gaussian_equalize,
+    "CLAHE": clahe,
+    "均值模糊": box_blur,
+    "均值模糊+CLAHE": box_blur_clahe,
+    NO_PREPROCESS: identity
+}
+
+def resolve_variant(task, settings):
+    """任务单独设置的预处理方式优先，否则使用全局设置"""
+    variant = getattr(task, "preprocess_variant", None)
+    if variant in PREPROCESS_VARIANTS:
+        return variant
+    if not settings.get("preprocess_image", True):
+        return NO_PREPROCESS
+    variant = settings.get("preprocess_variant", DEFAULT_VARIANT)
+    return variant if variant in PREPROCESS_VARIANTS else DEFAULT_VARIANT
@@ -0,0 +1,346 @@
+"""任务定时计划：固定间隔或 cron 表达式
+
+TaskScheduler 用一个最小堆保存所有任务的下次运行时间，一个线程等到堆顶到期再触发，
+任务数量再多也只有一个线程、每次只检查堆顶。任务计划变化时旧的堆项通过版本号作废。
+
+计划（Task.schedule）为字典:
+    {"interval": 300}                 每 300 秒
+    {"cron": "*/5 9-18 * * 1-5"}      分 时 日 月 周（0 和 7 都表示周日）
+可选键:
+    "jitter":   抖动秒数，默认使用设置 schedule_jitter_seconds；每个任务有固定的偏移，
+                大量相同计划的任务不会在同一秒启动，且各自的运行间隔保持不变
+    "overlap":  上次运行还没结束时 "skip" 跳过（默认）或 "queue" 结束后补运行
+    "catch_up": 错过的运行（程序未启动、系统休眠等）"skip" 不补、"once" 补一次（默认）、
+                "all" 逐次补运行（最多 MAX_CATCH_UP 次）
+"""
+import re
+import time
+import heapq
+import zlib
+import threading
+from datetime import datetime, timedelta
+from src.services.metrics import registry as metrics_registry
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+OVERLAP_POLICIES = ("skip", "queue")
+CATCH_UP_POLICIES = ("skip", "once", "all")
+# "all" 策略最多补运行的次数
+MAX_CATCH_UP = 10
+# 没有到期的计划时，最多等待这么久就重新同步一次任务列表
+SYNC_INTERVAL = 30.0
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+INTERVAL_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhd]?)$")
+# cron 各字段的取值范围：分、时、日、月、周
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+class CronSchedule:
+    """五段 cron 表达式，支持 *、列表、范围和步长"""
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expression}")
+        self.expression = expression
+        fields = [self._parse_field(part, low, high) for part, (low, high) in zip(parts, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {day % 7 for day in weekdays}
+        # 日和周都有限制时满足其一即可（与 cron 相同）
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse_field(text, low, high):
+        values = set()
+        for item in text.split(","):
+            spec, _, step = item.partition("/")
+            step = int(step) if step else 1
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(value) for value in spec.split("-", 1))
+            else:
+                start = int(spec)
+                end = high if step > 1 else start
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"cron 字段超出范围: {text}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """moment 之后（不含）的第一个运行时间；按月、日、时逐级跳过不匹配的部分"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron 表达式没有可运行的时间: {self.expression}")
+
+class IntervalSchedule:
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError("间隔必须大于 0")
+        self.seconds = seconds
+
+    def next_after(self, moment, anchor=None):
+        """anchor 为上一次计划时间，按整数个间隔推进，不随运行耗时漂移"""
+        step = timedelta(seconds=self.seconds)
+        if anchor is None:
+            return moment + step
+        missed = int((moment - anchor) / step) + 1 if moment >= anchor else 0
+        return anchor + step * max(missed, 1)
+
+def build_schedule(schedule):
+    if schedule.get("cron"):
+        return CronSchedule(schedule["cron"])
+    if schedule.get("interval"):
+        return IntervalSchedule(float(schedule["interval"]))
+    raise ValueError("计划需要 interval 或 cron")
+
+def parse_schedule_text(text):
+    """解析界面中的计划文本：数字加可选单位（s/m/h/d，默认秒）为固定间隔，五段为 cron 表达式"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    match = INTERVAL_PATTERN.match(text.lower())
+    if match:
+        seconds = float(match.group(1)) * INTERVAL_UNITS[match.group(2) or "s"]
+        return {"interval": int(seconds) if seconds.is_integer() else seconds}
+    CronSchedule(text)  # 校验
+    return {"cron": text}
+
+def format_schedule_text(schedule):
+    if not schedule:
+        return ""
+    if schedule.get("cron"):
+        return schedule["cron"]
+    seconds = schedule.get("interval", 0)
+    for unit in ("d", "h", "m"):
+        if seconds and seconds % INTERVAL_UNITS[unit] == 0:
+            return f"{int(seconds // INTERVAL_UNITS[unit])}{unit}"
+    return f"{seconds:g}s"
+
+def jitter_offset(task_id, jitter):
+    """任务固定的抖动偏移（秒），由任务 ID 决定，重启后不变"""
+    if not jitter:
+        return 0.0
+    return zlib.crc32(task_id.encode("utf-8")) / 0xFFFFFFFF * jitter
+
+class ScheduleEntry:
+    def __init__(self, task_id, schedule, trigger, nominal, offset):
+        self.task_id = task_id
+        self.schedule = schedule  # 任务上的计划字典（用于发现计划变化）
+        self.trigger = trigger  # CronSchedule 或 IntervalSchedule
+        self.nominal = nominal  # 下次计划时间（不含抖动），持久化到 task.next_run
+        self.offset = offset
+        self.version = 0
+
+    @property
+    def due(self):
+        return self.nominal.timestamp() + self.offset
+
+class TaskScheduler:
+    """按计划触发任务；run_task(task_id) 返回 (是否启动, 消息)，与 TaskExecutor.execute_task 相同"""
+
+    def __init__(self, task_manager, run_task, is_running, settings):
+        self.task_manager = task_manager
+        self.run_task = run_task
+        self.is_running = is_running
+        self.default_jitter = settings.get("schedule_jitter_seconds", 30)
+        self.misfire_grace = settings.get("schedule_misfire_grace", 60)
+        self.condition = threading.Condition()
+        self.heap = []  # (到期时间戳, 版本, 任务 ID)
+        self.entries = {}  # 任务 ID -> ScheduleEntry
+        self.pending_runs = {}  # 任务 ID -> 结束后还要运行的次数
+        self.thread = None
+        self.stopped = False
+
+    def start(self):
+        self.sync()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    # ---- 计划维护 ----
+
+    def sync(self):
+        """与任务列表同步：新增、修改、删除计划；任务增删改后调用，后台线程也会定期调用"""
+        tasks = {task.id: task for task in self.task_manager.get_all_tasks()}
+        with self.condition:
+            for task_id in list(self.entries):
+                task = tasks.get(task_id)
+                if task is None or task.schedule != self.entries[task_id].schedule:
+                    del self.entries[task_id]  # 堆中的旧项在出堆时丢弃
+                    self.pending_runs.pop(task_id, None)
+                    if task is not None:
+                        task.next_run = None  # 计划变了，按新计划重新计算
+            for task_id, task in tasks.items():
+                if task.schedule and task_id not in self.entries:
+                    self._add_entry(task)
+            self.condition.notify()
+
+    def _add_entry(self, task):
+        """调用方持有锁"""
+        try:
+            trigger = build_schedule(task.schedule)
+        except (ValueError, TypeError) as e:
+            print(f"任务 {task.name} 的计划无效: {e}")
+            return
+
+        now = datetime.now()
+        nominal = None
+        if task.next_run:
+            try:
+                nominal = datetime.strptime(task.next_run, TIME_FORMAT)
+            except ValueError:
+                nominal = None
+        if nominal is None:
+            nominal = trigger.next_after(now)
+            task.next_run = nominal.strftime(TIME_FORMAT)
+            self._save_task(task)
+
+        jitter = task.schedule.get("jitter", self.default_jitter)
+        entry = ScheduleEntry(task.id, dict(task.schedule), trigger, nominal, jitter_offset(task.id, jitter))
+        self.entries[task.id] = entry
+        self._push(entry)
+
+    def _push(self, entry):
+        entry.version += 1
+        heapq.heappush(self.heap, (entry.due, entry.version, entry.task_id))
+
+    def next_runs(self):
+        """{任务 ID: 下次计划时间}"""
+        with self.condition:
+            return {task_id: entry.nominal.strftime(TIME_FORMAT) for task_id, entry in self.entries.items()}
+
+    # ---- 触发 ----
+
+    def _loop(self):
+        last_sync = time.monotonic()
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+                # 丢弃作废的堆项
+                while self.heap:
+                    due, version, task_id = self.heap[0]
+                    entry = self.entries.get(task_id)
+                    if entry is not None and entry.version == version:
+                        break
+                    heapq.heappop(self.heap)
+                wait = SYNC_INTERVAL - (time.monotonic() - last_sync)
+                if self.heap:
+                    wait = min(wait, self.heap[0][0] - time.time())
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                due_entry = None
+                if self.heap and self.heap[0][0] <= time.time():
+                    _, _, task_id = heapq.heappop(self.heap)
+                    due_entry = self.entries[task_id]
+                    runs = self._advance(due_entry)
+
+            if due_entry is not None:
+                self._fire(due_entry.task_id, runs)
+            elif time.monotonic() - last_sync >= SYNC_INTERVAL:
+                self.sync()
+                last_sync = time.monotonic()
+
+    def _advance(self, entry):
+        """计算这次触发要运行的次数，并把计划推进到现在之后的第一个时间（调用方持有锁）"""
+        # 换算到不含抖动偏移的时间轴上比较
+        now = datetime.now() - timedelta(seconds=entry.offset)
+        late = (now - entry.nominal).total_seconds()
+        missed = 0
+        nominal = entry.nominal
+        while nominal <= now and missed <= MAX_CATCH_UP:
+            missed += 1
+            nominal = self._next_nominal(entry, nominal)
+        if nominal <= now:
+            nominal = self._next_nominal(entry, now)
+
+        if missed <= 1 and late <= self.misfire_grace:
+            runs = 1
+        else:
+            policy = entry.schedule.get("catch_up", "once")
+            runs = 0 if policy == "skip" else min(missed, MAX_CATCH_UP) if policy == "all" else 1
+            metrics_registry.increment("schedule_missed_total", max(0, missed - runs))
+
+        entry.nominal = nominal
+        self._push(entry)
+        task = self.task_manager.get_task(entry.task_id)
+        if task is not None:
+            task.next_run = nominal.strftime(TIME_FORMAT)
+        return runs
+
+    def _next_nominal(self, entry, after):
+        if isinstance(entry.trigger, IntervalSchedule):
+            return entry.trigger.next_after(after, entry.nominal)
+        return entry.trigger.next_after(after)
+
+    def _fire(self, task_id, runs):
+        task = self.task_manager.get_task(task_id)
+        if task is None:
+            return
+        # 下次运行时间写入任务文件，重启后按它判断错过的运行
+        self._save_task(task)
+        if runs <= 0:
+            return
+
+        if self.is_running(task_id):
+            if task.schedule.get("overlap", "skip") == "queue":
+                self._queue_runs(task_id, runs)
+            else:
+                metrics_registry.increment("schedule_skipped_total")
+            return
+
+        started, message = self.run_task(task_id)
+        if not started:
+            print(f"定时运行任务 {task.name} 失败: {message}")
+            return
+        metrics_registry.increment("schedule_runs_total")
+        if runs > 1:
+            self._queue_runs(task_id, runs - 1)
+
+    def _queue_runs(self, task_id, runs):
+        with self.condition:
+            self.pending_runs[task_id] = min(self.pending_runs.get(task_id, 0) + runs, MAX_CATCH_UP)
+
+    def on_task_finished(self, task_id):
+        """任务运行结束时由 TaskExecutor 调用，执行排队的补运行"""
+        with self.condition:
+            runs = self.pending_runs.get(task_id, 0)
+            if not runs:
+                return
+            if runs > 1:
+                self.pending_runs[task_id] = runs - 1
+            else:
+                del self.pending_runs[task_id]
+        started, _ = self.run_task(task_id)
+        if started:
+            metrics_registry.increment("schedule_runs_total")
+
+    def _save_task(self, task):
+        try:
+            self.task_manager.save_task(task)
+        except Exception as e:
+            print(f"Error saving task schedule: {e}")
@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# 每隔这么久（秒）检查一次索引中的图片是否已被删除
+PRUNE_INTERVAL = 24 * 3600
+
+def compute_phash(gray):
+    """感知哈希：32x32 DCT 低频 8x8 系数与中位数比较，返回 64 位整数"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # 直流分量不参与中位数计算
+    median = np.median(low.flatten()[1:])
+    return _pack_bits(low > median)
+
+def compute_dhash(gray):
+    """差值哈希：9x8 缩略图相邻列比较，返回 64 位整数"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack_bits(small[:, 1:] > small[:, :-1])
+
+def _pack_bits(bits):
+    return int(np.packbits(bits.flatten()).view(">u8")[0])
+
+HASH_FUNCTIONS = {
+    "phash": compute_phash,
+    "dhash": compute_dhash
+}
+
+def load_hash_image(path):
+    """只为计算哈希读取图片：优先按 1/4 分辨率解码灰度图，速度快得多"""
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None or min(image.shape[:2]) < 32:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    return image
+
+def hamming_distances(hashes, query):
+    """向量化计算 hashes 中每个 64 位哈希与 query 的汉明距离"""
+    xor = np.bitwise_xor(hashes, np.uint64(query))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor)
+    # 旧版本 NumPy：按字节查表求 popcount
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+class PerceptualHashIndex:
+    """持久化的感知哈希索引，按路径 + 修改时间判断是否需要重新计算"""
+
+    def __init__(self, index_file, hash_type="phash"):
+        self.index_file = index_file
+        self.hash_type = hash_type if hash_type in HASH_FUNCTIONS else "phash"
+        self.hash_function = HASH_FUNCTIONS[self.hash_type]
+        self.paths = []
+        self.rows = {}  # path -> 行号
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.mtimes = np.zeros(0, dtype=np.int64)
+        self.pruned_at = 0.0  # 上次删除失效行的时间（time.time()）
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with np.load(self.index_file) as data:
+                blob = data["paths"].tobytes().decode("utf-8")
+                self.paths = blob.split("\0") if blob else []
+                self.hashes = data["hashes"].astype(np.uint64)
+                self.mtimes = data["mtimes"].astype(np.int64)
+                self.pruned_at = float(data["pruned_at"]) if "pruned_at" in data.files else 0.0
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+        except Exception as e:
+            print(f"Error loading similarity index: {e}")
+            self.paths, self.rows = [], {}
+            self.hashes = np.zeros(0, dtype=np.uint64)
+            self.mtimes = np.zeros(0, dtype=np.int64)
+
+    def save(self):
+        if not self.dirty:
+            return
+        with self.lock:
+            blob = np.frombuffer("\0".join(self.paths).encode("utf-8"), dtype=np.uint8)
+            hashes, mtimes = self.hashes.copy(), self.mtimes.copy()
+            pruned_at = np.array(self.pruned_at)
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+            # np.savez 会自动补 .npz 后缀，临时文件名本身就以 .npz 结尾
+            tmp_file = f"{self.index_file}.tmp.npz"
+            np.savez(tmp_file, paths=blob, hashes=hashes, mtimes=mtimes, pruned_at=pruned_at)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            print(f"Error saving similarity index: {e}")
+
+    def _compute(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with self.lock:
+                row = self.rows.get(path)
+                if row is not None and self.mtimes[row] == mtime:
+                    return None
+            image = load_hash_image(path)
+            if image is None:
+                return None
+            return path, mtime, self.hash_function(image)
+        except Exception:
+            return None
+
+    def update(self, paths, thread_count=4):
+        """为新增或修改过的图片计算哈希，返回更新的条数"""
+        with ThreadPoolExecutor(max_workers=max(1, thread_count)) as executor:
+            updates = [item for item in executor.map(self._compute, paths) if item]
+
+        if not updates:
+            return 0
+
+        with self.lock:
+            new_paths, new_hashes, new_mtimes = [], [], []
+            for path, mtime, value in updates:
+                row = self.rows.get(path)
+                if row is None:
+                    self.rows[path] = len(self.paths) + len(new_paths)
+                    new_paths.append(path)
+                    new_hashes.append(value)
+                    new_mtimes.append(mtime)
+                else:
+                    self.hashes[row] = value
+                    self.mtimes[row] = mtime
+            if new_paths:
+                self.paths.extend(new_paths)
+                self.hashes = np.concatenate([self.hashes, np.array(new_hashes, dtype=np.uint64)])
+                self.mtimes = np.concatenate([self.mtimes, np.array(new_mtimes, dtype=np.int64)])
+            self.dirty = True
+        return len(updates)
+
+    def prune_due(self):
+        return time.time() - self.pruned_at >= PRUNE_INTERVAL
+
+    def prune(self, thread_count=4):
+        """删除文件已不存在的行，返回删除的条数"""
+        with self.lock:
+            paths = list(self.paths)
+        with ThreadPoolExecutor(max_workers=max(1, thread_count)) as executor:
+            missing = {path for path, exists in zip(paths, executor.map(os.path.exists, paths)) if not exists}
+
+        with self.lock:
+            self.pruned_at = time.time()
+            self.dirty = True
+            if missing:
+                keep = np.fromiter((path not in missing for path in self.paths), dtype=bool,
+                                   count=len(self.paths))
+                self.paths = [path for path in self.paths if path not in missing]
+                self.hashes = self.hashes[keep]
+                self.mtimes = self.mtimes[keep]
+                self.rows = {path: row for row, path in enumerate(self.paths)}
+        return len(missing)
+
+    def query(self, query_hash, max_distance, paths=None):
+        """返回与 query_hash 汉明距离不超过 max_distance 的 (路径, 距离)，按距离排序
+
+        指定 paths（最好是集合，多次查询可以复用）时只返回这些路径。总是对整个索引做向量化检索，
+        再过滤命中的少量行，不必为每条路径查找行号。
+        """
+        if paths is not None and not isinstance(paths, (set, frozenset)):
+            paths = set(paths)
+        with self.lock:
+            if not len(self.paths):
+                return []
+            distances = hamming_distances(self.hashes, query_hash)
+            hits = np.nonzero(distances <= max_distance)[0]
+            hits = hits[np.argsort(distances[hits], kind="stable")]
+            found = [(self.paths[hit], int(distances[hit])) for hit in hits]
+        if paths is not None:
+            found = [item for item in found if item[0] in paths]
+        return found
+
+def verify_similarity(template_gray, path):
+    """像素级验证：把候选图缩放到模板大小后计算归一化相关系数"""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    height, width = template_gray.shape[:2]
+    resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return float(cv2.matchTemplate(resized, template_gray, cv2.TM_CCOEFF_NORMED)[0][0])
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_similarity_index(cache_path, hash_type="phash"):
+    """同一缓存目录和哈希类型在进程内共享一个索引"""
+    index_file = os.path.join(cache_path, f"similarity_{hash_type}.npz")
+    with _indexes_lock:
+        if index_file not in _indexes:
+            _indexes[index_file] = PerceptualHashIndex(index_file, hash_type)
+        return _indexes[index_file]
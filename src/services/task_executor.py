@@ -5,16 +5,46 @@ from datetime import datetime
 from src.models.task import Task
 from src.models.execution_log import ExecutionLog
 from src.services.image_processor import ImageProcessor
+from src.services.isolated_runner import IsolatedTaskRunner
+from src.services.distributed import DistributedCoordinator
+from src.services.metrics import configure_metrics
+from src.services.scheduler import TaskScheduler
 
 class TaskExecutor:
     def __init__(self, task_manager, log_manager, settings):
         self.task_manager = task_manager
         self.log_manager = log_manager
         self.settings = settings
+        self.metrics = configure_metrics(settings)
         self.image_processor = ImageProcessor(settings)
+        
         self.running_tasks = {}  # 正在运行的任务
-        self.stop_event = threading.Event()
+        self.isolated_runners = {}  # 隔离模式下任务对应的子进程监督者
+        self.cancel_events = {}  # 任务 ID -> 本次运行的停止标志，停止一个任务不影响其他任务
+        # 调度线程、任务服务和界面会同时启动 / 停止任务，以上几个字典的检查和修改都在锁内进行
+        self.lock = threading.Lock()
+        self.finish_listeners = []  # 任务运行结束时调用 callback(task_id)，例如任务服务重新分发排队的运行
         self.thread = None
+        
+        # 协调者模式：匹配步骤分发给连接上来的工作者进程
+        self.coordinator = None
+        if settings.get("distributed_enabled", False):
+            try:
+                self.coordinator = DistributedCoordinator(settings)
+            except OSError as e:
+                # 端口被占用等：不影响程序启动，改在本地匹配
+                print(f"分布式协调者启动失败，改在本地匹配: {e}")
+            else:
+                self.image_processor.shard_runner = self._run_shards
+        
+        # 定时计划：一个调度线程按堆顶的到期时间触发任务
+        self.scheduler = None
+        if settings.get("scheduler_enabled", True):
+            self.scheduler = TaskScheduler(task_manager, self.execute_task, self.is_task_running, settings).start()
+        
+        # 设置修改后立即生效，不需要重启：正在运行的扫描从下一批开始使用新的线程数和批量大小
+        if hasattr(settings, "add_listener"):
+            settings.add_listener(self.on_settings_changed)
     
     def execute_task(self, task_id):
         """执行单个任务"""
@@ -22,17 +52,19 @@ class TaskExecutor:
         if not task:
             return False, "任务不存在"
         
-        if task_id in self.running_tasks:
-            return False, "任务正在运行中"
+        # 创建执行线程；检查和登记在同一把锁内，同一任务不会被同时启动两次
+        thread = threading.Thread(target=self._run_task, args=(task,))
+        thread.daemon = True
+        with self.lock:
+            if task_id in self.running_tasks:
+                return False, "任务正在运行中"
+            self.cancel_events[task_id] = threading.Event()
+            self.running_tasks[task_id] = thread
         
         # 更新任务状态
         task.status = "运行中"
         self.task_manager.save_task(task)
         
-        # 创建执行线程
-        thread = threading.Thread(target=self._run_task, args=(task,))
-        thread.daemon = True
-        self.running_tasks[task_id] = thread
         thread.start()
         
         return True, "任务已开始执行"
@@ -47,32 +79,61 @@ class TaskExecutor:
     
     def stop_task(self, task_id):
         """停止正在运行的任务"""
-        if task_id in self.running_tasks:
-            # 设置停止事件（如果任务支持）
-            self.stop_event.set()
-            
-            # 等待线程结束
-            self.running_tasks[task_id].join(timeout=5.0)
-            
-            # 如果线程仍在运行，则强制终止（Python没有直接的线程终止方法）
-            if self.running_tasks[task_id].is_alive():
-                # 可以在这里实现更复杂的任务终止逻辑
-                pass
-            
-            del self.running_tasks[task_id]
-            self.stop_event.clear()
-            return True
+        # 先取出线程：任务线程结束时会在 finally 中自己从 running_tasks 删除
+        # 设置该任务的停止标志（如果任务支持）；标志随本次运行结束丢弃，不需要清除。
+        # 与登记 runner 在同一把锁内：要么这里取到 runner，要么任务线程登记时看到标志
+        with self.lock:
+            thread = self.running_tasks.get(task_id)
+            runner = self.isolated_runners.get(task_id)
+            cancel_event = self.cancel_events.get(task_id)
+            if cancel_event is not None:
+                cancel_event.set()
+        if thread is None:
+            return False
+        
+        # 隔离模式：直接终止子进程
+        if runner:
+            runner.terminate()
+        
+        # 等待线程结束（Python 没有直接终止线程的方法，超时后线程仍可能在运行）
+        thread.join(timeout=5.0)
         
-        return False
+        self._unregister(task_id, thread)
+        return True
     
     def stop_all_tasks(self):
         """停止所有正在运行的任务"""
-        task_ids = list(self.running_tasks.keys())
+        with self.lock:
+            task_ids = list(self.running_tasks.keys())
         for task_id in task_ids:
             self.stop_task(task_id)
         
         return len(task_ids)
     
+    def on_settings_changed(self, changed):
+        """设置修改后更新图片处理参数；隔离模式每次运行都在新的子进程中读取设置，不需要处理"""
+        self.image_processor.reconfigure()
+    
+    def add_finish_listener(self, callback):
+        self.finish_listeners.append(callback)
+    
+    def remove_finish_listener(self, callback):
+        if callback in self.finish_listeners:
+            self.finish_listeners.remove(callback)
+    
+    def _run_shards(self, task, image_paths, settings_data, local_runner=None):
+        """分发给工作者，带上该任务本次运行的停止标志"""
+        return self.coordinator.run_shards(task, image_paths, settings_data, local_runner,
+                                           self.cancel_events.get(task.id))
+    
+    def _unregister(self, task_id, thread):
+        """删除该次运行的登记；同一任务可能已经重新启动，只删除属于 thread 的那次"""
+        with self.lock:
+            if self.running_tasks.get(task_id) is thread:
+                del self.running_tasks[task_id]
+                self.isolated_runners.pop(task_id, None)
+                self.cancel_events.pop(task_id, None)
+    
     def is_task_running(self, task_id):
         """检查任务是否正在运行"""
         return task_id in self.running_tasks
@@ -81,7 +142,17 @@ class TaskExecutor:
         """在线程中运行任务"""
         try:
             # 执行图像处理
-            success = self.image_processor.process_task(task, self.log_manager)
+            if self.settings.get("isolated_execution", False):
+                runner = IsolatedTaskRunner(task, self.settings, self.log_manager)
+                # 先登记再启动：启动前到达的停止也能找到 runner，run() 不会再启动子进程
+                with self.lock:
+                    self.isolated_runners[task.id] = runner
+                    cancel_event = self.cancel_events.get(task.id)
+                if cancel_event is not None and cancel_event.is_set():
+                    runner.terminate()
+                success = runner.run()
+            else:
+                success = self.image_processor.process_task(task, self.log_manager)
             
             # 更新任务状态
             if success:
@@ -95,7 +166,18 @@ class TaskExecutor:
         finally:
             # 保存任务状态
             self.task_manager.save_task(task)
+            # 运行统计立即写盘，程序之后异常退出也不会丢失
+            self.log_manager.flush()
             
             # 从运行中任务列表中移除
-            if task.id in self.running_tasks:
-                del self.running_tasks[task.id]    
\ No newline at end of file
+            self._unregister(task.id, threading.current_thread())
+            
+            # 运行期间到期并排队的定时运行
+            if self.scheduler is not None:
+                self.scheduler.on_task_finished(task.id)
+            
+            for listener in list(self.finish_listeners):
+                try:
+                    listener(task.id)
+                except Exception as e:
+                    print(f"任务结束回调出错: {e}")
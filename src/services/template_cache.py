@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import OrderedDict
+from src.services.metrics import registry as metrics_registry
+from src.services.preprocessing import PREPROCESS_VARIANTS
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# 每个模板最多缓存多少种 DFT 尺寸的频谱（按最近使用淘汰）；同一目录的图片尺寸通常只有几种，
+# 混合分辨率的目录也不会让频谱无限增长
+MAX_SPECTRA_PER_TEMPLATE = 8
+
+class PreparedTemplate:
+    """经过预处理的模板及其预先计算的数据，可在多次运行之间复用"""
+
+    def __init__(self, path, gray, variant):
+        self.path = path
+        self.variant = variant
+        self.gray = gray
+        self.height, self.width = gray.shape[:2]
+
+        # 统计量：零均值模板和它的范数用于 FFT 相关计算
+        self.mean = float(gray.mean())
+        self.zero_mean = gray.astype(np.float32) - self.mean
+        self.norm = float(np.sqrt((self.zero_mean ** 2).sum()))
+
+        self.spectra = OrderedDict()  # DFT 尺寸 -> 模板频谱，LRU
+        self.lock = threading.Lock()
+
+    def spectrum(self, dft_shape):
+        with self.lock:
+            spectrum = self.spectra.get(dft_shape)
+            if spectrum is not None:
+                self.spectra.move_to_end(dft_shape)
+                return spectrum
+        padded = np.zeros(dft_shape, dtype=np.float32)
+        padded[:self.height, :self.width] = self.zero_mean
+        spectrum = cv2.dft(padded)
+        with self.lock:
+            self.spectra[dft_shape] = spectrum
+            while len(self.spectra) > MAX_SPECTRA_PER_TEMPLATE:
+                self.spectra.popitem(last=False)
+        return spectrum
+
+class TemplateCache:
+    """按 路径 + 修改时间 + 预处理方式 缓存预处理后的模板，LRU 淘汰"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, variant):
+        """返回 PreparedTemplate，无法读取时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size, variant)
+
+        with self.lock:
+            prepared = self.entries.get(key)
+            if prepared is not None:
+                self.entries.move_to_end(key)
+                metrics_registry.increment("template_cache_hits_total")
+                return prepared
+
+        metrics_registry.increment("template_cache_misses_total")
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return None
+        prepared = PreparedTemplate(path, PREPROCESS_VARIANTS[variant](gray), variant)
+
+        with self.lock:
+            # 同一路径的旧版本（文件已修改）直接丢弃
+            for stale in [k for k in self.entries if k[0] == path and k[3] == variant and k != key]:
+                del self.entries[stale]
+            self.entries[key] = prepared
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return prepared
+
+    def resize(self, max_entries):
+        with self.lock:
+            self.max_entries = max_entries
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# 进程级共享的模板缓存
+template_cache = TemplateCache()
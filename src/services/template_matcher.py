@@ -0,0 +1,104 @@
+from src.services.preprocessing import PREPROCESS_VARIANTS, NO_PREPROCESS
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# 同尺寸模板达到这个数量才走共享频谱的 FFT 路径，数量少时 cv2.matchTemplate 更快
+FFT_MIN_GROUP = 3
+
+class TemplateEntry:
+    """一个已预处理的模板及其在本任务中的匹配阈值"""
+
+    def __init__(self, prepared, threshold):
+        self.prepared = prepared  # PreparedTemplate，可能被多个任务共享
+        self.path = prepared.path
+        self.gray = prepared.gray
+        self.threshold = threshold
+        self.height, self.width = prepared.height, prepared.width
+
+    @property
+    def norm(self):
+        return self.prepared.norm
+
+    def spectrum(self, dft_shape):
+        return self.prepared.spectrum(dft_shape)
+
+class TemplateSet:
+    """一组模板，对每张图片一次性匹配所有模板
+
+    尺寸相同的模板（至少 FFT_MIN_GROUP 个）共用图片频谱和窗口统计量（积分图），
+    只需为每个模板做一次频谱相乘和逆变换；其余模板直接用 cv2.matchTemplate。
+    """
+
+    def __init__(self, entries, variant=NO_PREPROCESS):
+        self.entries = entries
+        # 模板已经用同一种方式预处理过，图片也必须用它
+        self.variant = variant
+        self.preprocess = PREPROCESS_VARIANTS[variant]
+        self.groups = {}  # (高, 宽) -> [模板]
+        for entry in entries:
+            self.groups.setdefault((entry.height, entry.width), []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, image_gray):
+        """返回 {模板: 得分}；模板比图片大时没有得分"""
+        scores = {}
+        image_height, image_width = image_gray.shape[:2]
+        for (height, width), group in self.groups.items():
+            if height > image_height or width > image_width:
+                continue
+            if len(group) < FFT_MIN_GROUP:
+                for entry in group:
+                    result = cv2.matchTemplate(image_gray, entry.gray, cv2.TM_CCOEFF_NORMED)
+                    scores[entry] = float(cv2.minMaxLoc(result)[1])
+            else:
+                scores.update(self._match_group_fft(image_gray, height, width, group))
+        return scores
+
+    def _match_group_fft(self, image_gray, height, width, group):
+        """用同一份图片频谱计算多个同尺寸模板的 TM_CCOEFF_NORMED"""
+        image = image_gray.astype(np.float32)
+        image_height, image_width = image.shape[:2]
+        out_height, out_width = image_height - height + 1, image_width - width + 1
+
+        # 每个窗口内像素的和与平方和（只和模板尺寸有关）
+        window_sum, window_sq_sum = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        area = float(height * width)
+        sums = (window_sum[height:, width:] - window_sum[:-height, width:]
+                - window_sum[height:, :-width] + window_sum[:-height, :-width])
+        sq_sums = (window_sq_sum[height:, width:] - window_sq_sum[:-height, width:]
+                   - window_sq_sum[height:, :-width] + window_sq_sum[:-height, :-width])
+        window_std = np.sqrt(np.maximum(sq_sums - sums * sums / area, 0)).astype(np.float32)
+
+        # 图片频谱只计算一次；尺寸不小于图片本身，循环相关不会回绕到有效区域
+        dft_shape = (cv2.getOptimalDFTSize(image_height), cv2.getOptimalDFTSize(image_width))
+        padded = np.zeros(dft_shape, dtype=np.float32)
+        padded[:image_height, :image_width] = image
+        image_spectrum = cv2.dft(padded)  # CCS 紧凑格式，比复数输出少一半运算
+
+        scores = {}
+        for entry in group:
+            product = cv2.mulSpectrums(image_spectrum, entry.spectrum(dft_shape), 0, conjB=True)
+            correlation = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+            correlation = correlation[:out_height, :out_width]
+
+            # 平坦窗口（标准差接近 0）的得分记为 0
+            denominator = window_std * entry.norm
+            flat = denominator <= 1e-6
+            denominator[flat] = 1.0
+            normalized = cv2.divide(correlation, denominator)
+            normalized[flat] = 0
+            scores[entry] = float(cv2.minMaxLoc(normalized)[1])
+        return scores
+
+    def best(self, scores):
+        """选出最佳模板：优先达到自身阈值的模板，其中得分最高者"""
+        if not scores:
+            return None, 0, False
+        matched = [entry for entry, score in scores.items() if score >= entry.threshold]
+        candidates = matched or list(scores)
+        best_entry = max(candidates, key=lambda entry: scores[entry])
+        return best_entry, scores[best_entry], bool(matched)
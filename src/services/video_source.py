@@ -0,0 +1,117 @@
+import os
+import re
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+VIDEO_EXTENSIONS = frozenset(['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'])
+# 帧序列：文件名中带 printf 风格的序号，例如 frames/img_%05d.png
+FRAME_SEQUENCE_PATTERN = re.compile(r"%0?\d*d")
+# 下一个时间段的起点比当前位置多出这么多帧时才跳转，否则逐帧 grab 过去（跳转需要从关键帧重新解码）
+SEEK_MIN_FRAMES = 120
+# 静态帧判断使用的缩略图宽度
+THUMBNAIL_WIDTH = 64
+
+class VideoOpenError(ValueError):
+    """视频文件或帧序列无法打开（格式不支持或文件损坏）"""
+
+def is_video_name(name):
+    return os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS
+
+def is_frame_sequence(path):
+    return bool(FRAME_SEQUENCE_PATTERN.search(os.path.basename(path)))
+
+def is_video_source(path):
+    """视频文件或帧序列，按帧处理而不是当作单张图片"""
+    return is_video_name(path) or is_frame_sequence(path)
+
+def normalize_windows(windows):
+    """时间段 [(开始秒, 结束秒或 None)] 排序并合并重叠部分；为空时表示整个视频"""
+    merged = []
+    for start, end in sorted(((start or 0, end) for start, end in windows or []), key=lambda w: w[0]):
+        if merged and (merged[-1][1] is None or start <= merged[-1][1]):
+            if merged[-1][1] is not None:
+                merged[-1][1] = None if end is None else max(merged[-1][1], end)
+            continue
+        merged.append([start, end])
+    return [tuple(window) for window in merged] or [(0, None)]
+
+class VideoFrames:
+    """按步长和时间段读取视频帧
+
+    跳过的帧只 grab（解复用、解码但不转换成 BGR 图像），时间段之间相隔较远时直接跳转。
+    帧序列没有帧率时使用 fallback_fps 换算时间。
+    """
+
+    def __init__(self, path, stride=1, windows=None, fallback_fps=1.0):
+        self.path = path
+        self.stride = max(1, int(stride or 1))
+        self.windows = normalize_windows(windows)
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            self.capture.release()
+            raise VideoOpenError("无法打开视频")
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else fallback_fps
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def close(self):
+        self.capture.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        """产出 (帧序号, 时间戳秒, BGR 帧)"""
+        position = 0  # 下一次 read / grab 得到的帧序号
+        for start, end in self.windows:
+            first = int(round(start * self.fps))
+            last = None if end is None else int(end * self.fps)  # 不含
+            if first - position > SEEK_MIN_FRAMES and self.capture.set(cv2.CAP_PROP_POS_FRAMES, first):
+                position = int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
+            while position < first:
+                if not self.capture.grab():
+                    return
+                position += 1
+
+            while last is None or position < last:
+                if (position - first) % self.stride:
+                    if not self.capture.grab():
+                        return
+                else:
+                    ok, frame = self.capture.read()
+                    if not ok:
+                        return
+                    yield position, position / self.fps, frame
+                position += 1
+
+class StaticFrameFilter:
+    """跳过与上一张被匹配的帧几乎相同的帧
+
+    把帧缩小到 THUMBNAIL_WIDTH 宽的灰度缩略图，与上一张被匹配帧的缩略图逐像素比较，
+    所有像素的灰度差都小于阈值时视为静态帧。用最大差而不是平均差，画面中只有一小块（例如弹窗、图标）
+    变化时也不会被跳过；缩小时的区域平均可以抹掉压缩噪声。
+    只和被匹配过的帧比较，缓慢的变化会逐渐累积，不会被一直跳过。
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.reference = None
+
+    def is_static(self, frame):
+        if not self.threshold:
+            return False
+        height, width = frame.shape[:2]
+        size = (THUMBNAIL_WIDTH, max(1, height * THUMBNAIL_WIDTH // max(1, width)))
+        thumbnail = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        if (self.reference is not None
+                and cv2.minMaxLoc(cv2.absdiff(thumbnail, self.reference))[1] < self.threshold):
+            return True
+        self.reference = thumbnail
+        return False
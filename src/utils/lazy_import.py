@@ -0,0 +1,31 @@
+import time
+import types
+import importlib
+from src.utils.startup_profiler import profiler
+
+class LazyModule(types.ModuleType):
+    """延迟导入的模块代理，第一次访问属性时才真正导入"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self.__dict__["_lazy_name"])
+            profiler.record_import(self.__dict__["_lazy_name"], time.perf_counter() - start)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name):
+    """返回模块的延迟导入代理"""
+    return LazyModule(name)
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+class StartupProfiler:
+    """启动耗时分析器，记录各模块导入耗时和各初始化阶段耗时"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []  # (阶段名称, 开始偏移, 耗时, 新加载模块数)
+        self.imports = {}  # 模块名 -> 导入耗时
+        self.marks = {}  # 里程碑名称 -> 距启动的时间
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """记录一个初始化阶段的耗时"""
+        if not self.enabled:
+            yield
+            return
+
+        modules_before = len(sys.modules)
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - phase_start
+            with self.lock:
+                self.phases.append((name, phase_start - self.start, elapsed,
+                                    len(sys.modules) - modules_before))
+
+    def record_import(self, module_name, seconds):
+        """记录单个模块的导入耗时"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.imports[module_name] = self.imports.get(module_name, 0) + seconds
+
+    def mark(self, name):
+        """记录里程碑（例如首个窗口显示），只保留第一次"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "python": sys.version.split()[0],
+                "phases": [
+                    {"name": name, "offset_ms": round(offset * 1000, 2),
+                     "elapsed_ms": round(elapsed * 1000, 2), "new_modules": modules}
+                    for name, offset, elapsed, modules in self.phases
+                ],
+                "imports": {name: round(seconds * 1000, 2) for name, seconds in self.imports.items()},
+                "marks": {name: round(seconds * 1000, 2) for name, seconds in self.marks.items()}
+            }
+
+    def report(self):
+        """生成可读的启动耗时报告"""
+        data = self.to_dict()
+        lines = ["===== 启动耗时报告 ====="]
+
+        lines.append("初始化阶段:")
+        for phase in data["phases"]:
+            lines.append(f"  {phase['name']:<24} {phase['elapsed_ms']:>9.2f} ms "
+                         f"(开始于 {phase['offset_ms']:.2f} ms, 新加载模块 {phase['new_modules']} 个)")
+
+        if data["imports"]:
+            lines.append("模块导入:")
+            for name, ms in sorted(data["imports"].items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"  {name:<24} {ms:>9.2f} ms")
+
+        if data["marks"]:
+            lines.append("里程碑:")
+            for name, ms in sorted(data["marks"].items(), key=lambda item: item[1]):
+                lines.append(f"  {name:<24} {ms:>9.2f} ms")
+
+        return "\n".join(lines)
+
+    def save_report(self, report_file="startup_profile.jsonl"):
+        """以 JSON Lines 形式追加保存报告，便于跨版本对比"""
+        if not self.enabled:
+            return False
+        try:
+            with open(report_file, "a") as f:
+                f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+            return True
+        except Exception as e:
+            print(f"Error saving startup profile: {e}")
+            return False
+
+# 全局分析器，通过环境变量或命令行参数启用
+profiler = StartupProfiler(
+    enabled=os.environ.get("WGJX_PROFILE_STARTUP") == "1" or "--profile-startup" in sys.argv
+)
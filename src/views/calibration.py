@@ -0,0 +1,158 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+                            QDoubleSpinBox, QSlider, QTableWidget, QTableWidgetItem,
+                            QHeaderView, QDialogButtonBox, QWidget, QFormLayout)
+from PyQt5.QtGui import QPainter, QColor, QPen
+from PyQt5.QtCore import Qt
+
+ALL_TEMPLATES = "全部模板"
+SLIDER_STEPS = 1000
+HISTOGRAM_BINS = 100
+
+class ScoreHistogram(QWidget):
+    """得分直方图，阈值以上的桶高亮，并画出阈值线"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.counts = []
+        self.low, self.high = 0.0, 1.0
+        self.threshold = 0.8
+        self.setMinimumHeight(160)
+
+    def set_histogram(self, counts, low, high):
+        self.counts = counts
+        self.low, self.high = low, high
+        self.update()
+
+    def set_threshold(self, threshold):
+        self.threshold = threshold
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(0, 0, width, height, QColor("white"))
+        if not self.counts:
+            painter.drawText(self.rect(), Qt.AlignCenter, "没有得分")
+            return
+
+        peak = max(self.counts) or 1
+        bar_width = width / len(self.counts)
+        bucket = (self.high - self.low) / len(self.counts)
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            bar_height = max(1, int(count / peak * (height - 10)))
+            above = self.low + bucket * (index + 1) > self.threshold
+            painter.fillRect(int(index * bar_width), height - bar_height, max(1, int(bar_width) - 1), bar_height,
+                             QColor("#2e7d32") if above else QColor("#9e9e9e"))
+
+        x = int((self.threshold - self.low) / (self.high - self.low) * width)
+        painter.setPen(QPen(QColor("red"), 2))
+        painter.drawLine(x, 0, x, height)
+
+class ThresholdCalibrationDialog(QDialog):
+    """根据保存的得分表调整阈值：拖动阈值即可看到匹配数量的变化，不需要重新扫描"""
+
+    def __init__(self, task, score_table, parent=None):
+        super().__init__(parent)
+        self.task = task
+        self.score_table = score_table
+        self.setWindowTitle(f"阈值校准 - {task.name}")
+        self.resize(720, 560)
+        self.init_ui()
+        self.on_template_changed()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        status = f"最近一次运行 {self.score_table.updated_at or ''}：图片 {len(self.score_table)} 张，" \
+                 f"有得分 {self.score_table.scored_count()} 张"
+        if not self.score_table.complete:
+            status += "（运行未完成）"
+        layout.addWidget(QLabel(status))
+
+        form = QFormLayout()
+        self.template_combo = QComboBox()
+        self.template_combo.addItem(ALL_TEMPLATES)
+        if len(self.score_table.templates) > 1:
+            self.template_combo.addItems([template["path"] for template in self.score_table.templates])
+
+        self.threshold_spinbox = QDoubleSpinBox()
+        self.threshold_spinbox.setRange(0.0, 1.0)
+        self.threshold_spinbox.setDecimals(3)
+        self.threshold_spinbox.setSingleStep(0.01)
+        self.threshold_slider = QSlider(Qt.Horizontal)
+        self.threshold_slider.setRange(0, SLIDER_STEPS)
+
+        threshold_layout = QHBoxLayout()
+        threshold_layout.addWidget(self.threshold_slider)
+        threshold_layout.addWidget(self.threshold_spinbox)
+
+        form.addRow("模板:", self.template_combo)
+        form.addRow("阈值:", threshold_layout)
+        layout.addLayout(form)
+
+        self.histogram = ScoreHistogram()
+        layout.addWidget(self.histogram)
+
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+
+        # 得分最接近阈值的图片，最容易因阈值变化而改变结果
+        self.near_table = QTableWidget()
+        self.near_table.setColumnCount(2)
+        self.near_table.setHorizontalHeaderLabels(["图片", "最高得分"])
+        self.near_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.near_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(QLabel("得分最接近阈值的图片:"))
+        layout.addWidget(self.near_table)
+
+        buttons = QDialogButtonBox()
+        self.apply_btn = buttons.addButton("应用阈值", QDialogButtonBox.AcceptRole)
+        buttons.addButton("关闭", QDialogButtonBox.RejectRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.template_combo.currentTextChanged.connect(self.on_template_changed)
+        self.threshold_slider.valueChanged.connect(
+            lambda value: self.threshold_spinbox.setValue(value / SLIDER_STEPS))
+        self.threshold_spinbox.valueChanged.connect(self.on_threshold_changed)
+
+    def selected_template(self):
+        """选中的模板路径，全部模板时返回 None"""
+        text = self.template_combo.currentText()
+        return None if text == ALL_TEMPLATES else text
+
+    def threshold(self):
+        return self.threshold_spinbox.value()
+
+    def on_template_changed(self):
+        template = self.selected_template()
+        counts, _ = self.score_table.histogram(HISTOGRAM_BINS, 0.0, 1.0, template)
+        self.histogram.set_histogram(counts, 0.0, 1.0)
+
+        if template is None:
+            current = self.task.threshold
+        else:
+            current = next(t["threshold"] for t in self.score_table.templates if t["path"] == template)
+        self.threshold_spinbox.setValue(current)
+        self.on_threshold_changed(current)
+
+    def on_threshold_changed(self, threshold):
+        self.threshold_slider.blockSignals(True)
+        self.threshold_slider.setValue(int(round(threshold * SLIDER_STEPS)))
+        self.threshold_slider.blockSignals(False)
+        self.histogram.set_threshold(threshold)
+
+        template = self.selected_template()
+        matches = self.score_table.sweep([threshold], template)[0]
+        scored = self.score_table.scored_count()
+        self.count_label.setText(f"阈值 {threshold:.3f} 时匹配 {matches} / {scored} 张图片"
+                                 f"（运行时按当前配置匹配 {self.score_table.match_count()} 张）")
+
+        near = self.score_table.near_threshold(threshold)
+        self.near_table.setRowCount(len(near))
+        for row, (path, score) in enumerate(near):
+            self.near_table.setItem(row, 0, QTableWidgetItem(path))
+            self.near_table.setItem(row, 1, QTableWidgetItem(f"{score:.4f}"))
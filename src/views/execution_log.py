@@ -78,9 +78,11 @@ class ExecutionLogTab(QWidget):
         self.clear_log_btn = QPushButton("清空日志")
         self.export_log_btn = QPushButton("导出日志")
         self.refresh_log_btn = QPushButton("刷新日志")
+        self.stats_btn = QPushButton("任务统计")
         
         button_layout.addWidget(self.clear_log_btn)
         button_layout.addWidget(self.export_log_btn)
         button_layout.addWidget(self.refresh_log_btn)
+        button_layout.addWidget(self.stats_btn)
         
         self.main_layout.addLayout(button_layout)    
\ No newline at end of file
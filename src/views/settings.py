@@ -1,7 +1,9 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, 
                             QLineEdit, QPushButton, QGroupBox, 
-                            QLabel, QSpinBox, QCheckBox, QComboBox)
+                            QLabel, QSpinBox, QDoubleSpinBox, QCheckBox, QComboBox, QHBoxLayout)
+from PyQt5.QtCore import Qt
 import os
+from src.services.preprocessing import PREPROCESS_VARIANTS, NO_PREPROCESS
 
 class SettingsTab(QWidget):
     def __init__(self):
@@ -58,6 +60,27 @@ class SettingsTab(QWidget):
         app_layout.addRow(self.auto_save_label, self.auto_save_spinbox)
         app_layout.addRow(self.auto_load_tasks)
         
+        # 日志保留策略（0 表示不限制），已结束日期的日志压缩成每天一个归档
+        self.log_retention_label = QLabel("日志保留天数:")
+        self.log_retention_spinbox = QSpinBox()
+        self.log_retention_spinbox.setRange(0, 36500)
+        
+        self.log_max_size_label = QLabel("日志总大小上限(MB):")
+        self.log_max_size_spinbox = QSpinBox()
+        self.log_max_size_spinbox.setRange(0, 1024 * 1024)
+        
+        self.log_max_records_label = QLabel("日志条数上限:")
+        self.log_max_records_spinbox = QSpinBox()
+        self.log_max_records_spinbox.setRange(0, 2000000000)
+        
+        self.log_compress_checkbox = QCheckBox("压缩已结束日期的日志")
+        self.log_compress_checkbox.setChecked(True)
+        
+        app_layout.addRow(self.log_retention_label, self.log_retention_spinbox)
+        app_layout.addRow(self.log_max_size_label, self.log_max_size_spinbox)
+        app_layout.addRow(self.log_max_records_label, self.log_max_records_spinbox)
+        app_layout.addRow(self.log_compress_checkbox)
+        
         self.main_layout.addWidget(app_group)
     
     def create_image_processing_settings_area(self):
@@ -81,6 +104,20 @@ class SettingsTab(QWidget):
         self.batch_size_spinbox.setRange(1, 100)
         self.batch_size_spinbox.setValue(10)
         
+        # 读取线程数（网络存储上提前读取文件，0 表示由处理线程自己读取）
+        self.io_thread_label = QLabel("读取线程数:")
+        self.io_thread_spinbox = QSpinBox()
+        self.io_thread_spinbox.setRange(0, 64)
+        self.io_thread_spinbox.setValue(0)
+        self.io_thread_spinbox.setSpecialValueText("不单独读取")
+        
+        # 解码内存预算（所有任务共享，0 表示不限制；默认关闭，只在大图较多时开启）
+        self.memory_budget_label = QLabel("解码内存预算(MB):")
+        self.memory_budget_spinbox = QSpinBox()
+        self.memory_budget_spinbox.setRange(0, 1024 * 1024)
+        self.memory_budget_spinbox.setValue(0)
+        self.memory_budget_spinbox.setSpecialValueText("不限制")
+        
         # 图像预处理
         self.preprocess_checkbox = QCheckBox("启用图像预处理")
         self.preprocess_checkbox.setChecked(True)
@@ -88,8 +125,108 @@ class SettingsTab(QWidget):
         image_layout.addRow(self.algorithm_label, self.algorithm_combo)
         image_layout.addRow(self.thread_label, self.thread_spinbox)
         image_layout.addRow(self.batch_size_label, self.batch_size_spinbox)
+        image_layout.addRow(self.io_thread_label, self.io_thread_spinbox)
+        image_layout.addRow(self.memory_budget_label, self.memory_budget_spinbox)
         image_layout.addRow(self.preprocess_checkbox)
         
+        # 预处理方式（模板和图片使用同一种）
+        self.preprocess_variant_label = QLabel("预处理方式:")
+        self.preprocess_variant_combo = QComboBox()
+        self.preprocess_variant_combo.addItems([name for name in PREPROCESS_VARIANTS if name != NO_PREPROCESS])
+        image_layout.addRow(self.preprocess_variant_label, self.preprocess_variant_combo)
+        
+        # 内容去重
+        self.deduplicate_checkbox = QCheckBox("按内容去重（内容相同的图片只匹配一次）")
+        self.deduplicate_checkbox.setChecked(False)
+        image_layout.addRow(self.deduplicate_checkbox)
+        
+        # 目录清单：只重新列出修改过的目录
+        self.manifest_checkbox = QCheckBox("缓存目录清单（只重新扫描有变化的目录）")
+        self.manifest_checkbox.setChecked(False)
+        image_layout.addRow(self.manifest_checkbox)
+        
+        # 保存每张图片的得分，调整阈值时不必重新扫描
+        self.record_scores_checkbox = QCheckBox("记录逐图片得分（用于阈值校准）")
+        self.record_scores_checkbox.setChecked(True)
+        image_layout.addRow(self.record_scores_checkbox)
+        
+        # 视频来源：目录中的视频是否处理、默认取帧间隔、静态帧判断阈值（0 表示不跳过）
+        self.scan_videos_checkbox = QCheckBox("扫描目录时包含视频文件")
+        self.scan_videos_checkbox.setChecked(False)
+        image_layout.addRow(self.scan_videos_checkbox)
+        
+        self.video_stride_label = QLabel("视频取帧间隔(帧):")
+        self.video_stride_spinbox = QSpinBox()
+        self.video_stride_spinbox.setRange(1, 100000)
+        self.video_stride_spinbox.setValue(10)
+        image_layout.addRow(self.video_stride_label, self.video_stride_spinbox)
+        
+        self.video_static_label = QLabel("静态帧阈值(最大灰度差):")
+        self.video_static_spinbox = QDoubleSpinBox()
+        self.video_static_spinbox.setRange(0.0, 255.0)
+        self.video_static_spinbox.setSingleStep(1.0)
+        self.video_static_spinbox.setValue(10.0)
+        image_layout.addRow(self.video_static_label, self.video_static_spinbox)
+        
+        # 自适应调优（线程数和批量大小的上限见设置文件中的 max_thread_count / max_batch_size）
+        self.adaptive_tuning_checkbox = QCheckBox("根据吞吐量自动调整线程数和批量大小")
+        self.adaptive_tuning_checkbox.setChecked(False)
+        image_layout.addRow(self.adaptive_tuning_checkbox)
+        
+        # 隔离执行：每个任务在独立子进程中运行，可强制终止（限制为 0 表示不限制）
+        self.isolated_checkbox = QCheckBox("在独立进程中执行任务（可强制停止）")
+        self.isolated_checkbox.setChecked(False)
+        
+        self.cpu_limit_label = QLabel("CPU 时间限制(秒):")
+        self.cpu_limit_spinbox = QSpinBox()
+        self.cpu_limit_spinbox.setRange(0, 7 * 24 * 3600)
+        
+        self.wall_limit_label = QLabel("运行时间限制(秒):")
+        self.wall_limit_spinbox = QSpinBox()
+        self.wall_limit_spinbox.setRange(0, 7 * 24 * 3600)
+        
+        self.memory_limit_label = QLabel("内存限制(MB):")
+        self.memory_limit_spinbox = QSpinBox()
+        self.memory_limit_spinbox.setRange(0, 1024 * 1024)
+        
+        image_layout.addRow(self.isolated_checkbox)
+        image_layout.addRow(self.cpu_limit_label, self.cpu_limit_spinbox)
+        image_layout.addRow(self.wall_limit_label, self.wall_limit_spinbox)
+        image_layout.addRow(self.memory_limit_label, self.memory_limit_spinbox)
+        
+        # 分布式执行：本机作为协调者，工作者用 python -m src.services.distributed 启动
+        self.distributed_checkbox = QCheckBox("作为协调者把匹配分发给工作者（重启后生效）")
+        self.distributed_checkbox.setChecked(False)
+        
+        self.distributed_address_label = QLabel("协调者地址:")
+        self.distributed_address_input = QLineEdit("127.0.0.1:50000")
+        
+        image_layout.addRow(self.distributed_checkbox)
+        image_layout.addRow(self.distributed_address_label, self.distributed_address_input)
+        
+        # 本地任务服务：其他程序通过 HTTP/JSON-RPC 提交任务
+        self.job_server_checkbox = QCheckBox("启用本地任务服务（重启后生效）")
+        self.job_server_checkbox.setChecked(False)
+        
+        self.job_server_port_label = QLabel("任务服务端口:")
+        self.job_server_port_spinbox = QSpinBox()
+        self.job_server_port_spinbox.setRange(1, 65535)
+        self.job_server_port_spinbox.setValue(8765)
+        
+        image_layout.addRow(self.job_server_checkbox)
+        image_layout.addRow(self.job_server_port_label, self.job_server_port_spinbox)
+        
+        # 性能统计
+        self.metrics_checkbox = QCheckBox("启用性能统计")
+        self.metrics_checkbox.setChecked(False)
+        
+        self.metrics_exporter_label = QLabel("统计导出方式:")
+        self.metrics_exporter_combo = QComboBox()
+        self.metrics_exporter_combo.addItems(["无", "prometheus", "json"])
+        
+        image_layout.addRow(self.metrics_checkbox)
+        image_layout.addRow(self.metrics_exporter_label, self.metrics_exporter_combo)
+        
         self.main_layout.addWidget(image_group)
     
     def create_save_button(self):
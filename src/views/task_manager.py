@@ -1,9 +1,14 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, 
                             QTableWidgetItem, QPushButton, QLabel, QLineEdit, 
                             QComboBox, QFileDialog, QGroupBox, QFormLayout, 
-                            QCheckBox, QMessageBox, QHeaderView)
+                            QCheckBox, QMessageBox, QHeaderView, QSpinBox)
 from PyQt5.QtCore import Qt
 import os
+from src.services.preprocessing import PREPROCESS_VARIANTS
+
+FOLLOW_GLOBAL = "跟随全局设置"
+# 错过的定时运行的处理方式
+CATCH_UP_LABELS = {"once": "补运行一次", "skip": "跳过", "all": "逐次补运行"}
 
 class TaskManagerTab(QWidget):
     def __init__(self):
@@ -50,12 +55,14 @@ class TaskManagerTab(QWidget):
         self.delete_task_btn = QPushButton("删除任务")
         self.execute_task_btn = QPushButton("执行选中任务")
         self.execute_all_btn = QPushButton("执行所有任务")
+        self.calibrate_btn = QPushButton("阈值校准")
         
         button_layout.addWidget(self.add_task_btn)
         button_layout.addWidget(self.edit_task_btn)
         button_layout.addWidget(self.delete_task_btn)
         button_layout.addWidget(self.execute_task_btn)
         button_layout.addWidget(self.execute_all_btn)
+        button_layout.addWidget(self.calibrate_btn)
         
         self.main_layout.addLayout(button_layout)
     
@@ -71,6 +78,10 @@ class TaskManagerTab(QWidget):
         path_layout.addWidget(self.image_path_input)
         path_layout.addWidget(self.browse_btn)
         
+        # 模板列表（可选）：为空时图片路径本身就是模板
+        self.templates_input = QLineEdit()
+        self.templates_input.setPlaceholderText("多个模板用 ; 分隔，可写成 路径|阈值；为空时使用图片路径")
+        
         self.match_action_input = QLineEdit()
         self.fail_action_input = QLineEdit()
         
@@ -79,11 +90,36 @@ class TaskManagerTab(QWidget):
         
         self.threshold_input = QLineEdit("0.8")
         
+        # 预处理方式：默认跟随全局设置，也可以为单个任务选择更快的方式
+        self.preprocess_variant_combo = QComboBox()
+        self.preprocess_variant_combo.addItem(FOLLOW_GLOBAL)
+        self.preprocess_variant_combo.addItems(list(PREPROCESS_VARIANTS))
+        
+        # 视频来源：取帧间隔（0 表示跟随全局设置）和只处理的时间段
+        self.frame_stride_spinbox = QSpinBox()
+        self.frame_stride_spinbox.setRange(0, 100000)
+        self.frame_stride_spinbox.setSpecialValueText(FOLLOW_GLOBAL)
+        self.time_windows_input = QLineEdit()
+        self.time_windows_input.setPlaceholderText("单位秒，多个时间段用 ; 分隔，例如 0-60; 300-；为空时处理整个视频")
+        
+        # 定时计划：固定间隔（如 30s、5m、2h）或 cron 表达式（分 时 日 月 周），为空时只手动运行
+        self.schedule_input = QLineEdit()
+        self.schedule_input.setPlaceholderText("例如 5m 或 */10 9-18 * * 1-5；为空时只手动运行")
+        self.catch_up_combo = QComboBox()
+        for policy, label in CATCH_UP_LABELS.items():
+            self.catch_up_combo.addItem(label, policy)
+        
         config_layout.addRow("任务名称:", self.task_name_input)
         config_layout.addRow("图片路径:", path_layout)
+        config_layout.addRow("模板列表:", self.templates_input)
         config_layout.addRow("匹配成功动作:", self.match_action_input)
         config_layout.addRow("匹配失败动作:", self.fail_action_input)
         config_layout.addRow("匹配阈值:", self.threshold_input)
+        config_layout.addRow("预处理方式:", self.preprocess_variant_combo)
+        config_layout.addRow("视频取帧间隔:", self.frame_stride_spinbox)
+        config_layout.addRow("视频时间段:", self.time_windows_input)
+        config_layout.addRow("定时计划:", self.schedule_input)
+        config_layout.addRow("错过的运行:", self.catch_up_combo)
         config_layout.addRow(self.recursive_checkbox)
         
         self.save_task_btn = QPushButton("保存任务配置")
@@ -113,7 +149,7 @@ class TaskManagerTab(QWidget):
         
         if choice == QMessageBox.Yes:  # 选择文件
             file_path, _ = QFileDialog.getOpenFileName(
-                self, "选择图片文件", "", "图片文件 (*.png *.jpg *.jpeg *.bmp);;所有文件 (*)", options=options
+                self, "选择图片文件", "", "图片或视频文件 (*.png *.jpg *.jpeg *.bmp *.mp4 *.avi *.mkv *.mov *.wmv *.flv *.webm *.m4v);;所有文件 (*)", options=options
             )
             if file_path:
                 self.image_path_input.setText(file_path)